@@ -0,0 +1,416 @@
+"""
+Columnar attendance analytics
+
+Students, polls, section enrollments and attendance records are held in
+NumPy arrays, and every report is computed from them in one vectorized pass.
+After the first load a refresh reads only the rows added since the previous
+one, using the ``max(id)`` of each table as a high-water mark. The reports are
+recomputed only when new rows arrive. Deleting or editing a student, or
+removing an enrollment, forces a full reload. So does
+``ANALYTICS_REBUILD_SECONDS``, which bounds how long changes made by other
+worker processes can go unseen.
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import String, event, func, select, type_coerce
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import settings
+
+LOAD_BATCH_SIZE = 50_000
+
+# Stand-in for a missing registration time: registered before every poll
+_EPOCH = np.datetime64("1970-01-01T00:00:00", "us")
+# poll_section value of campus-wide polls
+_CAMPUS = -1
+
+
+def _datetimes(values) -> np.ndarray:
+    return np.array(values, dtype="datetime64[us]")
+
+
+def _raw(column):
+    """Select a DateTime column without SQLAlchemy's per-row datetime parsing.
+
+    SQLite hands back the stored ISO string, which NumPy parses in bulk far
+    faster than it converts datetime objects; other drivers still return
+    datetimes, which _datetimes accepts too.
+    """
+    return type_coerce(column, String).label(column.key)
+
+
+@dataclass
+class AttendanceData:
+    """Columnar copy of the tables, extended in place by ``load``"""
+    high_water: Tuple[int, int, int, int] = (0, 0, 0, 0)
+    student_ids: np.ndarray = field(default_factory=lambda: np.empty(0, np.int64))
+    student_registered: np.ndarray = field(default_factory=lambda: _datetimes([]))
+    student_department: np.ndarray = field(default_factory=lambda: np.empty(0, np.int32))
+    student_names: List[str] = field(default_factory=list)
+    student_roll_nos: List[str] = field(default_factory=list)
+    departments: List[str] = field(default_factory=list)
+    poll_ids: np.ndarray = field(default_factory=lambda: np.empty(0, np.int64))
+    poll_start: np.ndarray = field(default_factory=lambda: _datetimes([]))
+    poll_created: np.ndarray = field(default_factory=lambda: _datetimes([]))
+    poll_duration: np.ndarray = field(default_factory=lambda: np.empty(0, np.int32))
+    poll_section: np.ndarray = field(default_factory=lambda: np.empty(0, np.int64))
+    enrollment_student: np.ndarray = field(default_factory=lambda: np.empty(0, np.int64))
+    enrollment_section: np.ndarray = field(default_factory=lambda: np.empty(0, np.int64))
+    enrollment_at: np.ndarray = field(default_factory=lambda: _datetimes([]))
+    record_student: np.ndarray = field(default_factory=lambda: np.empty(0, np.int64))
+    record_poll: np.ndarray = field(default_factory=lambda: np.empty(0, np.int64))
+    # Seconds from poll start to mark; NaN when marked_at is missing
+    record_offset: np.ndarray = field(default_factory=lambda: np.empty(0, np.float64))
+
+    def load(self, db: Session, high_water: Tuple[int, int, int, int]) -> None:
+        """Append rows with ids in (self.high_water, high_water]"""
+        (old_student, old_poll, old_record, old_enrollment) = self.high_water
+        (new_student, new_poll, new_record, new_enrollment) = high_water
+        if new_student > old_student:
+            self._load_students(db, old_student, new_student)
+        if new_poll > old_poll:
+            self._load_polls(db, old_poll, new_poll)
+        if new_enrollment > old_enrollment:
+            self._load_enrollments(db, old_enrollment, new_enrollment)
+        if new_record > old_record:
+            self._load_records(db, old_record, new_record)
+        self.high_water = high_water
+
+    def _load_students(self, db: Session, after: int, upto: int) -> None:
+        rows = db.connection().execute(
+            select(
+                models.Student.id,
+                _raw(models.Student.created_at),
+                models.Student.department,
+                models.Student.name,
+                models.Student.roll_no
+            )
+            .where(models.Student.id > after, models.Student.id <= upto)
+            .order_by(models.Student.id)
+        ).all()
+        index = {name: code for code, name in enumerate(self.departments)}
+        codes = []
+        for row in rows:
+            if row.department not in index:
+                index[row.department] = len(self.departments)
+                self.departments.append(row.department)
+            codes.append(index[row.department])
+        registered = _datetimes([row.created_at for row in rows])
+        self.student_ids = np.concatenate([self.student_ids, np.array([row.id for row in rows], np.int64)])
+        self.student_registered = np.concatenate([self.student_registered, np.where(np.isnat(registered), _EPOCH, registered)])
+        self.student_department = np.concatenate([self.student_department, np.array(codes, np.int32)])
+        self.student_names.extend(row.name for row in rows)
+        self.student_roll_nos.extend(row.roll_no for row in rows)
+
+    def _load_polls(self, db: Session, after: int, upto: int) -> None:
+        rows = db.connection().execute(
+            select(
+                models.AttendancePoll.id,
+                _raw(models.AttendancePoll.start_time),
+                _raw(models.AttendancePoll.created_at),
+                models.AttendancePoll.duration_minutes,
+                models.AttendancePoll.section_id
+            )
+            .where(models.AttendancePoll.id > after, models.AttendancePoll.id <= upto)
+            .order_by(models.AttendancePoll.id)
+        ).all()
+        start = _datetimes([row.start_time for row in rows])
+        created = _datetimes([row.created_at for row in rows])
+        self.poll_ids = np.concatenate([self.poll_ids, np.array([row.id for row in rows], np.int64)])
+        self.poll_start = np.concatenate([self.poll_start, start])
+        self.poll_created = np.concatenate([self.poll_created, np.where(np.isnat(created), start, created)])
+        self.poll_duration = np.concatenate([self.poll_duration, np.array([row.duration_minutes for row in rows], np.int32)])
+        self.poll_section = np.concatenate([
+            self.poll_section,
+            np.array([_CAMPUS if row.section_id is None else row.section_id for row in rows], np.int64)
+        ])
+
+    def _load_enrollments(self, db: Session, after: int, upto: int) -> None:
+        rows = db.connection().execute(
+            select(
+                models.Enrollment.student_id,
+                models.Enrollment.section_id,
+                _raw(models.Enrollment.enrolled_at)
+            )
+            .where(models.Enrollment.id > after, models.Enrollment.id <= upto)
+        ).all()
+        self.enrollment_student = np.concatenate([
+            self.enrollment_student,
+            np.searchsorted(self.student_ids, np.array([row.student_id for row in rows], np.int64))
+        ])
+        self.enrollment_section = np.concatenate([
+            self.enrollment_section, np.array([row.section_id for row in rows], np.int64)
+        ])
+        self.enrollment_at = np.concatenate([self.enrollment_at, _datetimes([row.enrolled_at for row in rows])])
+
+    def _load_records(self, db: Session, after: int, upto: int) -> None:
+        result = db.connection().execute(
+            select(
+                models.AttendanceRecord.student_id,
+                models.AttendanceRecord.poll_id,
+                _raw(models.AttendanceRecord.marked_at)
+            )
+            .where(models.AttendanceRecord.id > after, models.AttendanceRecord.id <= upto)
+            .execution_options(yield_per=LOAD_BATCH_SIZE)
+        )
+        students, polls, offsets = [self.record_student], [self.record_poll], [self.record_offset]
+        for rows in result.partitions():
+            student_ids, poll_ids, marked_at = zip(*rows)
+            # Ids are loaded in ascending order, so positions are a binary search away
+            student_idx = np.searchsorted(self.student_ids, np.array(student_ids, np.int64))
+            poll_idx = np.searchsorted(self.poll_ids, np.array(poll_ids, np.int64))
+            elapsed = _datetimes(marked_at) - self.poll_start[poll_idx]
+            students.append(student_idx)
+            polls.append(poll_idx)
+            offsets.append(elapsed / np.timedelta64(1, "s"))
+        self.record_student = np.concatenate(students)
+        self.record_poll = np.concatenate(polls)
+        self.record_offset = np.concatenate(offsets)
+
+
+@dataclass
+class AnalyticsReport:
+    """Every analytics result, computed together from one AttendanceData"""
+    generated_at: datetime
+    turnout: List[dict]
+    departments: List[dict]
+    time_to_mark: dict
+    # Per student, in AttendanceData order
+    current_absence_streak: np.ndarray
+    longest_absence_streak: np.ndarray
+    data: AttendanceData
+
+    def absence_streaks(self, min_current: int, limit: int) -> List[dict]:
+        """Students with at least `min_current` consecutive recent absences, longest first"""
+        candidates = np.flatnonzero(self.current_absence_streak >= min_current)
+        order = np.lexsort((self.data.student_ids[candidates], -self.current_absence_streak[candidates]))
+        return [
+            {
+                "student_id": int(self.data.student_ids[i]),
+                "name": self.data.student_names[i],
+                "roll_no": self.data.student_roll_nos[i],
+                "department": self.data.departments[self.data.student_department[i]],
+                "current_absence_streak": int(self.current_absence_streak[i]),
+                "longest_absence_streak": int(self.longest_absence_streak[i]),
+            }
+            for i in candidates[order[:limit]]
+        ]
+
+
+def _trailing_true(matrix: np.ndarray) -> np.ndarray:
+    """Length of the run of True values ending in each row's last column"""
+    if matrix.shape[1] == 0:
+        return np.zeros(matrix.shape[0], np.int64)
+    broken = ~matrix[:, ::-1]
+    return np.where(broken.any(axis=1), broken.argmax(axis=1), matrix.shape[1])
+
+
+def _compress(matrix: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """Each row's values in its `mask` columns, in order and right-aligned, so
+    runs skip the other columns; the padding on the left is False"""
+    counts = mask.sum(axis=1)
+    width = int(counts.max(initial=0))
+    rows, cols = np.nonzero(mask)
+    ranks = mask.cumsum(axis=1)[rows, cols] - 1
+    compressed = np.zeros((mask.shape[0], width), bool)
+    compressed[rows, ranks + width - counts[rows]] = matrix[rows, cols]
+    return compressed
+
+
+def _longest_true_run(matrix: np.ndarray) -> np.ndarray:
+    """Length of the longest run of True values in each row"""
+    padded = np.zeros((matrix.shape[0], matrix.shape[1] + 2), np.int8)
+    padded[:, 1:-1] = matrix
+    edges = np.diff(padded, axis=1)
+    # Row-major order pairs every run start with its own end
+    start_rows, start_cols = np.nonzero(edges == 1)
+    _, end_cols = np.nonzero(edges == -1)
+    longest = np.zeros(matrix.shape[0], np.int64)
+    np.maximum.at(longest, start_rows, end_cols - start_cols)
+    return longest
+
+
+def compute_report(data: AttendanceData, bin_seconds: int) -> AnalyticsReport:
+    n_students, n_polls = len(data.student_ids), len(data.poll_ids)
+    # Columns in chronological order of poll start
+    chronological = np.lexsort((data.poll_ids, data.poll_start))
+    column = np.empty(n_polls, np.int64)
+    column[chronological] = np.arange(n_polls)
+    record_column = column[data.record_poll]
+
+    present = np.zeros((n_students, n_polls), bool)
+    present[data.record_student, record_column] = True
+    # Same rule as the student rollups: a campus-wide poll counts if the
+    # student was registered when it was created, a section poll if they were
+    # enrolled in the section by then, and any poll they attended counts
+    created = data.poll_created[chronological]
+    section = data.poll_section[chronological]
+    eligible = ((section == _CAMPUS)[None, :] & (created[None, :] >= data.student_registered[:, None])) | present
+    for section_id in np.unique(section[section != _CAMPUS]):
+        columns = np.flatnonzero(section == section_id)
+        enrolled = np.flatnonzero(data.enrollment_section == section_id)
+        eligible[np.ix_(data.enrollment_student[enrolled], columns)] |= (
+            created[columns][None, :] >= data.enrollment_at[enrolled][:, None]
+        )
+    present_count = present.sum(axis=0)
+    eligible_count = eligible.sum(axis=0)
+
+    # Turnout curves: cumulative marks per time bin since each poll started
+    offsets = data.record_offset
+    marked = ~np.isnan(offsets)
+    n_bins = int(np.ceil(data.poll_duration.max() * 60 / bin_seconds)) + 1 if n_polls else 1
+    bins = np.clip(np.floor(np.nan_to_num(offsets, nan=0) / bin_seconds), 0, n_bins - 1).astype(np.int64)
+    curves = np.bincount(
+        record_column * n_bins + bins,
+        minlength=n_polls * n_bins
+    ).reshape(n_polls, n_bins).cumsum(axis=1)
+
+    # Median time-to-mark per poll from one sort by (poll, offset)
+    by_poll = np.lexsort((offsets[marked], record_column[marked]))
+    sorted_offsets = offsets[marked][by_poll]
+    marked_count = np.bincount(record_column[marked], minlength=n_polls)
+    first = np.concatenate([[0], np.cumsum(marked_count)[:-1]]).astype(np.int64)
+    middle = first + (marked_count - 1) // 2
+
+    start = data.poll_start[chronological]
+    duration = data.poll_duration[chronological]
+    poll_ids = data.poll_ids[chronological]
+    turnout = [
+        {
+            "poll_id": int(poll_ids[c]),
+            "start_time": start[c].astype(datetime),
+            "eligible": int(eligible_count[c]),
+            "present": int(present_count[c]),
+            "turnout_percentage": round(float(present_count[c] / eligible_count[c] * 100), 2) if eligible_count[c] else None,
+            "median_seconds_to_mark": float(sorted_offsets[middle[c]]) if marked_count[c] else None,
+            "bin_seconds": bin_seconds,
+            "cumulative_present": curves[c, :int(np.ceil(duration[c] * 60 / bin_seconds)) + 1].tolist(),
+        }
+        for c in range(n_polls)
+    ]
+
+    # Department trends: one matrix product per measure over a one-hot roster
+    one_hot = (data.student_department[None, :] == np.arange(len(data.departments))[:, None]).astype(np.float32)
+    department_present = one_hot @ present.astype(np.float32)
+    department_eligible = one_hot @ eligible.astype(np.float32)
+    departments = [
+        {
+            "department": name,
+            "students": int(one_hot[d].sum()),
+            "points": [
+                {
+                    "poll_id": int(poll_ids[c]),
+                    "start_time": start[c].astype(datetime),
+                    "eligible": int(department_eligible[d, c]),
+                    "present": int(department_present[d, c]),
+                    "percentage": round(float(department_present[d, c] / department_eligible[d, c] * 100), 2)
+                    if department_eligible[d, c] else None,
+                }
+                for c in range(n_polls)
+            ],
+        }
+        for d, name in sorted(enumerate(data.departments), key=lambda item: item[1])
+    ]
+
+    # Streaks run over each student's own polls: a section poll they are not
+    # on the roster of neither extends nor breaks one
+    absent = _compress(~present, eligible)
+    histogram = np.bincount(bins[marked], minlength=n_bins)
+    percentiles = np.percentile(offsets[marked], [50, 90, 99]) if marked.any() else [None] * 3
+    time_to_mark = {
+        "count": int(marked.sum()),
+        "p50_seconds": None if percentiles[0] is None else float(percentiles[0]),
+        "p90_seconds": None if percentiles[1] is None else float(percentiles[1]),
+        "p99_seconds": None if percentiles[2] is None else float(percentiles[2]),
+        "bin_seconds": bin_seconds,
+        "histogram": histogram.tolist(),
+    }
+
+    return AnalyticsReport(
+        generated_at=datetime.utcnow(),
+        turnout=turnout,
+        departments=departments,
+        time_to_mark=time_to_mark,
+        current_absence_streak=_trailing_true(absent),
+        longest_absence_streak=_longest_true_run(absent),
+        data=data,
+    )
+
+
+class AttendanceAnalytics:
+    def __init__(self, bin_seconds: int, rebuild_seconds: float):
+        self.bin_seconds = bin_seconds
+        self.rebuild_seconds = rebuild_seconds
+        self._lock = threading.Lock()
+        self._data = AttendanceData()
+        self._loaded_at = 0.0
+        self._report: Optional[AnalyticsReport] = None
+        self._stale = False
+
+    def invalidate(self) -> None:
+        """Discard the loaded data; the next report reloads every table"""
+        self._stale = True
+
+    def report(self, db: Session) -> AnalyticsReport:
+        """Current report, loading only rows added since the last call"""
+        high_water = tuple(db.execute(select(
+            select(func.coalesce(func.max(models.Student.id), 0)).scalar_subquery(),
+            select(func.coalesce(func.max(models.AttendancePoll.id), 0)).scalar_subquery(),
+            select(func.coalesce(func.max(models.AttendanceRecord.id), 0)).scalar_subquery(),
+            select(func.coalesce(func.max(models.Enrollment.id), 0)).scalar_subquery()
+        )).one())
+        with self._lock:
+            if self._stale or time.monotonic() - self._loaded_at > self.rebuild_seconds:
+                self._stale = False
+                self._data = AttendanceData()
+                self._loaded_at = time.monotonic()
+                self._report = None
+            if self._report is None or high_water != self._data.high_water:
+                self._data.load(db, high_water)
+                self._report = compute_report(self._data, self.bin_seconds)
+            return self._report
+
+
+attendance_analytics = AttendanceAnalytics(
+    bin_seconds=settings.ANALYTICS_TURNOUT_BIN_SECONDS,
+    rebuild_seconds=settings.ANALYTICS_REBUILD_SECONDS
+)
+
+
+# Appending new rows cannot reflect deleted or edited students (or the
+# records deleted with them) or removed enrollments, so those force a full reload
+@event.listens_for(Session, "after_flush")
+def _track_student_changes(session, flush_context):
+    if any(isinstance(obj, models.Student) for obj in (*session.dirty, *session.deleted)) or any(
+        isinstance(obj, models.Enrollment) for obj in session.deleted
+    ):
+        session.info["students_changed"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_student_statements(orm_execute_state):
+    # Bulk UPDATE/DELETE statements (e.g. a roster import) bypass the unit of work
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = orm_execute_state.statement.table.name
+    if table == models.Student.__tablename__ or (
+        orm_execute_state.is_delete and table == models.Enrollment.__tablename__
+    ):
+        orm_execute_state.session.info["students_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop("students_changed", False):
+        attendance_analytics.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop("students_changed", None)
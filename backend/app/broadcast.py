@@ -0,0 +1,92 @@
+"""
+Fan-out of live poll status to streaming subscribers
+
+A single producer task computes the status once per tick and hands the same
+encoded payload to every subscriber queue, so the database cost of the stream
+is independent of the number of open connections. The producer only runs
+while at least one subscriber is connected. A tick whose computation fails
+is logged and skipped, and the next tick tries again. ``on_idle`` is called
+with the broadcaster when its last subscriber leaves.
+
+With ``keepalive`` set, subscribers also get None after that many seconds
+without a new status. ``sse_events`` sends it as a comment, which keeps
+proxies from closing an idle stream.
+"""
+import asyncio
+import logging
+from typing import AsyncIterator, Callable, Optional, Set
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+
+class PollStatusBroadcaster:
+    def __init__(
+        self,
+        compute: Callable[[], str],
+        interval: float = 1.0,
+        keepalive: Optional[float] = None,
+        on_idle: Optional[Callable[["PollStatusBroadcaster"], None]] = None
+    ):
+        self.compute = compute
+        self.interval = interval
+        self.keepalive = keepalive
+        self.on_idle = on_idle
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._latest: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, payload: str) -> None:
+        """Deliver a payload to every subscriber, replacing any unread stale one"""
+        self._latest = payload
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(payload)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                payload = await run_in_threadpool(self.compute)
+            except Exception:
+                logger.exception("Poll status computation failed")
+            else:
+                if payload != self._latest:
+                    self.publish(payload)
+            await asyncio.sleep(self.interval)
+
+    async def subscribe(self) -> AsyncIterator[Optional[str]]:
+        """Yield encoded status payloads, or None when a keepalive is due, until
+        the consumer stops iterating"""
+        # Subscribers only ever need the newest status, so one slot is enough
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        if self._latest is not None:
+            queue.put_nowait(self._latest)
+        self._subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), self.keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            self._subscribers.discard(queue)
+            if not self._subscribers and self._task is not None:
+                self._task.cancel()
+                self._task = None
+                self._latest = None
+            if not self._subscribers and self.on_idle is not None:
+                self.on_idle(self)
+
+
+async def sse_events(payloads: AsyncIterator[Optional[str]]) -> AsyncIterator[str]:
+    """Frame payloads as Server-Sent Events, and None as a keepalive comment"""
+    async for payload in payloads:
+        yield ": keepalive\n\n" if payload is None else f"data: {payload}\n\n"
@@ -3,11 +3,97 @@ from typing import List
 
 class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite:///./classcheck.db"
+    # Optional explicit async URL; derived from DATABASE_URL when empty
+    ASYNC_DATABASE_URL: str = ""
+    # Comma-separated read-only replicas of DATABASE_URL (e.g. a SQLite copy
+    # opened as "sqlite:///file:replica.db?mode=ro&uri=true"). The read-only
+    # list/detail endpoints are spread over them. A client that has just
+    # marked attendance, and echoes the X-Read-Primary-Until header it got
+    # back, reads from the primary for READ_YOUR_WRITES_SECONDS, which should
+    # exceed the replicas' lag. Cached replica responses expire after it too.
+    DATABASE_REPLICA_URLS: str = ""
+    READ_YOUR_WRITES_SECONDS: float = 10.0
+    # SQLite performance profile, applied to every new connection. Set
+    # SQLITE_TUNING=false to run with SQLite's own defaults (rollback journal,
+    # synchronous=FULL).
+    SQLITE_TUNING: bool = True
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE_KB: int = 16384
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    # Connection pool per engine (per worker process)
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    # Write-behind marking (see app/write_behind.py)
+    WRITE_BEHIND_ENABLED: bool = False
+    WRITE_BEHIND_FLUSH_INTERVAL_MS: int = 50
+    WRITE_BEHIND_MAX_BATCH: int = 500
+    WRITE_BEHIND_DURABILITY: str = "journal"  # memory | journal | fsync
+    WRITE_BEHIND_JOURNAL_DIR: str = "./classcheck-journal"
     SECRET_KEY: str = "your-secret-key"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     CORS_ORIGINS: str = "http://localhost:3000,https://classcheck-frontend-production.up.railway.app,https://*.up.railway.app"
     ENV: str = "development"
+    # State shared by the workers (see app/state_backend.py): rate-limit
+    # buckets, idempotency records, write-behind dedupe, cache versions and
+    # poll events. memory: one worker (cache versions still reach the other
+    # workers on the host); sqlite: any number of workers or containers
+    # sharing STATE_BACKEND_PATH. Both default to files in STATE_DIR (the
+    # system temp dir) derived from DATABASE_URL.
+    STATE_BACKEND: str = "memory"
+    STATE_BACKEND_PATH: str = ""
+    STATE_DIR: str = ""
+    STATE_MAX_KEYS: int = 100_000
+    # How often each worker checks the backend for poll events
+    STATE_SUBSCRIBE_INTERVAL_SECONDS: float = 0.2
+    # How often the poll status stream recomputes and pushes the live status
+    POLL_STREAM_INTERVAL_SECONDS: float = 1.0
+    # A stream with no new status this long gets an SSE comment, so proxies
+    # do not drop it as idle
+    POLL_STREAM_KEEPALIVE_SECONDS: float = 15.0
+    # Background poll expiry (see app/poll_expiry.py). Polls are closed this
+    # long after end_time, so marks accepted just before the deadline
+    # (including queued write-behind marks) land before the count is taken.
+    # Deadlines of polls started by other workers are reloaded every
+    # POLL_EXPIRY_RESYNC_SECONDS.
+    POLL_EXPIRY_ENABLED: bool = True
+    POLL_EXPIRY_GRACE_SECONDS: float = 5.0
+    POLL_EXPIRY_RESYNC_SECONDS: float = 60.0
+    # Analytics snapshot (see app/analytics.py): turnout curve resolution and
+    # how often the columnar data is reloaded from scratch
+    ANALYTICS_TURNOUT_BIN_SECONDS: int = 30
+    ANALYTICS_REBUILD_SECONDS: float = 3600.0
+    # ETag response cache for list/log endpoints (see app/response_cache.py).
+    # Entries are dropped on writes to their tables; the TTL bounds staleness
+    # from writes made outside a Session. Logs of closed polls only change
+    # when the roster does, so they get the long TTL.
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1024
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    RESPONSE_CACHE_TTL_SECONDS: float = 30.0
+    RESPONSE_CACHE_CLOSED_POLL_TTL_SECONDS: float = 86400.0
+    # Encode list responses straight from SQL rows with orjson (see app/fast_json.py)
+    FAST_JSON_ENABLED: bool = False
+    # Request/SQL metrics at /metrics and in Server-Timing headers (see
+    # app/metrics.py); statements at least this slow are logged, 0 disables
+    METRICS_ENABLED: bool = True
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0
+    # Token buckets on POST /attendance/mark (see app/rate_limit.py), per
+    # student and per client address; a campus NAT puts many students behind
+    # one address, so the client bucket is wide
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_STUDENT_RATE: float = 1.0
+    RATE_LIMIT_STUDENT_BURST: float = 5.0
+    RATE_LIMIT_CLIENT_RATE: float = 50.0
+    RATE_LIMIT_CLIENT_BURST: float = 200.0
+    # Replayed responses for Idempotency-Key on POST /attendance/mark (see
+    # app/idempotency.py)
+    IDEMPOTENCY_TTL_SECONDS: float = 3600.0
+    # Validate marks against the in-memory roster instead of querying
+    # students (see app/roster_index.py); built at startup
+    ROSTER_INDEX_ENABLED: bool = True
     
     class Config:
         env_file = ".env"
@@ -16,4 +102,8 @@ class Settings(BaseSettings):
     def cors_origins_list(self) -> List[str]:
         return [origin.strip() for origin in self.CORS_ORIGINS.split(",")]
 
+    @property
+    def replica_urls_list(self) -> List[str]:
+        return [url.strip() for url in self.DATABASE_REPLICA_URLS.split(",") if url.strip()]
+
 settings = Settings()
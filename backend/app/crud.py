@@ -1,12 +1,46 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, bindparam, exists, func, insert, literal, or_, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql import Insert
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 from . import models, schemas
+from .pagination import Cursor
+from .poll_cache import PollSnapshot, cache as poll_cache
+from .response_cache import CLOSED_POLL_RECORDS, mark_written
+from .roster_index import RosterEntry, roster_index
+
+# Columns for the row-returning list queries, in the field order of the
+# matching response schema so rows can be encoded as-is
+STUDENT_COLUMNS = (
+    models.Student.name,
+    models.Student.roll_no,
+    models.Student.department,
+    models.Student.id,
+    models.Student.created_at
+)
+POLL_COLUMNS = (
+    models.AttendancePoll.id,
+    models.AttendancePoll.start_time,
+    models.AttendancePoll.end_time,
+    models.AttendancePoll.duration_minutes,
+    models.AttendancePoll.is_active,
+    models.AttendancePoll.created_at,
+    models.AttendancePoll.section_id,
+    models.AttendancePoll.present_count
+)
+RECORD_COLUMNS = (
+    models.AttendanceRecord.id,
+    models.AttendanceRecord.student_id,
+    models.AttendanceRecord.poll_id,
+    models.AttendanceRecord.marked_at
+)
 
 # Student CRUD Operations
 def create_student(db: Session, student: schemas.StudentCreate) -> models.Student:
-    db_student = models.Student(**student.dict())
+    db_student = models.Student(**student.dict(), stats=models.StudentStats())
     db.add(db_student)
     db.commit()
     db.refresh(db_student)
@@ -18,8 +52,46 @@ def get_student(db: Session, student_id: int) -> Optional[models.Student]:
 def get_student_by_roll_no(db: Session, roll_no: str) -> Optional[models.Student]:
     return db.query(models.Student).filter(models.Student.roll_no == roll_no).first()
 
-def get_students(db: Session, skip: int = 0, limit: int = 100) -> List[models.Student]:
-    return db.query(models.Student).offset(skip).limit(limit).all()
+def get_roster_rows(db: Session) -> List[Tuple[int, str, str]]:
+    """(id, name, roll_no) of every student, for the roster index"""
+    return [tuple(row) for row in db.execute(
+        select(models.Student.id, models.Student.name, models.Student.roll_no).order_by(models.Student.id)
+    )]
+
+def get_roster_entry(db: Session, student_id: int) -> Optional[RosterEntry]:
+    """The student's id, name and roll_no from the roster index, or from the
+    students table when the index does not have them or is being reloaded"""
+    entry = roster_index.get(student_id)
+    if entry is not None:
+        return entry
+    student = get_student(db, student_id)
+    return RosterEntry(student.id, student.name, student.roll_no) if student is not None else None
+
+def _students_page(db: Session, entities, skip: int, limit: int, after: Optional[Cursor]) -> list:
+    query = db.query(*entities).order_by(models.Student.created_at, models.Student.id)
+    if after is not None:
+        # Keyset pagination: continue after the last (created_at, id) seen
+        return query.filter(
+            tuple_(models.Student.created_at, models.Student.id) > tuple_(*after)
+        ).limit(limit).all()
+    return query.offset(skip).limit(limit).all()
+
+def get_students(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[Cursor] = None
+) -> List[models.Student]:
+    return _students_page(db, (models.Student,), skip, limit, after)
+
+def get_student_rows(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[Cursor] = None
+) -> List[Row]:
+    """Like get_students, as plain rows in StudentResponse field order"""
+    return _students_page(db, STUDENT_COLUMNS, skip, limit, after)
 
 def update_student(db: Session, student_id: int, student: schemas.StudentUpdate) -> Optional[models.Student]:
     db_student = get_student(db, student_id)
@@ -39,73 +111,744 @@ def delete_student(db: Session, student_id: int) -> bool:
         return True
     return False
 
+def bulk_upsert_students(
+    db: Session,
+    students: List[schemas.StudentCreate],
+    update_existing: bool = False
+) -> Dict[str, str]:
+    """Insert many students in one transaction with a single roll_no lookup.
+
+    Returns the outcome per roll number: "created", "updated" (only when
+    update_existing) or "exists" for a roll number that is already registered.
+    """
+    existing = dict(db.execute(
+        select(models.Student.roll_no, models.Student.id).where(
+            models.Student.roll_no.in_([student.roll_no for student in students])
+        )
+    ).all())
+
+    outcome = {}
+    new_rows = []
+    updates = []
+    for student in students:
+        if student.roll_no not in existing:
+            new_rows.append({**student.model_dump(), "created_at": datetime.utcnow()})
+        elif update_existing:
+            updates.append({"id": existing[student.roll_no], "name": student.name, "department": student.department})
+            outcome[student.roll_no] = "updated"
+        else:
+            outcome[student.roll_no] = "exists"
+
+    if new_rows:
+        stmt = _insert_ignoring_duplicates(db, models.Student)
+        if stmt is None:
+            db.execute(insert(models.Student), new_rows)
+            inserted = [row["roll_no"] for row in new_rows]
+        else:
+            # Rows registered concurrently since the lookup are skipped, not fatal
+            inserted = db.scalars(stmt.returning(models.Student.roll_no), new_rows).all()
+        outcome.update((row["roll_no"], "exists") for row in new_rows)
+        outcome.update((roll_no, "created") for roll_no in inserted)
+        if inserted:
+            db.execute(insert(models.StudentStats).from_select(
+                ["student_id"],
+                select(models.Student.id).where(models.Student.roll_no.in_(inserted))
+            ))
+    if updates:
+        db.execute(update(models.Student), updates)
+    db.commit()
+    return outcome
+
+# Course and Section Operations
+def create_course(db: Session, course: schemas.CourseCreate) -> models.Course:
+    db_course = models.Course(**course.model_dump())
+    db.add(db_course)
+    db.commit()
+    db.refresh(db_course)
+    return db_course
+
+def get_course(db: Session, course_id: int) -> Optional[models.Course]:
+    return db.get(models.Course, course_id)
+
+def get_course_by_code(db: Session, code: str) -> Optional[models.Course]:
+    return db.query(models.Course).filter(models.Course.code == code).first()
+
+def get_courses(db: Session, skip: int = 0, limit: int = 100) -> List[models.Course]:
+    return db.query(models.Course).order_by(models.Course.code).offset(skip).limit(limit).all()
+
+def create_section(db: Session, course_id: int, section: schemas.SectionCreate) -> models.Section:
+    db_section = models.Section(course_id=course_id, **section.model_dump())
+    db.add(db_section)
+    db.commit()
+    db.refresh(db_section)
+    return db_section
+
+def get_section(db: Session, section_id: int) -> Optional[models.Section]:
+    return db.get(models.Section, section_id)
+
+def get_sections(db: Session, course_id: int) -> List[models.Section]:
+    return db.query(models.Section).filter(models.Section.course_id == course_id).order_by(models.Section.id).all()
+
+def enroll_students(db: Session, section_id: int, student_ids: List[int]) -> List[int]:
+    """Add students to a section's roster; returns the ids that were not enrolled yet"""
+    known = set(db.scalars(select(models.Student.id).where(models.Student.id.in_(student_ids))))
+    enrolled = set(db.scalars(
+        select(models.Enrollment.student_id).where(
+            models.Enrollment.section_id == section_id,
+            models.Enrollment.student_id.in_(student_ids)
+        )
+    ))
+    added = sorted(known - enrolled)
+    if added:
+        now = datetime.utcnow()
+        db.execute(insert(models.Enrollment), [
+            {"section_id": section_id, "student_id": student_id, "enrolled_at": now}
+            for student_id in added
+        ])
+    db.commit()
+    return added
+
+def unenroll_student(db: Session, section_id: int, student_id: int) -> bool:
+    enrollment = db.query(models.Enrollment).filter(
+        models.Enrollment.section_id == section_id,
+        models.Enrollment.student_id == student_id
+    ).first()
+    if enrollment is None:
+        return False
+    db.delete(enrollment)
+    db.commit()
+    return True
+
+def is_enrolled(db: Session, section_id: int, student_id: int) -> bool:
+    return db.scalar(select(exists().where(
+        models.Enrollment.section_id == section_id,
+        models.Enrollment.student_id == student_id
+    )))
+
+def get_section_roster(
+    db: Session,
+    section_id: int,
+    limit: int = 100,
+    after: Optional[Cursor] = None
+) -> List[models.Student]:
+    """Enrolled students in roster order (created_at, id)"""
+    query = db.query(models.Student).join(
+        models.Enrollment, models.Enrollment.student_id == models.Student.id
+    ).filter(models.Enrollment.section_id == section_id)
+    if after is not None:
+        query = query.filter(tuple_(models.Student.created_at, models.Student.id) > tuple_(*after))
+    return query.order_by(models.Student.created_at, models.Student.id).limit(limit).all()
+
+def get_student_section_ids(db: Session, student_id: int) -> List[int]:
+    return list(db.scalars(
+        select(models.Enrollment.section_id)
+        .where(models.Enrollment.student_id == student_id)
+        .order_by(models.Enrollment.section_id)
+    ))
+
 # Attendance Poll CRUD Operations
-def create_poll(db: Session, duration_minutes: int) -> models.AttendancePoll:
+def _same_section(section_id: Optional[int]):
+    if section_id is None:
+        return models.AttendancePoll.section_id.is_(None)
+    return models.AttendancePoll.section_id == section_id
+
+def create_poll(db: Session, duration_minutes: int, section_id: Optional[int] = None) -> models.AttendancePoll:
+    """Start a poll for a section, or campus-wide if section_id is None.
+
+    Each section (and the campus) has at most one active poll; polls of other
+    sections are not affected.
+    """
     start_time = datetime.utcnow()
     end_time = start_time + timedelta(minutes=duration_minutes)
     
-    # Deactivate any existing active polls
+    # Close the section's existing active poll
     db.query(models.AttendancePoll).filter(
-        models.AttendancePoll.is_active == True
-    ).update({"is_active": False})
+        models.AttendancePoll.is_active == True,
+        _same_section(section_id)
+    ).update({"is_active": False, "present_count": _present_count()}, synchronize_session=False)
+    _count_new_poll(db, section_id)
     
     db_poll = models.AttendancePoll(
+        section_id=section_id,
         start_time=start_time,
         end_time=end_time,
         duration_minutes=duration_minutes,
         is_active=True
     )
     db.add(db_poll)
-    db.commit()
+    db.commit()  # invalidates the poll cache (see poll_cache._invalidate_after_commit)
     db.refresh(db_poll)
     return db_poll
 
-def get_active_poll(db: Session) -> Optional[models.AttendancePoll]:
-    now = datetime.utcnow()
+def get_active_poll(db: Session, section_id: Optional[int] = None) -> Optional[models.AttendancePoll]:
+    """The section's open poll. Polls are closed by the expiry scheduler, so
+    this is an equality lookup; callers that must not see a poll between its
+    deadline and the scheduler's next tick check ``end_time`` themselves."""
     return db.query(models.AttendancePoll).filter(
-        and_(
-            models.AttendancePoll.is_active == True,
-            models.AttendancePoll.start_time <= now,
-            models.AttendancePoll.end_time >= now
-        )
+        models.AttendancePoll.is_active == True,
+        _same_section(section_id)
     ).first()
 
 def get_poll(db: Session, poll_id: int) -> Optional[models.AttendancePoll]:
     return db.query(models.AttendancePoll).filter(models.AttendancePoll.id == poll_id).first()
 
-def get_polls(db: Session, skip: int = 0, limit: int = 50) -> List[models.AttendancePoll]:
-    return db.query(models.AttendancePoll).order_by(
-        models.AttendancePoll.created_at.desc()
-    ).offset(skip).limit(limit).all()
+def get_cached_active_poll(db: Session, section_id: Optional[int] = None) -> Optional[PollSnapshot]:
+    return poll_cache.get_active(
+        section_id, lambda: get_active_poll(db, section_id), store=not db.info.get("read_replica")
+    )
+
+def get_cached_poll(db: Session, poll_id: int) -> Optional[PollSnapshot]:
+    return poll_cache.get_poll(poll_id, lambda: get_poll(db, poll_id), store=not db.info.get("read_replica"))
+
+def _present_count():
+    """Marks of the attendance_polls row being updated"""
+    return select(func.count()).where(
+        models.AttendanceRecord.poll_id == models.AttendancePoll.id
+    ).scalar_subquery()
+
+def get_poll_deadlines(db: Session) -> List[Tuple[datetime, int]]:
+    """(end_time, id) of every open poll"""
+    return [tuple(row) for row in db.execute(
+        select(models.AttendancePoll.end_time, models.AttendancePoll.id).where(
+            models.AttendancePoll.is_active == True
+        )
+    )]
+
+def close_expired_polls(db: Session, ended_by: datetime) -> List[Row]:
+    """Close open polls that ended by `ended_by`, recording their final
+    present_count; returns (id, section_id) of the polls closed"""
+    closed = db.execute(
+        select(models.AttendancePoll.id, models.AttendancePoll.section_id).where(
+            models.AttendancePoll.is_active == True,
+            models.AttendancePoll.end_time <= ended_by
+        )
+    ).all()
+    if closed:
+        db.execute(
+            update(models.AttendancePoll)
+            .where(
+                models.AttendancePoll.id.in_([row.id for row in closed]),
+                models.AttendancePoll.is_active == True
+            )
+            .values(is_active=False, present_count=_present_count())
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()  # invalidates the poll and response caches
+    return closed
+
+def _polls_page(db: Session, entities, skip: int, limit: int, before: Optional[Cursor]) -> list:
+    query = db.query(*entities).order_by(
+        models.AttendancePoll.created_at.desc(),
+        models.AttendancePoll.id.desc()
+    )
+    if before is not None:
+        return query.filter(
+            tuple_(models.AttendancePoll.created_at, models.AttendancePoll.id) < tuple_(*before)
+        ).limit(limit).all()
+    return query.offset(skip).limit(limit).all()
+
+def get_polls(
+    db: Session,
+    skip: int = 0,
+    limit: int = 50,
+    before: Optional[Cursor] = None
+) -> List[models.AttendancePoll]:
+    return _polls_page(db, (models.AttendancePoll,), skip, limit, before)
+
+def get_poll_rows(
+    db: Session,
+    skip: int = 0,
+    limit: int = 50,
+    before: Optional[Cursor] = None
+) -> List[Row]:
+    """Like get_polls, as plain rows in PollResponse field order"""
+    return _polls_page(db, POLL_COLUMNS, skip, limit, before)
+
+def get_poll_timeline(db: Session) -> List[Row]:
+    """(id, start_time) of every poll, oldest first"""
+    return db.execute(
+        select(models.AttendancePoll.id, models.AttendancePoll.start_time)
+        .order_by(models.AttendancePoll.created_at, models.AttendancePoll.id)
+    ).all()
+
+def get_poll_ids_in_range(db: Session, first_poll_id: int, last_poll_id: int) -> List[int]:
+    return db.scalars(
+        select(models.AttendancePoll.id)
+        .where(models.AttendancePoll.id.between(first_poll_id, last_poll_id))
+        .order_by(models.AttendancePoll.id)
+    ).all()
 
 # Attendance Record CRUD Operations
-def mark_attendance(db: Session, student_id: int, poll_id: int) -> models.AttendanceRecord:
-    # Check if already marked
-    existing = db.query(models.AttendanceRecord).filter(
+def _insert_ignoring_duplicates(db: Session, model) -> Optional[Insert]:
+    """INSERT ... ON CONFLICT DO NOTHING for dialects that support it, else None"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        return sqlite.insert(model).on_conflict_do_nothing()
+    if dialect == "postgresql":
+        return postgresql.insert(model).on_conflict_do_nothing()
+    return None
+
+def _get_attendance_record(db: Session, student_id: int, poll_id: int) -> Optional[models.AttendanceRecord]:
+    return db.query(models.AttendanceRecord).filter(
         and_(
             models.AttendanceRecord.student_id == student_id,
             models.AttendanceRecord.poll_id == poll_id
         )
     ).first()
-    
-    if existing:
-        return existing
-    
-    db_record = models.AttendanceRecord(
-        student_id=student_id,
-        poll_id=poll_id
-    )
-    db.add(db_record)
+
+def mark_attendance(db: Session, student_id: int, poll_id: int) -> models.AttendanceRecord:
+    stmt = _insert_ignoring_duplicates(db, models.AttendanceRecord)
+    if stmt is None:
+        # Generic fallback: rely on the unique index to reject a concurrent duplicate
+        db_record = models.AttendanceRecord(student_id=student_id, poll_id=poll_id)
+        db.add(db_record)
+        try:
+            db.flush()
+        except IntegrityError:
+            db.rollback()
+            return _get_attendance_record(db, student_id, poll_id)
+        _count_marks(db, [(student_id, poll_id)])
+        db.commit()
+        db.refresh(db_record)
+        return db_record
+
+    db_record = db.scalars(
+        stmt.values(
+            student_id=student_id,
+            poll_id=poll_id,
+            marked_at=datetime.utcnow()
+        ).returning(models.AttendanceRecord)
+    ).first()
+    if db_record is None:
+        # Already marked (possibly by another worker); release the write lock
+        # taken by the no-op INSERT and return the existing record
+        db.commit()
+        return _get_attendance_record(db, student_id, poll_id)
+
+    # Detach so commit does not expire the RETURNING values and force a reload
+    db.expunge(db_record)
+    _count_marks(db, [(student_id, poll_id)])
     db.commit()
-    db.refresh(db_record)
     return db_record
 
+def insert_attendance_records(db: Session, records: List[dict]) -> None:
+    """Insert prepared records in one transaction, skipping ones already present"""
+    stmt = _insert_ignoring_duplicates(db, models.AttendanceRecord)
+    if stmt is None:
+        inserted = []
+        for record in records:
+            if _get_attendance_record(db, record["student_id"], record["poll_id"]) is None:
+                db.add(models.AttendanceRecord(**record))
+                inserted.append((record["student_id"], record["poll_id"]))
+    else:
+        inserted = db.execute(
+            stmt.returning(models.AttendanceRecord.student_id, models.AttendanceRecord.poll_id),
+            records
+        ).all()
+    _count_marks(db, inserted)
+    if inserted:
+        # Queued or replayed journal records can land after their poll closed
+        late = db.execute(
+            update(models.AttendancePoll)
+            .where(
+                models.AttendancePoll.id.in_({poll_id for _, poll_id in inserted}),
+                models.AttendancePoll.is_active == False
+            )
+            .values(present_count=_present_count())
+            .execution_options(synchronize_session=False)
+        )
+        if late.rowcount:
+            mark_written(db, CLOSED_POLL_RECORDS)
+    db.commit()
+
+def mark_attendance_batch(db: Session, pairs: List[Tuple[int, int]]) -> List[dict]:
+    """Mark many (student_id, poll_id) pairs using set-based lookups and one commit.
+
+    Returns one result per input pair, in input order, with a status of
+    "created", "duplicate" or "rejected".
+    """
+    student_ids = {student_id for student_id, _ in pairs}
+    poll_ids = {poll_id for _, poll_id in pairs}
+
+    known_students = set(db.scalars(
+        select(models.Student.id).where(models.Student.id.in_(student_ids))
+    ))
+    polls = {
+        row.id: row
+        for row in db.execute(
+            select(
+                models.AttendancePoll.id,
+                models.AttendancePoll.section_id,
+                models.AttendancePoll.start_time,
+                models.AttendancePoll.end_time,
+                models.AttendancePoll.is_active
+            ).where(models.AttendancePoll.id.in_(poll_ids))
+        )
+    }
+    section_ids = {poll.section_id for poll in polls.values() if poll.section_id is not None}
+    enrolled = set()
+    if section_ids:
+        enrolled = set(db.execute(
+            select(models.Enrollment.section_id, models.Enrollment.student_id).where(
+                and_(
+                    models.Enrollment.section_id.in_(section_ids),
+                    models.Enrollment.student_id.in_(student_ids)
+                )
+            )
+        ).tuples())
+    existing = {
+        (row.student_id, row.poll_id): row.id
+        for row in db.execute(
+            select(
+                models.AttendanceRecord.id,
+                models.AttendanceRecord.student_id,
+                models.AttendanceRecord.poll_id
+            ).where(
+                and_(
+                    models.AttendanceRecord.poll_id.in_(poll_ids),
+                    models.AttendanceRecord.student_id.in_(student_ids)
+                )
+            )
+        )
+    }
+
+    now = datetime.utcnow()
+    results = []
+    pending = {}
+    for student_id, poll_id in pairs:
+        result = {"student_id": student_id, "poll_id": poll_id}
+        poll = polls.get(poll_id)
+        key = (student_id, poll_id)
+        if student_id not in known_students:
+            result.update(status="rejected", detail="Student not found")
+        elif poll is None:
+            result.update(status="rejected", detail="Poll not found")
+        elif not poll.is_active or now < poll.start_time or now > poll.end_time:
+            result.update(status="rejected", detail="Poll has expired or not yet started")
+        elif poll.section_id is not None and (poll.section_id, student_id) not in enrolled:
+            result.update(status="rejected", detail="Student is not enrolled in the poll's section")
+        elif key in existing or key in pending:
+            result.update(status="duplicate")
+        else:
+            pending[key] = models.AttendanceRecord(
+                student_id=student_id,
+                poll_id=poll_id,
+                marked_at=now
+            )
+            result.update(status="created")
+        results.append(result)
+
+    if pending:
+        stmt = _insert_ignoring_duplicates(db, models.AttendanceRecord)
+        if stmt is None:
+            db.add_all(pending.values())
+            db.flush()
+            existing.update({key: record.id for key, record in pending.items()})
+            _count_marks(db, list(pending))
+        else:
+            inserted = db.execute(
+                stmt.returning(
+                    models.AttendanceRecord.id,
+                    models.AttendanceRecord.student_id,
+                    models.AttendanceRecord.poll_id
+                ),
+                [
+                    {"student_id": r.student_id, "poll_id": r.poll_id, "marked_at": r.marked_at}
+                    for r in pending.values()
+                ]
+            ).all()
+            existing.update({(row.student_id, row.poll_id): row.id for row in inserted})
+            _count_marks(db, [(row.student_id, row.poll_id) for row in inserted])
+            raced = [key for key in pending if key not in existing]
+            for key in raced:
+                # Inserted by a concurrent request between our lookup and insert
+                existing[key] = _get_attendance_record(db, *key).id
+            raced = set(raced)
+            for result in results:
+                if (result["student_id"], result["poll_id"]) in raced:
+                    result["status"] = "duplicate"
+        db.commit()
+
+    for result in results:
+        if result["status"] != "rejected":
+            result["record_id"] = existing[(result["student_id"], result["poll_id"])]
+    return results
+
 def get_attendance_by_poll(db: Session, poll_id: int) -> List[models.AttendanceRecord]:
     return db.query(models.AttendanceRecord).filter(
         models.AttendanceRecord.poll_id == poll_id
     ).all()
 
-def get_student_attendance_history(db: Session, student_id: int) -> List[models.AttendanceRecord]:
-    return db.query(models.AttendanceRecord).filter(
+def count_poll_attendance(db: Session, poll_id: int) -> int:
+    return db.scalar(
+        select(func.count()).select_from(models.AttendanceRecord).where(
+            models.AttendanceRecord.poll_id == poll_id
+        )
+    )
+
+def _attendance_log_query(poll_id: int):
+    return (
+        select(
+            *RECORD_COLUMNS,
+            models.Student.name.label("student_name"),
+            models.Student.roll_no.label("student_roll_no")
+        )
+        .join(models.Student, models.Student.id == models.AttendanceRecord.student_id)
+        .where(models.AttendanceRecord.poll_id == poll_id)
+    )
+
+def get_attendance_log_rows(db: Session, poll_id: int) -> List[Row]:
+    """Records for a poll joined with the student's name and roll number in one query"""
+    return db.execute(_attendance_log_query(poll_id)).all()
+
+def iter_attendance_log_rows(db: Session, poll_id: int, batch_size: int = 1000) -> Iterator[Row]:
+    """Same rows as get_attendance_log_rows, fetched from the cursor batch_size at a time"""
+    return iter(db.execute(
+        _attendance_log_query(poll_id).execution_options(yield_per=batch_size)
+    ))
+
+def iter_attendance_matrix(
+    db: Session,
+    batch_size: int = 1000
+) -> Iterator[Tuple[Row, set]]:
+    """Yield (student row, ids of polls attended) for every student, ordered by id.
+    The row carries total_polls: the polls the student was on the roster of or
+    present at, counted as the student rollups count them.
+
+    Students and records are streamed side by side, both in student_id order,
+    and merged, so memory is bounded by one batch of each.
+    """
+    students = db.execute(
+        select(
+            models.Student.id,
+            models.Student.roll_no,
+            models.Student.name,
+            models.Student.department,
+            select(func.count())
+            .select_from(models.AttendancePoll)
+            .where(or_(
+                _on_roster(models.Student.id, models.Student.created_at),
+                exists().where(
+                    models.AttendanceRecord.student_id == models.Student.id,
+                    models.AttendanceRecord.poll_id == models.AttendancePoll.id
+                ).correlate_except(models.AttendanceRecord)
+            ))
+            .correlate(models.Student)
+            .scalar_subquery()
+            .label("total_polls")
+        )
+        .order_by(models.Student.id).execution_options(yield_per=batch_size)
+    )
+    records = iter(db.execute(
+        select(models.AttendanceRecord.student_id, models.AttendanceRecord.poll_id)
+        .order_by(models.AttendanceRecord.student_id, models.AttendanceRecord.poll_id)
+        .execution_options(yield_per=batch_size)
+    ))
+    record = next(records, None)
+    for student in students:
+        attended = set()
+        while record is not None and record.student_id <= student.id:
+            if record.student_id == student.id:
+                attended.add(record.poll_id)
+            record = next(records, None)
+        yield student, attended
+
+def _on_roster(student_id, student_created_at):
+    """The student was on the roster of the enclosing query's poll when it was
+    created: registered, for a campus-wide poll, or enrolled in its section"""
+    poll = models.AttendancePoll
+    return or_(
+        and_(poll.section_id.is_(None), student_created_at <= poll.created_at),
+        exists().where(
+            models.Enrollment.section_id == poll.section_id,
+            models.Enrollment.student_id == student_id,
+            models.Enrollment.enrolled_at <= poll.created_at
+        ).correlate_except(models.Enrollment)
+    )
+
+def count_poll_roster(db: Session, poll_id: int) -> int:
+    """Students a poll counts for, by the rule of the student rollups: on its
+    roster when it was created, or present"""
+    return db.scalar(
+        select(func.count())
+        .select_from(models.Student)
+        .join(models.AttendancePoll, models.AttendancePoll.id == poll_id)
+        .where(or_(
+            _on_roster(models.Student.id, models.Student.created_at),
+            exists().where(
+                models.AttendanceRecord.student_id == models.Student.id,
+                models.AttendanceRecord.poll_id == poll_id
+            )
+        ))
+    )
+
+def _not_marked(poll_id):
+    """No record of the outer query's student for the poll (anti-join)"""
+    return ~exists().where(
+        and_(
+            models.AttendanceRecord.student_id == models.Student.id,
+            models.AttendanceRecord.poll_id == poll_id
+        )
+    )
+
+def get_poll_absentees(
+    db: Session,
+    poll: models.AttendancePoll,
+    department: Optional[str] = None,
+    limit: int = 100,
+    after: Optional[Cursor] = None
+) -> List[models.Student]:
+    """Students on the poll's roster when it was created who did not mark it,
+    in roster order (created_at, id)"""
+    query = db.query(models.Student).filter(_not_marked(poll.id))
+    if poll.section_id is not None:
+        query = query.filter(exists().where(
+            models.Enrollment.section_id == poll.section_id,
+            models.Enrollment.student_id == models.Student.id,
+            models.Enrollment.enrolled_at <= poll.created_at
+        ))
+    else:
+        query = query.filter(models.Student.created_at <= poll.created_at)
+    if department is not None:
+        query = query.filter(models.Student.department == department)
+    if after is not None:
+        query = query.filter(tuple_(models.Student.created_at, models.Student.id) > tuple_(*after))
+    return query.order_by(models.Student.created_at, models.Student.id).limit(limit).all()
+
+def get_absentees_for_polls(
+    db: Session,
+    first_poll_id: int,
+    last_poll_id: int,
+    department: Optional[str] = None
+) -> List[Row]:
+    """(poll_id, student_id) of every absentee of the polls in an id range, in one query"""
+    query = (
+        select(models.AttendancePoll.id.label("poll_id"), models.Student.id.label("student_id"))
+        .join(models.Student, _on_roster(models.Student.id, models.Student.created_at))
+        .where(
+            models.AttendancePoll.id.between(first_poll_id, last_poll_id),
+            _not_marked(models.AttendancePoll.id)
+        )
+        .order_by(models.AttendancePoll.id, models.Student.id)
+    )
+    if department is not None:
+        query = query.where(models.Student.department == department)
+    return db.execute(query).all()
+
+def _student_history_page(db: Session, entities, student_id: int, limit: Optional[int], before: Optional[Cursor]) -> list:
+    query = db.query(*entities).filter(
         models.AttendanceRecord.student_id == student_id
-    ).order_by(models.AttendanceRecord.marked_at.desc()).all()
\ No newline at end of file
+    ).order_by(
+        models.AttendanceRecord.marked_at.desc(),
+        models.AttendanceRecord.id.desc()
+    )
+    if before is not None:
+        query = query.filter(
+            tuple_(models.AttendanceRecord.marked_at, models.AttendanceRecord.id) < tuple_(*before)
+        )
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+def get_student_attendance_history(
+    db: Session,
+    student_id: int,
+    limit: Optional[int] = None,
+    before: Optional[Cursor] = None
+) -> List[models.AttendanceRecord]:
+    return _student_history_page(db, (models.AttendanceRecord,), student_id, limit, before)
+
+def get_student_attendance_rows(
+    db: Session,
+    student: models.Student,
+    limit: Optional[int] = None,
+    before: Optional[Cursor] = None
+) -> List[Row]:
+    """Like get_student_attendance_history, as plain rows in AttendanceRecordResponse field order"""
+    # The student is already loaded, so bind its name instead of joining
+    entities = (
+        *RECORD_COLUMNS,
+        literal(student.name).label("student_name"),
+        literal(student.roll_no).label("student_roll_no")
+    )
+    return _student_history_page(db, entities, student.id, limit, before)
+
+# Attendance Rollup Operations
+def _count_new_poll(db: Session, section_id: Optional[int] = None) -> None:
+    """Count a poll being created toward the total of every student on its roster"""
+    stmt = update(models.StudentStats).values(total_polls=models.StudentStats.total_polls + 1)
+    if section_id is not None:
+        stmt = stmt.where(models.StudentStats.student_id.in_(
+            select(models.Enrollment.student_id).where(models.Enrollment.section_id == section_id)
+        ))
+    db.execute(stmt.execution_options(synchronize_session=False))
+
+def _count_marks(db: Session, marks: List[Tuple[int, int]]) -> None:
+    """Count newly inserted (student_id, poll_id) records in the students' rollups.
+
+    A poll the student was not on the roster of when it was created was not
+    counted in their total by _count_new_poll, so attending it adds to the
+    total as well.
+    """
+    if not marks:
+        return
+    stats = models.StudentStats.__table__
+    student_id = bindparam("mark_student_id")
+    registered_at = select(models.Student.created_at).where(
+        models.Student.id == student_id
+    ).scalar_subquery()
+    uncounted = select(func.count()).select_from(models.AttendancePoll).where(
+        and_(
+            models.AttendancePoll.id == bindparam("mark_poll_id"),
+            ~_on_roster(student_id, registered_at)
+        )
+    ).scalar_subquery()
+    db.execute(
+        update(stats)
+        .where(stats.c.student_id == student_id)
+        .values(attended=stats.c.attended + 1, total_polls=stats.c.total_polls + uncounted),
+        [{"mark_student_id": student_id, "mark_poll_id": poll_id} for student_id, poll_id in marks]
+    )
+
+def get_student_stats(db: Session, student_id: int) -> Optional[models.StudentStats]:
+    return db.get(models.StudentStats, student_id)
+
+def get_department_stats(db: Session) -> List[Row]:
+    """Per-department totals aggregated from the student rollups"""
+    return db.execute(
+        select(
+            models.Student.department,
+            func.count().label("students"),
+            func.sum(models.StudentStats.attended).label("attended"),
+            func.sum(models.StudentStats.total_polls).label("total_polls")
+        )
+        .join(models.StudentStats, models.StudentStats.student_id == models.Student.id)
+        .group_by(models.Student.department)
+        .order_by(models.Student.department)
+    ).all()
+
+def get_at_risk_students(
+    db: Session,
+    threshold: float,
+    department: Optional[str] = None,
+    limit: int = 100
+) -> List[Row]:
+    """Students below `threshold` percent attendance, lowest first, via the percentage index"""
+    query = (
+        select(
+            models.Student.id,
+            models.Student.name,
+            models.Student.roll_no,
+            models.Student.department,
+            models.StudentStats.attended,
+            models.StudentStats.total_polls,
+            models.StudentStats.percentage
+        )
+        .join(models.Student, models.Student.id == models.StudentStats.student_id)
+        .where(models.StudentStats.percentage < threshold)
+        .order_by(models.StudentStats.percentage, models.StudentStats.student_id)
+        .limit(limit)
+    )
+    if department is not None:
+        query = query.where(models.Student.department == department)
+    return db.execute(query).all()
@@ -1,17 +1,155 @@
-from sqlalchemy import create_engine
+import itertools
+import time
+from typing import AsyncIterator, List, Optional
+from fastapi import Request, Response
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from .config import settings
+from .metrics import count_fetched_rows, record_query
 
-# Create SQLite engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False}  # Needed for SQLite
-)
+# Async drivers for the sync URLs we accept in DATABASE_URL
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def async_database_url(url: str) -> str:
+    """Translate a sync DATABASE_URL into the equivalent async driver URL"""
+    parsed = make_url(url)
+    if parsed.get_backend_name() in ASYNC_DRIVERS and not parsed.drivername.endswith(("aiosqlite", "asyncpg")):
+        parsed = parsed.set(drivername=ASYNC_DRIVERS[parsed.get_backend_name()])
+    return parsed.render_as_string(hide_password=False)
+
+def _is_sqlite_memory(url: str) -> bool:
+    database = make_url(url).database
+    return not database or database == ":memory:" or "mode=memory" in database
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    """Pool and driver options for an engine on the given URL"""
+    is_sqlite = make_url(url).get_backend_name() == "sqlite"
+    if is_sqlite and _is_sqlite_memory(url):
+        # In-memory databases live in a single connection; keep SQLAlchemy's default pool
+        return {} if is_async else {"connect_args": {"check_same_thread": False}}
+
+    options = {"pool_size": settings.DB_POOL_SIZE, "max_overflow": settings.DB_MAX_OVERFLOW}
+    if is_sqlite:
+        if is_async:
+            # aiosqlite file databases default to NullPool, which opens a
+            # connection (and a driver thread) per request
+            options["poolclass"] = AsyncAdaptedQueuePool
+        else:
+            options["connect_args"] = {"check_same_thread": False}  # Needed for SQLite
+    return options
+
+def sqlite_pragmas(read_only: bool = False) -> list:
+    """PRAGMA statements for the configured SQLite performance profile"""
+    if not settings.SQLITE_TUNING:
+        return []
+    # The journal mode is stored in the database file, so only the primary sets it
+    journal = [] if read_only else [f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}"]
+    return journal + [
+        f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}",
+        f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+def configure_sqlite(engine: Engine, read_only: bool = False) -> None:
+    """Apply the SQLite performance profile to every connection the engine opens"""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in sqlite_pragmas(read_only):
+            cursor.execute(pragma)
+        cursor.close()
+
+def instrument_queries(engine: Engine) -> None:
+    """Time every statement the engine runs for the request metrics and the slow-query log"""
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        # Drivers report -1 for statements whose rows are not counted yet (e.g. RETURNING)
+        written = cursor.rowcount if context.isinsert or context.isupdate or context.isdelete else 0
+        record_query(statement, time.perf_counter() - context._query_started, max(written, 0))
+        count_fetched_rows(context)
+
+# Create database engine
+engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
+configure_sqlite(engine)
+instrument_queries(engine)
+
+# Async engine for request handlers, on the same database
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, is_async=True))
+configure_sqlite(async_engine.sync_engine)
+instrument_queries(async_engine.sync_engine)
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async sessions keep loaded attributes after commit; lazy reloads are not
+# possible outside the session's greenlet
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+def create_replica_sessionmaker(url: str) -> async_sessionmaker:
+    """Async sessions on a read-only replica, given its sync URL like DATABASE_URL"""
+    replica_url = async_database_url(url)
+    replica_engine = create_async_engine(replica_url, **engine_options(replica_url, is_async=True))
+    configure_sqlite(replica_engine.sync_engine, read_only=True)
+    instrument_queries(replica_engine.sync_engine)
+    return async_sessionmaker(replica_engine, autoflush=False, expire_on_commit=False)
+
+# Set on responses to marks, holding a server time. A client that sends the
+# latest value back on its requests reads from the primary until then. A
+# header rather than a cookie, so cross-origin clients without credentials
+# carry it too.
+READ_YOUR_WRITES_HEADER = "X-Read-Primary-Until"
+
+def pin_reads_to_primary(response: Response) -> None:
+    """Send this client's reads to the primary until replicas have caught up with its write"""
+    until = time.time() + settings.READ_YOUR_WRITES_SECONDS
+    response.headers[READ_YOUR_WRITES_HEADER] = f"{until:.3f}"
+
+def _pinned_to_primary(request: Request) -> bool:
+    try:
+        return float(request.headers.get(READ_YOUR_WRITES_HEADER, "0")) > time.time()
+    except ValueError:
+        return False
+
+class ReadSessionRouter:
+    """Dependency handing read-only handlers a session on the next replica in
+    turn, or on the primary when there are none or the client is pinned to it"""
+
+    def __init__(self, primary: async_sessionmaker, replicas: List[async_sessionmaker]):
+        self.primary = primary
+        self.replicas = replicas
+        self._turn = itertools.cycle(replicas)
+
+    def choose(self, request: Request) -> Optional[async_sessionmaker]:
+        """The replica to read from, or None for the primary"""
+        if not self.replicas or _pinned_to_primary(request):
+            return None
+        return next(self._turn)
+
+    async def __call__(self, request: Request) -> AsyncIterator[AsyncSession]:
+        replica = self.choose(request)
+        # Lets the response and poll caches keep what replicas return apart
+        request.state.read_replica = replica is not None
+        async with (replica or self.primary)() as db:
+            db.info["read_replica"] = replica is not None
+            yield db
+
 # Create Base class for models
 Base = declarative_base()
 
@@ -21,4 +159,15 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Dependency to get an async DB session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Dependency to get an async DB session for a read-only handler
+get_async_read_db = ReadSessionRouter(
+    AsyncSessionLocal,
+    [create_replica_sessionmaker(url) for url in settings.replica_urls_list]
+)
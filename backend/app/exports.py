@@ -0,0 +1,109 @@
+"""
+Streaming CSV and NDJSON exports
+
+Each export opens its own session and yields the body in chunks of
+``EXPORT_BATCH_SIZE`` rows while the underlying query is still being read,
+so memory stays flat no matter how many rows are exported. The generators
+are sync; ``StreamingResponse`` iterates them in the threadpool.
+"""
+import csv
+import io
+import json
+from typing import Callable, Iterable, Iterator, List, Literal
+
+from sqlalchemy.orm import Session
+
+from . import crud
+
+ExportFormat = Literal["csv", "ndjson"]
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+EXPORT_BATCH_SIZE = 1000
+
+LOG_COLUMNS = ["record_id", "student_id", "roll_no", "name", "marked_at"]
+
+
+def _chunks(lines: Iterable[List], fmt: ExportFormat, header: List[str]) -> Iterator[str]:
+    """Encode rows (CSV) or dicts (NDJSON) and yield them a batch at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == "csv":
+        writer.writerow(header)
+    pending = 0
+    for line in lines:
+        if fmt == "csv":
+            writer.writerow(line)
+        else:
+            buffer.write(json.dumps(line, default=str))
+            buffer.write("\n")
+        pending += 1
+        if pending == EXPORT_BATCH_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def poll_log_export(session_factory: Callable[[], Session], poll_id: int, fmt: ExportFormat) -> Iterator[str]:
+    """Every record of one poll with the student's roll number and name"""
+    db = session_factory()
+    try:
+        rows = crud.iter_attendance_log_rows(db, poll_id, batch_size=EXPORT_BATCH_SIZE)
+        if fmt == "csv":
+            lines = (
+                [r.id, r.student_id, r.student_roll_no, r.student_name, r.marked_at.isoformat()]
+                for r in rows
+            )
+        else:
+            lines = (
+                dict(zip(LOG_COLUMNS, (
+                    r.id, r.student_id, r.student_roll_no, r.student_name, r.marked_at.isoformat()
+                )))
+                for r in rows
+            )
+        yield from _chunks(lines, fmt, LOG_COLUMNS)
+    finally:
+        db.close()
+
+
+def attendance_matrix_export(session_factory: Callable[[], Session], fmt: ExportFormat) -> Iterator[str]:
+    """One row per student with a present/absent cell per poll, oldest poll
+    first; total_polls only counts polls the student was on the roster of"""
+    db = session_factory()
+    try:
+        polls = crud.get_poll_timeline(db)
+        poll_ids = [poll.id for poll in polls]
+        header = ["student_id", "roll_no", "name", "department"] + [
+            f"poll_{poll.id} ({poll.start_time:%Y-%m-%d %H:%M})" for poll in polls
+        ] + ["attended", "total_polls"]
+
+        matrix = crud.iter_attendance_matrix(db, batch_size=EXPORT_BATCH_SIZE)
+        if fmt == "csv":
+            lines = (
+                [s.id, s.roll_no, s.name, s.department]
+                + [1 if poll_id in attended else 0 for poll_id in poll_ids]
+                + [len(attended), s.total_polls]
+                for s, attended in matrix
+            )
+        else:
+            lines = (
+                {
+                    "student_id": s.id,
+                    "roll_no": s.roll_no,
+                    "name": s.name,
+                    "department": s.department,
+                    "present_poll_ids": sorted(attended),
+                    "attended": len(attended),
+                    "total_polls": s.total_polls,
+                }
+                for s, attended in matrix
+            )
+        yield from _chunks(lines, fmt, header)
+    finally:
+        db.close()
@@ -0,0 +1,21 @@
+"""
+Fast JSON encoding for read-only list endpoints
+
+With FAST_JSON_ENABLED, list endpoints select plain column tuples and encode
+them with orjson, skipping ORM identity-map work, Pydantic model
+construction and validation. The row-returning crud functions select their
+columns in the response schema's field order, so the bytes match the
+Pydantic encoding of the same data.
+"""
+from typing import Iterable
+
+import orjson
+from sqlalchemy.engine import Row
+
+
+def dump_rows(rows: Iterable[Row]) -> bytes:
+    return orjson.dumps([row._asdict() for row in rows])
+
+
+def dumps(obj) -> bytes:
+    return orjson.dumps(obj)
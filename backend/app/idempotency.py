@@ -0,0 +1,63 @@
+"""
+Idempotency-Key support for attendance marking
+
+A client that sends ``Idempotency-Key`` with ``POST /attendance/mark`` gets
+the first successful response for that key replayed on every retry, without
+the request being validated or written again. The record also keeps a
+fingerprint of the request body, so a key reused for a different request is
+rejected instead of answered with someone else's response.
+
+Records are claims in the state backend (app/state_backend.py): the first
+response stored for a key wins, in every worker sharing the backend. They
+expire after IDEMPOTENCY_TTL_SECONDS, and at most STATE_MAX_KEYS are kept.
+"""
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from .state_backend import call, state
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    fingerprint: str
+    status_code: int
+    body: bytes
+    expires_at: float
+
+    def encode(self) -> bytes:
+        return f"{self.fingerprint} {self.status_code} {self.expires_at!r}\n".encode() + self.body
+
+    @classmethod
+    def decode(cls, value: bytes) -> "StoredResponse":
+        header, body = value.split(b"\n", 1)
+        fingerprint, status_code, expires_at = header.decode().split(" ")
+        return cls(fingerprint, int(status_code), body, float(expires_at))
+
+
+def fingerprint(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+class IdempotencyStore:
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def get(self, key: str) -> Optional[StoredResponse]:
+        value = await call(self.backend, self.backend.lookup, f"idempotency:{key}")
+        return StoredResponse.decode(value) if value is not None else None
+
+    async def put(self, key: str, response: StoredResponse) -> StoredResponse:
+        """Store `response` unless another is already stored; returns the one kept"""
+        existing = await call(
+            self.backend, self.backend.claim,
+            f"idempotency:{key}", response.encode(), response.expires_at - time.time()
+        )
+        return StoredResponse.decode(existing) if existing is not None else response
+
+
+idempotency_store = IdempotencyStore(state)
@@ -0,0 +1,85 @@
+"""
+Streaming roster import
+
+An uploaded CSV is parsed row by row from the spooled upload file and
+validated against ``schemas.StudentCreate``. Valid rows are written in chunks
+of ``IMPORT_CHUNK_SIZE``, each with one roll_no lookup, one bulk insert and
+one commit, so a 20k-student intake costs a few dozen statements instead of
+two queries per student.
+"""
+import codecs
+import csv
+from typing import BinaryIO, List, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from . import crud, schemas
+
+IMPORT_CHUNK_SIZE = 1000
+
+REQUIRED_COLUMNS = ("name", "roll_no", "department")
+
+
+def _validation_detail(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+        for error in exc.errors()
+    )
+
+
+def import_students_csv(db: Session, upload: BinaryIO, update_existing: bool = False) -> schemas.StudentImportResponse:
+    """Import students from a CSV with name, roll_no and department columns.
+
+    Rows are numbered as in a spreadsheet (the header is row 1). Raises
+    ValueError if the header is missing a required column or the file is
+    not UTF-8.
+    """
+    reader = csv.DictReader(codecs.iterdecode(upload, "utf-8-sig"))
+    try:
+        missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+    except UnicodeDecodeError as exc:
+        raise ValueError("File is not valid UTF-8") from exc
+    if missing:
+        raise ValueError(f"Missing required column(s): {', '.join(missing)}")
+
+    counts = {"total_rows": 0, "created": 0, "updated": 0}
+    errors: List[schemas.StudentImportError] = []
+    first_seen = {}
+    chunk: List[Tuple[int, schemas.StudentCreate]] = []
+
+    def fail(row: int, roll_no, detail: str) -> None:
+        errors.append(schemas.StudentImportError(row=row, roll_no=roll_no, detail=detail))
+
+    def flush() -> None:
+        outcome = crud.bulk_upsert_students(db, [student for _, student in chunk], update_existing)
+        for row, student in chunk:
+            status = outcome[student.roll_no]
+            if status == "exists":
+                fail(row, student.roll_no, "Roll number already registered")
+            else:
+                counts[status] += 1
+        chunk.clear()
+
+    try:
+        for record in reader:
+            row = reader.line_num
+            counts["total_rows"] += 1
+            values = {column: (record.get(column) or "").strip() for column in REQUIRED_COLUMNS}
+            try:
+                student = schemas.StudentCreate(**values)
+            except ValidationError as exc:
+                fail(row, values["roll_no"] or None, _validation_detail(exc))
+                continue
+            if student.roll_no in first_seen:
+                fail(row, student.roll_no, f"Duplicate roll number (first seen on row {first_seen[student.roll_no]})")
+                continue
+            first_seen[student.roll_no] = row
+            chunk.append((row, student))
+            if len(chunk) == IMPORT_CHUNK_SIZE:
+                flush()
+    except UnicodeDecodeError as exc:
+        raise ValueError(f"File is not valid UTF-8 (after row {reader.line_num})") from exc
+    if chunk:
+        flush()
+    return schemas.StudentImportResponse(**counts, failed=len(errors), errors=errors)
@@ -0,0 +1,18 @@
+"""
+SQLite files for state shared by the workers on one host
+
+State that must be visible to every uvicorn worker but does not belong in the
+application database (see app/state_backend.py) lives in a small WAL-mode
+SQLite file. Access is serialized per process by a lock, and across processes
+by SQLite's own locking.
+"""
+import sqlite3
+
+
+def connect(path: str, schema: str) -> sqlite3.Connection:
+    """Open `path` in autocommit mode, so callers group statements with explicit BEGINs"""
+    conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(schema)
+    return conn
@@ -1,11 +1,52 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from .database import engine, Base
-from .routers import students, attendance, auth
+from . import crud
+from .database import READ_YOUR_WRITES_HEADER, engine, Base, SessionLocal
+from .routers import students, attendance, auth, stats, analytics, courses
 from .config import settings
+from .idempotency import REPLAYED_HEADER
+from .metrics import MetricsMiddleware, registry as metrics_registry
+from .migrations import run_migrations
+from .pagination import NEXT_CURSOR_HEADER
+from .poll_expiry import poll_expiry
+from .roster_index import roster_index
+from .write_behind import mark_queue
 
-# Create database tables
+# Create database tables and bring existing databases up to date
 Base.metadata.create_all(bind=engine)
+run_migrations(engine)
+
+def _load_roster() -> list:
+    db = SessionLocal()
+    try:
+        return crud.get_roster_rows(db)
+    finally:
+        db.close()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm the roster index, start background workers and flush them on shutdown"""
+    if settings.ROSTER_INDEX_ENABLED:
+        await roster_index.start(_load_roster)
+    if settings.WRITE_BEHIND_ENABLED:
+        await mark_queue.start()
+    if settings.POLL_EXPIRY_ENABLED:
+        await poll_expiry.start()
+    relay = asyncio.create_task(attendance.relay_poll_events())
+    yield
+    relay.cancel()
+    try:
+        await relay
+    except asyncio.CancelledError:
+        pass
+    if settings.POLL_EXPIRY_ENABLED:
+        await poll_expiry.stop()
+    if settings.WRITE_BEHIND_ENABLED:
+        await mark_queue.stop()
+    if settings.ROSTER_INDEX_ENABLED:
+        await roster_index.stop()
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -13,7 +54,8 @@ app = FastAPI(
     description="Attendance Management System API",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -23,12 +65,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        NEXT_CURSOR_HEADER, "ETag", "Server-Timing", "Retry-After", REPLAYED_HEADER, READ_YOUR_WRITES_HEADER
+    ],
 )
 
+# Per-route timing and SQL statistics for /metrics and Server-Timing
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(students.router)
 app.include_router(attendance.router)
 app.include_router(auth.router)
+app.include_router(stats.router)
+app.include_router(analytics.router)
+app.include_router(courses.router)
 
 @app.get("/")
 def root():
@@ -42,4 +93,9 @@ def root():
 @app.get("/health")
 def health_check():
     """Health check endpoint"""
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Request and SQL metrics in the Prometheus text format"""
+    return Response(metrics_registry.render(), media_type="text/plain; version=0.0.4")
\ No newline at end of file
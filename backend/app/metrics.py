@@ -0,0 +1,231 @@
+"""
+Per-route request and SQL metrics
+
+``MetricsMiddleware`` times each request and, through engine events installed
+by ``database.instrument_queries``, counts the SQL statements it runs, their
+time, rows fetched from their results and rows written. The per-request totals are sent as a
+``Server-Timing`` header and aggregated per route template for ``GET /metrics``
+in the Prometheus text format. A route whose statement count grows with its
+result size is an N+1.
+
+Statements slower than SLOW_QUERY_THRESHOLD_MS are logged with their route.
+Metrics are kept per worker process; Prometheus sums them across targets.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Request duration histogram bounds, in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+@dataclass
+class RequestStats:
+    scope: dict
+    sql_statements: int = 0
+    sql_seconds: float = 0.0
+    rows_loaded: int = 0
+    rows_written: int = 0
+
+
+# Mutated in place, so statements run in the threadpool or in run_sync
+# greenlets count towards the request that started them
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def record_query(statement: str, seconds: float, rows_written: int) -> None:
+    """Called by the engine events after every statement"""
+    stats = _current.get()
+    if stats is not None:
+        stats.sql_statements += 1
+        stats.sql_seconds += seconds
+        stats.rows_written += rows_written
+    threshold = settings.SLOW_QUERY_THRESHOLD_MS
+    if threshold > 0 and seconds * 1000 >= threshold:
+        registry.slow_queries += 1
+        logger.warning(
+            "Slow query (%.1f ms) on %s: %s",
+            seconds * 1000,
+            _route_template(stats.scope) if stats is not None else "<background>",
+            " ".join(statement.split())
+        )
+
+
+class _RowCountingCursor:
+    """DBAPI cursor that adds the rows fetched through it to a request's
+    rows_loaded, whether they become ORM objects or stay plain rows"""
+
+    __slots__ = ("_cursor", "_stats")
+
+    def __init__(self, cursor, stats: RequestStats):
+        self._cursor = cursor
+        self._stats = stats
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._stats.rows_loaded += 1
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._cursor.fetchmany(*args)
+        self._stats.rows_loaded += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._stats.rows_loaded += len(rows)
+        return rows
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def count_fetched_rows(context) -> None:
+    """Called by the engine events after every statement, before its result is
+    built: rows the result fetches later, even while streaming, count towards
+    the request that ran the statement"""
+    stats = _current.get()
+    if stats is not None and context.cursor.description is not None:
+        context.cursor = _RowCountingCursor(context.cursor, stats)
+
+
+@dataclass
+class RouteTotals:
+    requests: Dict[str, int] = field(default_factory=dict)  # by status code
+    buckets: List[int] = field(default_factory=lambda: [0] * (len(DURATION_BUCKETS) + 1))
+    seconds: float = 0.0
+    sql_statements: int = 0
+    sql_seconds: float = 0.0
+    rows_loaded: int = 0
+    rows_written: int = 0
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[Tuple[str, str], RouteTotals] = {}
+        self.slow_queries = 0
+
+    def observe(self, method: str, route: str, status: int, seconds: float, stats: RequestStats) -> None:
+        with self._lock:
+            totals = self._routes.setdefault((method, route), RouteTotals())
+            code = str(status)
+            totals.requests[code] = totals.requests.get(code, 0) + 1
+            totals.buckets[bisect_left(DURATION_BUCKETS, seconds)] += 1
+            totals.seconds += seconds
+            totals.sql_statements += stats.sql_statements
+            totals.sql_seconds += stats.sql_seconds
+            totals.rows_loaded += stats.rows_loaded
+            totals.rows_written += stats.rows_written
+
+    def reset(self) -> None:
+        with self._lock:
+            self._routes.clear()
+            self.slow_queries = 0
+
+    def render(self) -> str:
+        """The metrics in the Prometheus text exposition format"""
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            routes = sorted(self._routes.items())
+
+            family("classcheck_requests_total", "counter", "HTTP requests by route and status")
+            for (method, route), totals in routes:
+                for code, count in sorted(totals.requests.items()):
+                    lines.append(f'classcheck_requests_total{{{_labels(method, route)},status="{code}"}} {count}')
+
+            family("classcheck_request_duration_seconds", "histogram", "Request wall time")
+            for (method, route), totals in routes:
+                labels = _labels(method, route)
+                cumulative = 0
+                for bound, count in zip((*DURATION_BUCKETS, "+Inf"), totals.buckets):
+                    cumulative += count
+                    lines.append(f'classcheck_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"classcheck_request_duration_seconds_sum{{{labels}}} {totals.seconds}")
+                lines.append(f"classcheck_request_duration_seconds_count{{{labels}}} {cumulative}")
+
+            for name, attr, help_text in (
+                ("classcheck_sql_statements_total", "sql_statements", "SQL statements executed"),
+                ("classcheck_sql_duration_seconds_total", "sql_seconds", "Time spent executing SQL"),
+                ("classcheck_sql_rows_loaded_total", "rows_loaded", "Rows fetched from query results"),
+                ("classcheck_sql_rows_written_total", "rows_written", "Rows inserted, updated or deleted"),
+            ):
+                family(name, "counter", help_text)
+                for (method, route), totals in routes:
+                    lines.append(f"{name}{{{_labels(method, route)}}} {getattr(totals, attr)}")
+
+            family("classcheck_slow_queries_total", "counter", "Statements over SLOW_QUERY_THRESHOLD_MS")
+            lines.append(f"classcheck_slow_queries_total {self.slow_queries}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(method: str, route: str) -> str:
+    route = route.replace("\\", "\\\\").replace('"', '\\"')
+    return f'method="{method}",route="{route}"'
+
+
+registry = MetricsRegistry()
+
+
+def _route_template(scope) -> str:
+    """The path template of the route that handled `scope`, e.g. /students/{student_id}"""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return UNMATCHED_ROUTE
+    app = scope["app"]
+    templates = getattr(app.state, "route_templates", None)
+    if templates is None:
+        templates = app.state.route_templates = {
+            route.endpoint: route.path for route in app.routes if hasattr(route, "endpoint")
+        }
+    return templates.get(endpoint, UNMATCHED_ROUTE)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-request timing and SQL statistics"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = _current.set(stats)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                header = (
+                    f'app;dur={elapsed_ms:.2f}, '
+                    f'sql;dur={stats.sql_seconds * 1000:.2f};desc="{stats.sql_statements} statements"'
+                )
+                message["headers"] = [*message.get("headers", []), (b"server-timing", header.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            registry.observe(scope["method"], _route_template(scope), status, time.perf_counter() - start, stats)
+            _current.reset(token)
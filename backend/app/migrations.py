@@ -0,0 +1,111 @@
+"""
+Idempotent schema migrations for existing databases
+
+``Base.metadata.create_all`` only creates missing tables; it never adds
+indexes to tables that already exist. The migrations here bring an older
+database up to date with ``models.py`` and are safe to run on every startup.
+"""
+from datetime import datetime
+
+from sqlalchemy import func, inspect, select, text, update
+from sqlalchemy.engine import Connection, Engine
+from .database import Base
+from . import models  # also registers tables on Base.metadata
+
+
+def _index_names(conn: Connection, table_name: str) -> set:
+    return {index["name"] for index in inspect(conn).get_indexes(table_name)}
+
+
+def dedupe_attendance_records(conn: Connection) -> int:
+    """Delete duplicate (student_id, poll_id) records, keeping the earliest one"""
+    result = conn.execute(text(
+        "DELETE FROM attendance_records WHERE id NOT IN ("
+        "SELECT MIN(id) FROM attendance_records GROUP BY student_id, poll_id)"
+    ))
+    return result.rowcount
+
+
+def add_attendance_unique_index(conn: Connection) -> None:
+    """Enforce one record per (student_id, poll_id), removing existing duplicates first"""
+    if "ix_attendance_records_student_poll" in _index_names(conn, "attendance_records"):
+        return
+    dedupe_attendance_records(conn)
+
+
+def add_poll_sections(conn: Connection) -> None:
+    """Add attendance_polls.section_id and drop the single-active-poll index it supersedes"""
+    columns = {column["name"] for column in inspect(conn).get_columns("attendance_polls")}
+    if "section_id" not in columns:
+        conn.execute(text("ALTER TABLE attendance_polls ADD COLUMN section_id INTEGER REFERENCES sections (id)"))
+    if "ix_attendance_polls_active_end_time" in _index_names(conn, "attendance_polls"):
+        conn.execute(text("DROP INDEX ix_attendance_polls_active_end_time"))
+
+
+def add_poll_present_count(conn: Connection) -> None:
+    """Add attendance_polls.present_count; the expiry scheduler fills it in as polls close"""
+    columns = {column["name"] for column in inspect(conn).get_columns("attendance_polls")}
+    if "present_count" not in columns:
+        conn.execute(text("ALTER TABLE attendance_polls ADD COLUMN present_count INTEGER"))
+
+
+def create_missing_indexes(conn: Connection) -> None:
+    """Create any index declared in models.py that the database does not have yet"""
+    for table in Base.metadata.sorted_tables:
+        existing = _index_names(conn, table.name)
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=conn)
+
+
+def backfill_pagination_keys(conn: Connection) -> None:
+    """Fill in the keyset pagination timestamps older rows left NULL
+
+    A poll takes its start time and a record its poll's. A student takes the
+    time of the first poll, so they stay on the roster of every poll as they
+    were while the time was unknown.
+    """
+    polls = models.AttendancePoll.__table__
+    records = models.AttendanceRecord.__table__
+    students = models.Student.__table__
+    conn.execute(update(polls).where(polls.c.created_at.is_(None)).values(created_at=polls.c.start_time))
+    conn.execute(
+        update(records).where(records.c.marked_at.is_(None)).values(
+            marked_at=select(polls.c.start_time).where(polls.c.id == records.c.poll_id).scalar_subquery()
+        )
+    )
+    first_poll = conn.scalar(select(func.min(polls.c.created_at))) or datetime.utcnow()
+    conn.execute(update(students).where(students.c.created_at.is_(None)).values(created_at=first_poll))
+
+
+def backfill_student_stats(conn: Connection) -> None:
+    """Create the attendance rollup of every student that does not have one yet"""
+    conn.execute(text(
+        "INSERT INTO student_stats (student_id, attended, total_polls) "
+        "SELECT s.id, "
+        "(SELECT COUNT(*) FROM attendance_records r WHERE r.student_id = s.id), "
+        "(SELECT COUNT(*) FROM attendance_polls p WHERE "
+        "(p.section_id IS NULL AND (s.created_at IS NULL OR p.created_at IS NULL OR p.created_at >= s.created_at)) "
+        "OR EXISTS (SELECT 1 FROM enrollments e WHERE e.section_id = p.section_id "
+        "AND e.student_id = s.id AND e.enrolled_at <= p.created_at) "
+        "OR EXISTS (SELECT 1 FROM attendance_records r WHERE r.student_id = s.id AND r.poll_id = p.id)) "
+        "FROM students s "
+        "WHERE NOT EXISTS (SELECT 1 FROM student_stats st WHERE st.student_id = s.id)"
+    ))
+
+
+MIGRATIONS = [
+    add_attendance_unique_index,
+    add_poll_sections,
+    add_poll_present_count,
+    create_missing_indexes,
+    backfill_pagination_keys,
+    backfill_student_stats,
+]
+
+
+def run_migrations(engine: Engine) -> None:
+    """Apply every migration in order inside a single transaction"""
+    with engine.begin() as conn:
+        for migration in MIGRATIONS:
+            migration(conn)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Computed, Integer, Float, String, DateTime, Boolean, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -10,24 +10,100 @@ class Student(Base):
     name = Column(String, nullable=False)
     roll_no = Column(String, unique=True, nullable=False, index=True)
     department = Column(String, nullable=False)
+    # Keyset pagination key, so never NULL
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    
+    # Relationships
+    attendance_records = relationship("AttendanceRecord", back_populates="student", cascade="all, delete-orphan")
+    stats = relationship("StudentStats", uselist=False, cascade="all, delete-orphan")
+    enrollments = relationship("Enrollment", back_populates="student", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # Keyset pagination order for GET /students/
+        Index("ix_students_created_at_id", "created_at", "id"),
+        # Same order within one department (absentee lists)
+        Index("ix_students_department_created_at_id", "department", "created_at", "id"),
+    )
+
+class Course(Base):
+    __tablename__ = "courses"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    code = Column(String, unique=True, nullable=False, index=True)
+    title = Column(String, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     
-    # Relationship
-    attendance_records = relationship("AttendanceRecord", back_populates="student")
+    sections = relationship("Section", back_populates="course", cascade="all, delete-orphan")
+
+class Section(Base):
+    __tablename__ = "sections"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
+    name = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    course = relationship("Course", back_populates="sections")
+    enrollments = relationship("Enrollment", back_populates="section", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        Index("ix_sections_course_name", "course_id", "name", unique=True),
+    )
+
+class Enrollment(Base):
+    """A student on a section's roster. Section polls are scoped to it."""
+    __tablename__ = "enrollments"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    section_id = Column(Integer, ForeignKey("sections.id"), nullable=False)
+    student_id = Column(Integer, ForeignKey("students.id"), nullable=False)
+    enrolled_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    
+    section = relationship("Section", back_populates="enrollments")
+    student = relationship("Student", back_populates="enrollments")
+    
+    __table_args__ = (
+        # Roster of a section, and the membership check when marking
+        Index("ix_enrollments_section_student", "section_id", "student_id", unique=True),
+        # Sections of a student
+        Index("ix_enrollments_student_section", "student_id", "section_id"),
+    )
 
 class AttendancePoll(Base):
     __tablename__ = "attendance_polls"
     
     id = Column(Integer, primary_key=True, index=True)
+    # NULL for a campus-wide poll over every registered student
+    section_id = Column(Integer, ForeignKey("sections.id"), nullable=True)
     start_time = Column(DateTime, nullable=False)
     end_time = Column(DateTime, nullable=False)
     duration_minutes = Column(Integer, nullable=False)
     is_active = Column(Boolean, default=True)
     created_by = Column(String, default="admin")
-    created_at = Column(DateTime, default=datetime.utcnow)
+    # Keyset pagination key, so never NULL
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # Final number of marks, set when the poll closes; NULL while it is open
+    present_count = Column(Integer, nullable=True)
     
     # Relationship
     attendance_records = relationship("AttendanceRecord", back_populates="poll")
+    
+    __table_args__ = (
+        # Keyset pagination order for GET /attendance/logs
+        Index("ix_attendance_polls_created_at_id", "created_at", "id"),
+        # Only current polls are active (one per section), so this stays
+        # tiny; serves the per-section active-poll lookup, the deactivation
+        # UPDATE in create_poll and the expiry scheduler's deadline scan
+        Index(
+            "ix_attendance_polls_active_section",
+            "section_id",
+            "end_time",
+            sqlite_where=text("is_active = 1"),
+            postgresql_where=text("is_active"),
+        ),
+        # Polls of a section
+        Index("ix_attendance_polls_section_created_at", "section_id", "created_at"),
+    )
 
 class AttendanceRecord(Base):
     __tablename__ = "attendance_records"
@@ -35,8 +111,41 @@ class AttendanceRecord(Base):
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("students.id"), nullable=False)
     poll_id = Column(Integer, ForeignKey("attendance_polls.id"), nullable=False)
-    marked_at = Column(DateTime, default=datetime.utcnow)
+    # Keyset pagination key, so never NULL
+    marked_at = Column(DateTime, nullable=False, default=datetime.utcnow)
     
     # Relationships
     student = relationship("Student", back_populates="attendance_records")
-    poll = relationship("AttendancePoll", back_populates="attendance_records")
\ No newline at end of file
+    poll = relationship("AttendancePoll", back_populates="attendance_records")
+    
+    __table_args__ = (
+        # A student can be marked at most once per poll
+        Index("ix_attendance_records_student_poll", "student_id", "poll_id", unique=True),
+        # Per-poll logs and counts
+        Index("ix_attendance_records_poll_student", "poll_id", "student_id"),
+        # Keyset pagination order for a student's history
+        Index("ix_attendance_records_student_marked_at", "student_id", "marked_at", "id"),
+    )
+
+class StudentStats(Base):
+    """Attendance rollup for one student, kept current by crud on every mark and poll.
+
+    A poll counts toward total_polls if the student was on its roster when it
+    was created (registered, for a campus-wide poll; enrolled in its section,
+    for a section poll), or if they attended it.
+    """
+    __tablename__ = "student_stats"
+    
+    student_id = Column(Integer, ForeignKey("students.id"), primary_key=True)
+    attended = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    total_polls = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    # NULL until the student has had a poll
+    percentage = Column(
+        Float,
+        Computed("CASE WHEN total_polls > 0 THEN attended * 100.0 / total_polls END", persisted=True)
+    )
+    
+    __table_args__ = (
+        # At-risk listings
+        Index("ix_student_stats_percentage", "percentage"),
+    )
@@ -0,0 +1,50 @@
+"""
+Opaque cursors for keyset pagination
+
+A cursor encodes the sort key ``(timestamp, id)`` of the last row on a page.
+The next page continues strictly after that key, so its cost does not grow
+with the page number the way ``OFFSET`` does.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+Cursor = Tuple[datetime, int]
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    raw = json.dumps([timestamp.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Cursor]:
+    """Decode a cursor from a query parameter; raises ValueError if malformed"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def cursor_param(cursor: Optional[str]) -> Optional[Cursor]:
+    """Decode the ``cursor`` query parameter of an endpoint; malformed is a 400"""
+    try:
+        return decode_cursor(cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+
+def next_cursor(rows: Sequence, limit: Optional[int], timestamp_attr: str) -> Optional[str]:
+    """Cursor for the page after ``rows``, or None when this was the last page"""
+    if not rows or limit is None or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor(getattr(last, timestamp_attr), last.id)
@@ -0,0 +1,162 @@
+"""
+Process-local cache of attendance polls
+
+Student devices poll ``GET /attendance/current`` continuously and every mark
+re-reads its poll, so polls are served from memory. Active polls are indexed
+by section (``None`` for the campus-wide poll), so each of many concurrent
+lectures finds its poll with one dict lookup. Every write to
+``attendance_polls`` bumps the ``polls`` version in the state backend shared
+by all workers (app/state_backend.py); a worker only goes back to the
+database when the version it sees has changed since its cache was filled.
+"""
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from . import models
+from .state_backend import bump_soon, state
+
+MAX_CACHED_POLLS = 1024
+
+_UNSET = object()
+
+
+@dataclass(frozen=True)
+class PollSnapshot:
+    """Immutable copy of an AttendancePoll row, safe to share across requests"""
+    id: int
+    section_id: Optional[int]
+    start_time: datetime
+    end_time: datetime
+    duration_minutes: int
+    is_active: bool
+    created_at: Optional[datetime]
+
+    @classmethod
+    def from_model(cls, poll: models.AttendancePoll) -> "PollSnapshot":
+        return cls(
+            id=poll.id,
+            section_id=poll.section_id,
+            start_time=poll.start_time,
+            end_time=poll.end_time,
+            duration_minutes=poll.duration_minutes,
+            is_active=poll.is_active,
+            created_at=poll.created_at
+        )
+
+    def is_open(self, now: datetime) -> bool:
+        return self.start_time <= now <= self.end_time
+
+
+VERSION_NAMES = ("polls",)
+
+
+class PollCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._generation = None
+        # Section id -> its active poll, or None if it has none
+        self._active: Dict[Optional[int], Optional[PollSnapshot]] = {}
+        self._polls: Dict[int, PollSnapshot] = {}
+
+    def _sync(self) -> None:
+        # Called with the lock held. The generation is read before loading, so
+        # a load racing with another worker's write is discarded, not cached
+        generation = self.backend.versions(VERSION_NAMES)
+        if generation != self._generation:
+            self._generation = generation
+            self._active.clear()
+            self._polls.clear()
+
+    # The lock is never held while loading: loaders may run inside an async
+    # session's greenlet, where blocking on a thread lock would stall the loop.
+    # Loads from a lagging read replica pass store=False, so they are served
+    # but never cached under a generation they may predate
+
+    def get_active(
+        self,
+        section_id: Optional[int],
+        load: Callable[[], Optional[models.AttendancePoll]],
+        store: bool = True
+    ) -> Optional[PollSnapshot]:
+        with self._lock:
+            self._sync()
+            generation, snapshot = self._generation, self._active.get(section_id, _UNSET)
+        if snapshot is _UNSET:
+            poll = load()
+            snapshot = PollSnapshot.from_model(poll) if poll else None
+            with self._lock:
+                if store and self._generation == generation:
+                    if len(self._active) >= MAX_CACHED_POLLS:
+                        self._active.clear()
+                    self._active[section_id] = snapshot
+        if snapshot is None or not snapshot.is_open(datetime.utcnow()):
+            return None
+        return snapshot
+
+    def get_poll(
+        self,
+        poll_id: int,
+        load: Callable[[], Optional[models.AttendancePoll]],
+        store: bool = True
+    ) -> Optional[PollSnapshot]:
+        with self._lock:
+            self._sync()
+            generation, snapshot = self._generation, self._polls.get(poll_id)
+        if snapshot is None:
+            poll = load()
+            if poll is None:
+                return None
+            snapshot = PollSnapshot.from_model(poll)
+            with self._lock:
+                if store and self._generation == generation:
+                    if len(self._polls) >= MAX_CACHED_POLLS:
+                        self._polls.clear()
+                    self._polls[poll_id] = snapshot
+        return snapshot
+
+    def invalidate(self) -> None:
+        """Publish a new generation to every worker sharing the state backend"""
+        with self._lock:
+            self._generation = _UNSET
+            self._active.clear()
+            self._polls.clear()
+        bump_soon(self.backend, VERSION_NAMES)
+
+
+cache = PollCache(state)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_poll_writes(session, flush_context):
+    if any(
+        isinstance(obj, models.AttendancePoll)
+        for obj in (*session.new, *session.dirty, *session.deleted)
+    ):
+        session.info["polls_changed"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_poll_statements(orm_execute_state):
+    # Bulk UPDATEs (closing polls) bypass the unit of work
+    if (
+        (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete)
+        and orm_execute_state.statement.table.name == models.AttendancePoll.__tablename__
+    ):
+        orm_execute_state.session.info["polls_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop("polls_changed", False):
+        cache.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop("polls_changed", None)
@@ -0,0 +1,144 @@
+"""
+Background poll expiry
+
+Polls used to stay ``is_active`` forever, so every lookup had to compare
+``start_time``/``end_time`` with the clock. This scheduler closes them
+instead. It keeps a min-heap of the deadlines of open polls, sleeps until
+the earliest one (plus ``POLL_EXPIRY_GRACE_SECONDS``), then closes every poll
+that has ended. Closing sets ``is_active`` to false and records the final
+``present_count``. The commit invalidates the poll and response caches in
+every worker, and registered listeners (the status streams) are notified.
+
+Every worker schedules each poll as its start event arrives through the
+state backend (see ``relay_poll_events`` in app/routers/attendance.py), and
+also reloads the deadlines from the database at startup and every
+``POLL_EXPIRY_RESYNC_SECONDS`` in case it missed one. Closing is idempotent,
+so workers racing on a deadline is harmless.
+"""
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import crud
+from .config import settings
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Called with the (id, section_id) rows of the polls just closed
+Listener = Callable[[List[Row]], Awaitable[None]]
+
+
+class PollExpiryScheduler:
+    def __init__(self, session_factory: Callable[[], Session], grace_seconds: float, resync_seconds: float):
+        self.session_factory = session_factory
+        self.grace = timedelta(seconds=grace_seconds)
+        self.resync_seconds = resync_seconds
+        self._deadlines: List[Tuple[datetime, int]] = []
+        self._listeners: List[Listener] = []
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def next_deadline(self) -> Optional[datetime]:
+        return self._deadlines[0][0] if self._deadlines else None
+
+    def add_listener(self, listener: Listener) -> None:
+        self._listeners.append(listener)
+
+    def schedule(self, poll_id: int, end_time: datetime) -> None:
+        """Close `poll_id` once `end_time` has passed"""
+        if not self.running:
+            return
+        heapq.heappush(self._deadlines, (end_time, poll_id))
+        if self._deadlines[0] == (end_time, poll_id):
+            self._wake.set()
+
+    def _call(self, fn, *args):
+        db = self.session_factory()
+        try:
+            return fn(db, *args)
+        finally:
+            db.close()
+
+    async def resync(self) -> None:
+        """Replace the heap with the deadlines of every open poll"""
+        deadlines = await run_in_threadpool(self._call, crud.get_poll_deadlines)
+        heapq.heapify(deadlines)
+        self._deadlines = deadlines
+        self._wake.set()
+
+    async def close_due(self) -> List[Row]:
+        """Close every poll past its deadline and notify listeners"""
+        cutoff = datetime.utcnow() - self.grace
+        while self._deadlines and self._deadlines[0][0] <= cutoff:
+            heapq.heappop(self._deadlines)
+        closed = await run_in_threadpool(self._call, crud.close_expired_polls, cutoff)
+        if closed:
+            logger.info("Closed %d expired poll(s): %s", len(closed), [row.id for row in closed])
+            for listener in self._listeners:
+                try:
+                    await listener(closed)
+                except Exception:
+                    logger.exception("Poll expiry listener failed")
+        return closed
+
+    def _seconds_until_due(self) -> float:
+        if not self._deadlines:
+            return self.resync_seconds
+        due = self._deadlines[0][0] + self.grace
+        return max(0.0, (due - datetime.utcnow()).total_seconds())
+
+    async def _run(self) -> None:
+        # Start with a resync, which also closes polls that ended while no
+        # worker was running
+        next_resync = time.monotonic()
+        while True:
+            timeout = min(self._seconds_until_due(), max(0.0, next_resync - time.monotonic()))
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                if time.monotonic() >= next_resync:
+                    next_resync = time.monotonic() + self.resync_seconds
+                    await self.resync()
+                if self._seconds_until_due() == 0.0 and self._deadlines:
+                    await self.close_due()
+            except Exception:
+                # Retry on the next tick; the deadline stays in the database
+                logger.exception("Poll expiry failed")
+                await asyncio.sleep(1.0)
+
+    async def start(self) -> None:
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._deadlines = []
+
+
+poll_expiry = PollExpiryScheduler(
+    SessionLocal,
+    grace_seconds=settings.POLL_EXPIRY_GRACE_SECONDS,
+    resync_seconds=settings.POLL_EXPIRY_RESYNC_SECONDS
+)
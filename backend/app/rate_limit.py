@@ -0,0 +1,31 @@
+"""
+Token-bucket rate limiting for attendance marking
+
+Each key (a student, a client address) owns a bucket of `burst` tokens that
+refills at `rate` tokens per second; a request takes one token or is refused
+with the time until the next one. A bucket is two numbers, and only the
+``STATE_MAX_KEYS`` most recently used are kept: an evicted bucket comes back
+full, which only ever errs towards allowing a request.
+
+Buckets live in the state backend (app/state_backend.py), so with
+``STATE_BACKEND=sqlite`` every worker draws from the same bucket.
+"""
+import time
+
+from .config import settings
+from .state_backend import call, state
+
+
+class RateLimiter:
+    def __init__(self, backend, rate: float, burst: float):
+        self.backend = backend
+        self.rate = rate
+        self.burst = burst
+
+    async def check(self, key: str) -> float:
+        """Seconds the caller must wait before `key` may act again; 0 to proceed now"""
+        return await call(self.backend, self.backend.take, f"bucket:{key}", self.rate, self.burst, time.time())
+
+
+student_limiter = RateLimiter(state, settings.RATE_LIMIT_STUDENT_RATE, settings.RATE_LIMIT_STUDENT_BURST)
+client_limiter = RateLimiter(state, settings.RATE_LIMIT_CLIENT_RATE, settings.RATE_LIMIT_CLIENT_BURST)
@@ -0,0 +1,192 @@
+"""
+ETag response cache for read endpoints
+
+Serialized responses are kept in a bounded LRU keyed by path and query
+string. Each entry records the generation of every table it was built from:
+the table's version in the state backend shared by all workers
+(app/state_backend.py), and a counter of this worker's own writes to it.
+Commits that write a table bump both, so the next lookup in any worker
+misses. Entries also expire after a TTL, which bounds staleness from writes
+made outside a Session. Entries built from a read replica, which may not
+have a write yet, expire after READ_YOUR_WRITES_SECONDS at the latest.
+
+Every response carries a strong ETag, and a matching ``If-None-Match`` is
+answered with 304 whether the body came from the cache or was just rebuilt.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from fastapi import Request, Response, status
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .state_backend import bump_soon, call, state
+
+
+# Not a table: invalidated by records inserted into polls that have already
+# closed, which closed-poll logs (cached without attendance_records) must see
+CLOSED_POLL_RECORDS = "closed_poll_records"
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+    generation: tuple
+    expires_at: float
+
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+class ResponseCache:
+    def __init__(self, backend, max_entries: int, max_bytes: int):
+        self.backend = backend
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        # Bumped at once on this worker's commits, before the shared version,
+        # which a blocking backend bumps from a thread (see bump_soon)
+        self._local_writes: Dict[str, int] = {}
+
+    def generation(self, tables: Iterable[str]) -> tuple:
+        tables = tuple(tables)
+        return (
+            self.backend.versions(tuple(f"table:{table}" for table in tables)),
+            tuple(self._local_writes.get(table, 0) for table in tables)
+        )
+
+    def get(self, key: str, generation: tuple) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.generation != generation or entry.expires_at < time.monotonic():
+                self._discard(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: CachedResponse) -> None:
+        if len(entry.body) > self.max_bytes:
+            return
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = entry
+            self._bytes += len(entry.body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+
+    def _discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry.body)
+
+    def invalidate(self, tables: Iterable[str]) -> None:
+        """Publish new generations of `tables` to every worker sharing the state backend"""
+        with self._lock:
+            for table in tables:
+                self._local_writes[table] = self._local_writes.get(table, 0) + 1
+        bump_soon(self.backend, [f"table:{table}" for table in tables])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    async def respond(
+        self,
+        request: Request,
+        tables: Tuple[str, ...],
+        ttl: float,
+        build: Callable[[], Awaitable[Tuple[bytes, Dict[str, str]]]]
+    ) -> Response:
+        """Serve `request` from the cache or from `build()`, honouring If-None-Match.
+
+        `build` returns the JSON body and any extra headers (e.g. a next-page
+        cursor), which are cached and replayed together.
+        """
+        key = f"{request.url.path}?{sorted(request.query_params.multi_items())}"
+        if getattr(request.state, "read_replica", False):
+            # Replicas may lag the generation read below; never serve their
+            # responses to clients reading from the primary, and rebuild them
+            # once the replica has had time to catch up with it
+            key = f"replica:{key}"
+            ttl = min(ttl, settings.READ_YOUR_WRITES_SECONDS)
+        # Read before building, so a write racing with the build makes the entry stale
+        generation = await call(self.backend, self.generation, tables)
+        entry = self.get(key, generation) if settings.RESPONSE_CACHE_ENABLED else None
+        if entry is None:
+            body, headers = await build()
+            entry = CachedResponse(
+                body=body,
+                etag=etag_for(body),
+                headers=headers,
+                generation=generation,
+                expires_at=time.monotonic() + ttl
+            )
+            if settings.RESPONSE_CACHE_ENABLED:
+                self.put(key, entry)
+
+        headers = {**entry.headers, "ETag": entry.etag, "Cache-Control": "no-cache"}
+        if _matches(request.headers.get("if-none-match"), entry.etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+response_cache = ResponseCache(
+    state,
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=settings.RESPONSE_CACHE_MAX_BYTES
+)
+
+
+# Track every table a transaction writes, through the unit of work or through
+# INSERT/UPDATE/DELETE statements executed on the session, and invalidate
+# them once it commits
+@event.listens_for(Session, "after_flush")
+def _track_flushed_tables(session, flush_context):
+    tables = session.info.setdefault("tables_written", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        tables.add(obj.__table__.name)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_executed_tables(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info.setdefault("tables_written", set()).add(
+            orm_execute_state.statement.table.name
+        )
+
+
+def mark_written(session: Session, name: str) -> None:
+    """Invalidate `name`, e.g. CLOSED_POLL_RECORDS, when `session` commits"""
+    session.info.setdefault("tables_written", set()).add(name)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    tables = session.info.pop("tables_written", None)
+    if tables:
+        response_cache.invalidate(tables)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop("tables_written", None)
@@ -0,0 +1,410 @@
+"""
+Compact in-memory roster for mark validation
+
+``POST /attendance/mark`` only needs to know that a student exists and to echo
+their name and roll_no. Each worker keeps the whole roster in a few flat
+arrays, so validation is an array lookup instead of a ``students`` query
+and an ORM object:
+
+* ``slot_by_id``: ``array('i')`` indexed by student id, holding the student's
+  slot or -1
+* per slot: the id, the offset of the student's strings in ``data``, and the
+  byte lengths of the name and roll_no (4 + 4 + 2 + 2 bytes)
+* ``data``: one ``bytearray`` of UTF-8 names and roll_nos
+* ``roll_table``: an open-addressing hash table of slot + 1, keyed by roll_no,
+  kept at most half full
+
+Apart from the strings themselves, that is 16-20 bytes of arrays plus 8-16
+bytes of hash table per student. ``BYTES_PER_STUDENT_BUDGET`` is the budget
+for the whole index, strings included, checked at 100k students by the
+tests. Python objects are only created for the ``RosterEntry`` a lookup
+returns.
+
+Commits that add, rename or delete students through the ORM are applied to
+the index in place, and published on the ``roster`` channel of the state
+backend. Every worker applies what the others publish the same way, so a
+new student costs each of them one ``put``. As with poll events, that takes
+a backend whose channels reach every worker (``STATE_BACKEND=sqlite``).
+
+Changes the ORM cannot list, made by bulk INSERT/UPDATE/DELETE statements,
+bump the ``roster`` version instead. A worker whose version no longer
+matches reloads the whole roster, with one ``SELECT id, name, roll_no``, in
+a background thread. Until the reload is done its lookups return None and
+callers read the ``students`` table. The index is built at startup (see
+``benchmarks/bench_roster_index.py`` for the warm-up time).
+"""
+import asyncio
+import json
+import logging
+import threading
+import uuid
+from array import array
+from typing import Callable, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import models
+from .config import settings
+from .state_backend import bump_soon, call, publish_soon, state
+
+logger = logging.getLogger(__name__)
+
+# Whole index, arrays and strings, per student
+BYTES_PER_STUDENT_BUDGET = 100
+
+VERSION_NAMES = ("roster",)
+CHANNEL = "roster"
+
+_UNSET = object()
+
+
+class RosterEntry(NamedTuple):
+    id: int
+    name: str
+    roll_no: str
+
+
+class _Roster:
+    """The arrays of one roster; mutated only with the index lock held"""
+
+    def __init__(self):
+        self.slot_by_id = array("i")
+        self.ids = array("i")
+        self.offsets = array("I")
+        self.name_lens = array("H")
+        self.roll_lens = array("H")
+        self.data = bytearray()
+        self.dead_bytes = 0
+        self.free_slots = array("i")
+        self.roll_table = array("i", bytes(4 * 8))
+        self.roll_used = 0  # live entries and tombstones
+
+    @classmethod
+    def build(cls, rows: Iterable[Tuple[int, str, str]]) -> "_Roster":
+        roster = cls()
+        for student_id, name, roll_no in rows:
+            roster.put(student_id, name, roll_no)
+        return roster
+
+    def __len__(self) -> int:
+        return len(self.ids) - len(self.free_slots)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.slot_by_id, self.ids, self.offsets, self.name_lens, self.roll_lens, self.free_slots, self.roll_table)
+        return sum(a.itemsize * len(a) for a in arrays) + len(self.data)
+
+    def _slot(self, student_id: int) -> int:
+        return self.slot_by_id[student_id] if 0 <= student_id < len(self.slot_by_id) else -1
+
+    def _roll_bytes(self, slot: int) -> bytes:
+        start = self.offsets[slot] + self.name_lens[slot]
+        return bytes(self.data[start:start + self.roll_lens[slot]])
+
+    def entry(self, slot: int) -> RosterEntry:
+        start = self.offsets[slot]
+        middle = start + self.name_lens[slot]
+        return RosterEntry(
+            self.ids[slot],
+            self.data[start:middle].decode(),
+            self.data[middle:middle + self.roll_lens[slot]].decode()
+        )
+
+    def get(self, student_id: int) -> Optional[RosterEntry]:
+        slot = self._slot(student_id)
+        return self.entry(slot) if slot >= 0 else None
+
+    def get_by_roll_no(self, roll_no: str) -> Optional[RosterEntry]:
+        position = self._find_roll(roll_no.encode())
+        return self.entry(self.roll_table[position] - 1) if position >= 0 else None
+
+    # roll_no hash table: linear probing over slot + 1, 0 empty, -1 deleted
+
+    def _find_roll(self, roll_no: bytes) -> int:
+        """Position of `roll_no` in roll_table, or -1"""
+        mask = len(self.roll_table) - 1
+        position = hash(roll_no) & mask
+        while True:
+            value = self.roll_table[position]
+            if value == 0:
+                return -1
+            if value > 0 and self._roll_bytes(value - 1) == roll_no:
+                return position
+            position = (position + 1) & mask
+
+    def _insert_roll(self, slot: int, roll_no: bytes) -> None:
+        mask = len(self.roll_table) - 1
+        position = hash(roll_no) & mask
+        while self.roll_table[position] > 0:
+            position = (position + 1) & mask
+        if self.roll_table[position] == 0:
+            self.roll_used += 1
+        self.roll_table[position] = slot + 1
+
+    def _resize_rolls(self) -> None:
+        size = 8
+        while size < 4 * (len(self) + 1):
+            size *= 2
+        live = [slot for slot in range(len(self.ids)) if self.ids[slot] >= 0]
+        self.roll_table = array("i", bytes(4 * size))
+        self.roll_used = 0
+        for slot in live:
+            self._insert_roll(slot, self._roll_bytes(slot))
+
+    # Records
+
+    def put(self, student_id: int, name: str, roll_no: str) -> None:
+        name_bytes, roll_bytes = name.encode(), roll_no.encode()
+        if (self.roll_used + 1) * 2 > len(self.roll_table):
+            self._resize_rolls()
+        slot = self._slot(student_id)
+        if slot >= 0:
+            self._forget(slot)
+        elif self.free_slots:
+            slot = self.free_slots.pop()
+        else:
+            slot = len(self.ids)
+            for column in (self.ids, self.offsets, self.name_lens, self.roll_lens):
+                column.append(0)
+        if student_id >= len(self.slot_by_id):
+            grow = max(student_id + 1, 2 * len(self.slot_by_id)) - len(self.slot_by_id)
+            self.slot_by_id.extend(array("i", [-1]) * grow)
+
+        self.slot_by_id[student_id] = slot
+        self.ids[slot] = student_id
+        self.offsets[slot] = len(self.data)
+        self.name_lens[slot] = len(name_bytes)
+        self.roll_lens[slot] = len(roll_bytes)
+        self.data += name_bytes + roll_bytes
+        self._insert_roll(slot, roll_bytes)
+        self._compact_if_sparse()
+
+    def apply(self, student_id: int, name: Optional[str], roll_no: Optional[str]) -> None:
+        """Put a student, or remove them when `name` is None"""
+        if name is None:
+            self.remove(student_id)
+        else:
+            self.put(student_id, name, roll_no)
+
+    def remove(self, student_id: int) -> None:
+        slot = self._slot(student_id)
+        if slot < 0:
+            return
+        self._forget(slot)
+        self.slot_by_id[student_id] = -1
+        self.ids[slot] = -1
+        self.free_slots.append(slot)
+
+    def _forget(self, slot: int) -> None:
+        """Drop a slot's roll_no from the hash table and its strings from the live bytes"""
+        # Probe for this slot rather than the roll_no, which another student
+        # may already have taken over earlier in the same commit
+        mask = len(self.roll_table) - 1
+        position = hash(self._roll_bytes(slot)) & mask
+        while self.roll_table[position] != 0:
+            if self.roll_table[position] == slot + 1:
+                self.roll_table[position] = -1
+                break
+            position = (position + 1) & mask
+        self.dead_bytes += self.name_lens[slot] + self.roll_lens[slot]
+
+    def _compact_if_sparse(self) -> None:
+        if self.dead_bytes < 4096 or self.dead_bytes * 2 < len(self.data):
+            return
+        data = bytearray()
+        for slot in range(len(self.ids)):
+            if self.ids[slot] >= 0:
+                start, length = self.offsets[slot], self.name_lens[slot] + self.roll_lens[slot]
+                self.offsets[slot] = len(data)
+                data += self.data[start:start + length]
+        self.data = data
+        self.dead_bytes = 0
+
+
+class RosterIndex:
+    def __init__(self, backend):
+        self.backend = backend
+        # Tells this index's own messages apart from other workers'
+        self.origin = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._roster = _Roster()
+        self._generation = _UNSET
+        self._load: Optional[Callable[[], List[Tuple[int, str, str]]]] = None
+        # Changes applied while a reload runs, to replay onto its result;
+        # None when no reload is running
+        self._replay: Optional[List[Tuple[int, Optional[str], Optional[str]]]] = None
+        self._after: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._roster)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the arrays and strings of the index"""
+        return self._roster.nbytes
+
+    # As in the poll cache, the lock is never held while loading: loaders may
+    # run inside an async session's greenlet
+
+    def refresh(self, load: Callable[[], List[Tuple[int, str, str]]]) -> None:
+        """Load the roster now, e.g. at startup"""
+        generation = self.backend.versions(VERSION_NAMES)
+        with self._lock:
+            self._replay = []
+        roster = _Roster.build(load())
+        with self._lock:
+            for student_id, name, roll_no in self._replay:
+                roster.apply(student_id, name, roll_no)
+            self._replay = None
+            self._roster = roster
+            # A bulk change committed while loading leaves this load stale
+            if self.backend.versions(VERSION_NAMES) == generation:
+                self._generation = generation
+
+    def _reload(self) -> None:
+        try:
+            self.refresh(self._load)
+        except Exception:
+            logger.exception("Roster reload failed")
+            with self._lock:
+                self._replay = None
+
+    def _current(self) -> Optional[_Roster]:
+        """The roster, or None while it is stale; a stale roster is reloaded
+        in the background when start() has set a loader"""
+        generation = self.backend.versions(VERSION_NAMES)
+        with self._lock:
+            if generation == self._generation:
+                return self._roster
+            if self._load is None or self._replay is not None:
+                return None
+            self._replay = []
+        threading.Thread(target=self._reload, name="roster-reload", daemon=True).start()
+        return None
+
+    def get(self, student_id: int) -> Optional[RosterEntry]:
+        """The student, or None if they do not exist or the roster is stale"""
+        roster = self._current()
+        if roster is None:
+            return None
+        with self._lock:
+            return roster.get(student_id)
+
+    def get_by_roll_no(self, roll_no: str) -> Optional[RosterEntry]:
+        roster = self._current()
+        if roster is None:
+            return None
+        with self._lock:
+            return roster.get_by_roll_no(roll_no)
+
+    def _apply_locally(self, changes: List[Tuple[int, Optional[str], Optional[str]]]) -> None:
+        with self._lock:
+            for student_id, name, roll_no in changes:
+                self._roster.apply(student_id, name, roll_no)
+            if self._replay is not None:
+                self._replay.extend(changes)
+
+    def apply(self, changes: List[Tuple[int, Optional[str], Optional[str]]], complete: bool) -> None:
+        """Apply committed (id, name, roll_no) changes, name None for a deletion,
+        and pass them on to every worker. `complete` is False when the commit
+        also changed students in ways not listed, so the roster must be reloaded."""
+        self._apply_locally(changes)
+        if not complete:
+            with self._lock:
+                self._generation = _UNSET
+            bump_soon(self.backend, VERSION_NAMES)
+        elif changes:
+            publish_soon(self.backend, CHANNEL, json.dumps({"origin": self.origin, "changes": changes}))
+
+    def receive(self, payload: str) -> None:
+        """Apply a message from the roster channel published by another worker"""
+        message = json.loads(payload)
+        if message["origin"] != self.origin:
+            self._apply_locally([tuple(change) for change in message["changes"]])
+
+    def catch_up(self) -> None:
+        """Apply the messages published since the last call, or since start()"""
+        self._after, payloads = self.backend.read(CHANNEL, self._after)
+        for payload in payloads:
+            self.receive(payload)
+
+    async def start(self, load: Callable[[], List[Tuple[int, str, str]]]) -> None:
+        """Build the index, then follow the roster channel and reload with
+        `load` whenever the roster goes stale"""
+        # Follow from before the load, so no change is missed in between
+        self._after, _ = await call(self.backend, self.backend.read, CHANNEL, None)
+        await run_in_threadpool(self.refresh, load)
+        self._load = load
+        self._task = asyncio.create_task(self._follow())
+
+    async def _follow(self) -> None:
+        while True:
+            await asyncio.sleep(settings.STATE_SUBSCRIBE_INTERVAL_SECONDS)
+            try:
+                await call(self.backend, self.catch_up)
+            except Exception:
+                # Messages are read again from the same place next time
+                logger.exception("Roster channel relay failed")
+
+    async def stop(self) -> None:
+        self._load = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._roster = _Roster()
+            self._generation = _UNSET
+
+
+roster_index = RosterIndex(state)
+
+
+def _renamed(student: models.Student) -> bool:
+    attrs = inspect(student).attrs
+    return attrs.name.history.has_changes() or attrs.roll_no.history.has_changes()
+
+
+@event.listens_for(Session, "after_flush")
+def _track_student_writes(session, flush_context):
+    # Dirty students include those whose marks or enrollments changed; only
+    # new names and roll_nos matter here
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if not isinstance(obj, models.Student):
+            continue
+        if obj in session.deleted:
+            session.info.setdefault("roster_changes", []).append((obj.id, None, None))
+        elif obj in session.new or _renamed(obj):
+            session.info.setdefault("roster_changes", []).append((obj.id, obj.name, obj.roll_no))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_student_statements(orm_execute_state):
+    # Bulk INSERT/UPDATE/DELETE statements bypass the unit of work
+    if (
+        (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete)
+        and orm_execute_state.statement.table.name == models.Student.__tablename__
+    ):
+        orm_execute_state.session.info["roster_stale"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_after_commit(session):
+    changes = session.info.pop("roster_changes", [])
+    stale = session.info.pop("roster_stale", False)
+    if changes or stale:
+        roster_index.apply(changes, complete=not stale)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop("roster_changes", None)
+    session.info.pop("roster_stale", None)
@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import List
+from .. import schemas
+from ..analytics import attendance_analytics
+from ..database import get_db
+
+router = APIRouter(
+    prefix="/analytics",
+    tags=["analytics"]
+)
+
+# Sync handlers: loading and recomputing the snapshot runs in the threadpool,
+# off the event loop
+
+@router.get("/turnout", response_model=List[schemas.PollTurnout])
+def get_turnout(db: Session = Depends(get_db)):
+    """Get turnout and the cumulative marking curve of every poll, oldest first"""
+    return attendance_analytics.report(db).turnout
+
+@router.get("/departments", response_model=List[schemas.DepartmentTrend])
+def get_department_trends(db: Session = Depends(get_db)):
+    """Get each department's attendance percentage poll by poll"""
+    return attendance_analytics.report(db).departments
+
+@router.get("/streaks", response_model=List[schemas.AbsenceStreak])
+def get_absence_streaks(
+    min_current: int = Query(3, ge=1),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """Get students currently absent for at least `min_current` consecutive polls"""
+    return attendance_analytics.report(db).absence_streaks(min_current, limit)
+
+@router.get("/time-to-mark", response_model=schemas.TimeToMarkDistribution)
+def get_time_to_mark(db: Session = Depends(get_db)):
+    """Get the distribution of seconds from poll start to mark"""
+    return attendance_analytics.report(db).time_to_mark
@@ -1,26 +1,65 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from datetime import datetime
-from typing import List
-from .. import crud, schemas
-from ..database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from datetime import datetime, timedelta
+import asyncio
+import json
+import logging
+import math
+import time
+from functools import partial
+from typing import Dict, List, Optional, Union
+from .. import crud, fast_json, schemas
+from ..broadcast import PollStatusBroadcaster, sse_events
+from ..config import settings
+from ..database import SessionLocal, get_async_db, get_async_read_db, pin_reads_to_primary
+from ..exports import MEDIA_TYPES, ExportFormat, attendance_matrix_export, poll_log_export
+from ..idempotency import (
+    IDEMPOTENCY_KEY_HEADER, REPLAYED_HEADER, StoredResponse, fingerprint, idempotency_store
+)
+from ..pagination import NEXT_CURSOR_HEADER, cursor_param, next_cursor
+from ..poll_cache import PollSnapshot
+from ..poll_expiry import poll_expiry
+from ..rate_limit import client_limiter, student_limiter
+from ..response_cache import CLOSED_POLL_RECORDS, response_cache
+from ..state_backend import state, subscribe
+from ..write_behind import mark_queue
 
 router = APIRouter(
     prefix="/attendance",
     tags=["attendance"]
 )
 
+logger = logging.getLogger(__name__)
+
+# Poll start/close events, shared by every worker through the state backend
+POLL_EVENTS_CHANNEL = "poll-events"
+
+# Polls per request to GET /attendance/absentees
+MAX_ABSENTEE_POLL_RANGE = 100
+
+# A poll's records are usually final this long after it ends, once late
+# write-behind flushes have landed; records replayed later still invalidate
+# its log (see response_cache.CLOSED_POLL_RECORDS)
+CLOSED_POLL_GRACE = timedelta(seconds=60)
+
+_poll_list = TypeAdapter(List[schemas.PollResponse])
+
 @router.post("/start", response_model=schemas.PollResponse, status_code=status.HTTP_201_CREATED)
-def start_poll(poll: schemas.PollCreate, db: Session = Depends(get_db)):
-    """Start a new attendance poll"""
-    db_poll = crud.create_poll(db=db, duration_minutes=poll.duration_minutes)
+async def start_poll(poll: schemas.PollCreate, db: AsyncSession = Depends(get_async_db)):
+    """Start a new attendance poll, for one section or campus-wide"""
+    if poll.section_id is not None and not await db.run_sync(crud.get_section, section_id=poll.section_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Section not found"
+        )
+    db_poll = await db.run_sync(crud.create_poll, duration_minutes=poll.duration_minutes, section_id=poll.section_id)
+    await run_in_threadpool(_publish_poll_event, "started", db_poll.id, db_poll.section_id, db_poll.end_time)
     return db_poll
 
-@router.get("/current", response_model=schemas.PollStatus)
-def get_current_poll(db: Session = Depends(get_db)):
-    """Get the current active poll status"""
-    poll = crud.get_active_poll(db)
-    
+def _poll_status(poll: Optional[PollSnapshot]) -> schemas.PollStatus:
     if not poll:
         return schemas.PollStatus(is_active=False)
     
@@ -30,19 +69,177 @@ def get_current_poll(db: Session = Depends(get_db)):
     return schemas.PollStatus(
         is_active=True,
         poll_id=poll.id,
+        section_id=poll.section_id,
         start_time=poll.start_time,
         end_time=poll.end_time,
         remaining_seconds=max(0, remaining_seconds)
     )
 
-@router.post("/mark", response_model=schemas.AttendanceRecordResponse)
-def mark_attendance(
+def _live_poll_status(section_id: Optional[int] = None) -> str:
+    """Compute the status pushed to every stream subscriber of a section on a tick"""
+    db = SessionLocal()
+    try:
+        poll_status = _poll_status(crud.get_cached_active_poll(db, section_id))
+        present_count = crud.count_poll_attendance(db, poll_status.poll_id) if poll_status.is_active else 0
+        return schemas.PollStatusEvent(
+            **poll_status.model_dump(),
+            present_count=present_count
+        ).model_dump_json()
+    finally:
+        db.close()
+
+# One producer per section with subscribers (None: the campus-wide poll)
+broadcasters: Dict[Optional[int], PollStatusBroadcaster] = {}
+
+def _drop_broadcaster(section_id: Optional[int], broadcaster: PollStatusBroadcaster) -> None:
+    # A stream that started after the entry was dropped runs on a detached
+    # broadcaster; it must not drop the section's current one
+    if broadcasters.get(section_id) is broadcaster:
+        del broadcasters[section_id]
+
+def _broadcaster(section_id: Optional[int]) -> PollStatusBroadcaster:
+    if section_id not in broadcasters:
+        broadcasters[section_id] = PollStatusBroadcaster(
+            partial(_live_poll_status, section_id),
+            interval=settings.POLL_STREAM_INTERVAL_SECONDS,
+            keepalive=settings.POLL_STREAM_KEEPALIVE_SECONDS,
+            on_idle=partial(_drop_broadcaster, section_id)
+        )
+    return broadcasters[section_id]
+
+def _publish_poll_event(event: str, poll_id: int, section_id: Optional[int], end_time: Optional[datetime] = None) -> None:
+    state.publish(POLL_EVENTS_CHANNEL, json.dumps({
+        "event": event,
+        "poll_id": poll_id,
+        "section_id": section_id,
+        "end_time": end_time.isoformat() if end_time else None
+    }))
+
+async def _publish_closed_polls(closed) -> None:
+    for row in closed:
+        await run_in_threadpool(_publish_poll_event, "closed", row.id, row.section_id)
+
+poll_expiry.add_listener(_publish_closed_polls)
+
+async def relay_poll_events() -> None:
+    """Apply poll events from every worker to this worker's expiry scheduler and streams.
+
+    Streams get the new status right away instead of on their next tick, and
+    every worker schedules every deadline without waiting for a resync.
+    """
+    while True:
+        try:
+            async for payload in subscribe(state, POLL_EVENTS_CHANNEL, settings.STATE_SUBSCRIBE_INTERVAL_SECONDS):
+                event = json.loads(payload)
+                if event["event"] == "started":
+                    poll_expiry.schedule(event["poll_id"], datetime.fromisoformat(event["end_time"]))
+                broadcaster = broadcasters.get(event["section_id"])
+                if broadcaster is not None and broadcaster.subscriber_count:
+                    broadcaster.publish(await run_in_threadpool(_live_poll_status, event["section_id"]))
+        except Exception:
+            # Events missed meanwhile are caught up by the resync and stream ticks
+            logger.exception("Poll event relay failed")
+            await asyncio.sleep(1.0)
+
+@router.get("/current", response_model=schemas.PollStatus)
+async def get_current_poll(section_id: Optional[int] = None, db: AsyncSession = Depends(get_async_db)):
+    """Get the active poll status of a section, or of the campus-wide poll"""
+    return _poll_status(await db.run_sync(crud.get_cached_active_poll, section_id=section_id))
+
+@router.get("/current/stream")
+async def stream_current_poll(section_id: Optional[int] = None, db: AsyncSession = Depends(get_async_db)):
+    """Stream poll status and live present count as Server-Sent Events"""
+    if section_id is not None and not await db.run_sync(crud.get_section, section_id=section_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Section not found"
+        )
+    # The session would otherwise hold its connection for the life of the stream
+    await db.close()
+    return StreamingResponse(
+        sse_events(_broadcaster(section_id).subscribe()),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/current/student/{student_id}", response_model=List[schemas.PollStatus])
+async def get_student_current_polls(student_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Get the active polls a student can mark: their sections' and the campus-wide one"""
+    section_ids = await db.run_sync(crud.get_student_section_ids, student_id=student_id)
+    polls = [await db.run_sync(crud.get_cached_active_poll, section_id=section_id) for section_id in (None, *section_ids)]
+    return [_poll_status(poll) for poll in polls if poll]
+
+async def _check_rate_limits(request: Request, student_id: int) -> None:
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    client = request.client.host if request.client else "unknown"
+    # Only requests the student's bucket lets through count against the
+    # client, so one student's retries cannot lock out a shared address
+    wait = await student_limiter.check(f"student:{student_id}")
+    if not wait:
+        wait = await client_limiter.check(f"client:{client}")
+    if wait:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attendance requests; retry later",
+            headers={"Retry-After": str(math.ceil(wait))}
+        )
+
+@router.post("/mark", response_model=Union[schemas.AttendanceRecordResponse, schemas.AttendanceMarkAck])
+async def mark_attendance(
     attendance: schemas.AttendanceMarkRequest,
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Mark attendance for a student"""
+    # Replay the stored response to a retry before any validation or limits
+    idempotency_key = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+    if idempotency_key:
+        request_fingerprint = fingerprint(attendance.model_dump_json().encode())
+        stored = await idempotency_store.get(idempotency_key)
+        if stored is not None:
+            if stored.fingerprint != request_fingerprint:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail="Idempotency-Key was already used for a different request"
+                )
+            replay = Response(
+                content=stored.body,
+                status_code=stored.status_code,
+                media_type="application/json",
+                headers={REPLAYED_HEADER: "true"}
+            )
+            pin_reads_to_primary(replay)
+            return replay
+    
+    await _check_rate_limits(request, attendance.student_id)
+    result = await _mark(attendance, response, db)
+    pin_reads_to_primary(response)
+    
+    if idempotency_key:
+        status_code = response.status_code or status.HTTP_200_OK
+        body = result.model_dump_json().encode()
+        # A concurrent retry may have stored its response first; both get that one
+        stored = await idempotency_store.put(idempotency_key, StoredResponse(
+            fingerprint=request_fingerprint,
+            status_code=status_code,
+            body=body,
+            expires_at=time.time() + settings.IDEMPOTENCY_TTL_SECONDS
+        ))
+        stored_response = Response(content=stored.body, status_code=stored.status_code, media_type="application/json")
+        pin_reads_to_primary(stored_response)
+        return stored_response
+    return result
+
+async def _mark(
+    attendance: schemas.AttendanceMarkRequest,
+    response: Response,
+    db: AsyncSession
+) -> Union[schemas.AttendanceRecordResponse, schemas.AttendanceMarkAck]:
     # Verify student exists
-    student = crud.get_student(db, student_id=attendance.student_id)
+    lookup = crud.get_roster_entry if settings.ROSTER_INDEX_ENABLED else crud.get_student
+    student = await db.run_sync(lookup, student_id=attendance.student_id)
     if not student:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -50,23 +247,45 @@ def mark_attendance(
         )
     
     # Verify poll exists and is active
-    poll = crud.get_poll(db, poll_id=attendance.poll_id)
+    poll = await db.run_sync(crud.get_cached_poll, poll_id=attendance.poll_id)
     if not poll:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Poll not found"
         )
     
+    # The end_time check covers the moments between a deadline and the
+    # expiry scheduler closing the poll
     now = datetime.utcnow()
-    if now < poll.start_time or now > poll.end_time:
+    if not poll.is_active or now < poll.start_time or now > poll.end_time:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Poll has expired or not yet started"
         )
     
+    if poll.section_id is not None and not await db.run_sync(
+        crud.is_enrolled, section_id=poll.section_id, student_id=attendance.student_id
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Student is not enrolled in the poll's section"
+        )
+    
+    if settings.WRITE_BEHIND_ENABLED:
+        # Acknowledge now; the record is written by the next group commit
+        marked_at, _ = await mark_queue.enqueue(attendance.student_id, attendance.poll_id)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return schemas.AttendanceMarkAck(
+            student_id=attendance.student_id,
+            poll_id=attendance.poll_id,
+            marked_at=marked_at,
+            student_name=student.name,
+            student_roll_no=student.roll_no
+        )
+    
     # Mark attendance
-    record = crud.mark_attendance(
-        db=db,
+    record = await db.run_sync(
+        crud.mark_attendance,
         student_id=attendance.student_id,
         poll_id=attendance.poll_id
     )
@@ -80,63 +299,244 @@ def mark_attendance(
         student_roll_no=student.roll_no
     )
 
+@router.post("/mark/batch", response_model=schemas.AttendanceBatchMarkResponse)
+async def mark_attendance_batch(
+    batch: schemas.AttendanceBatchMarkRequest,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Mark attendance for many students in a single transaction"""
+    results = await db.run_sync(
+        crud.mark_attendance_batch,
+        pairs=[(item.student_id, item.poll_id) for item in batch.records]
+    )
+    pin_reads_to_primary(response)
+
+    counts = {"created": 0, "duplicate": 0, "rejected": 0}
+    for result in results:
+        counts[result["status"]] += 1
+
+    return schemas.AttendanceBatchMarkResponse(
+        **counts,
+        results=[schemas.AttendanceBatchItemResult(**result) for result in results]
+    )
+
 @router.get("/logs/{poll_id}", response_model=schemas.AttendanceLogResponse)
-def get_attendance_logs(poll_id: int, db: Session = Depends(get_db)):
+async def get_attendance_logs(poll_id: int, request: Request, db: AsyncSession = Depends(get_async_read_db)):
     """Get attendance logs for a specific poll"""
-    poll = crud.get_poll(db, poll_id=poll_id)
+    poll = await db.run_sync(crud.get_cached_poll, poll_id=poll_id)
     if not poll:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Poll not found"
         )
     
-    records = crud.get_attendance_by_poll(db, poll_id=poll_id)
-    total_students = len(crud.get_students(db))
-    present_count = len(records)
-    absent_count = total_students - present_count
+    async def build():
+        rows = await db.run_sync(crud.get_attendance_log_rows, poll_id=poll_id)
+        total_students = await db.run_sync(crud.count_poll_roster, poll_id=poll_id)
+        present_count = len(rows)
+        absent_count = total_students - present_count
+        
+        percentage = (present_count / total_students * 100) if total_students > 0 else 0
+        
+        if settings.FAST_JSON_ENABLED:
+            return fast_json.dumps({
+                "poll_id": poll.id,
+                "start_time": poll.start_time,
+                "end_time": poll.end_time,
+                "total_students": total_students,
+                "present_count": present_count,
+                "absent_count": absent_count,
+                "attendance_percentage": float(round(percentage, 2)),
+                "records": [row._asdict() for row in rows]
+            }), {}
+        
+        record_responses = [
+            schemas.AttendanceRecordResponse(
+                id=row.id,
+                student_id=row.student_id,
+                poll_id=row.poll_id,
+                marked_at=row.marked_at,
+                student_name=row.student_name,
+                student_roll_no=row.student_roll_no
+            )
+            for row in rows
+        ]
+        
+        log = schemas.AttendanceLogResponse(
+            poll_id=poll.id,
+            start_time=poll.start_time,
+            end_time=poll.end_time,
+            total_students=total_students,
+            present_count=present_count,
+            absent_count=absent_count,
+            attendance_percentage=round(percentage, 2),
+            records=record_responses
+        )
+        return log.model_dump_json().encode(), {}
     
-    percentage = (present_count / total_students * 100) if total_students > 0 else 0
+    # Deleting a student cascades to its records, so a closed poll's log
+    # depends on its roster, and on the rare records that land after it closed
+    roster = ("students",) if poll.section_id is None else ("students", "enrollments")
+    if datetime.utcnow() > poll.end_time + CLOSED_POLL_GRACE:
+        return await response_cache.respond(
+            request, (*roster, CLOSED_POLL_RECORDS), settings.RESPONSE_CACHE_CLOSED_POLL_TTL_SECONDS, build
+        )
+    return await response_cache.respond(
+        request, (*roster, "attendance_records"), settings.RESPONSE_CACHE_TTL_SECONDS, build
+    )
+
+@router.get("/logs/{poll_id}/export")
+async def export_attendance_logs(
+    poll_id: int,
+    format: ExportFormat = "csv",
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Stream every attendance record of a poll as CSV or NDJSON"""
+    poll = await db.run_sync(crud.get_poll, poll_id=poll_id)
+    if not poll:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Poll not found"
+        )
     
-    record_responses = [
-        schemas.AttendanceRecordResponse(
-            id=r.id,
-            student_id=r.student_id,
-            poll_id=r.poll_id,
-            marked_at=r.marked_at,
-            student_name=r.student.name,
-            student_roll_no=r.student.roll_no
+    return StreamingResponse(
+        poll_log_export(SessionLocal, poll_id, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="poll-{poll_id}.{format}"'}
+    )
+
+@router.get("/export/matrix")
+async def export_attendance_matrix(format: ExportFormat = "csv"):
+    """Stream the roster x polls attendance matrix as CSV or NDJSON"""
+    return StreamingResponse(
+        attendance_matrix_export(SessionLocal, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="attendance-matrix.{format}"'}
+    )
+
+@router.get("/logs/{poll_id}/absentees", response_model=List[schemas.StudentResponse])
+async def get_poll_absentees(
+    poll_id: int,
+    response: Response,
+    department: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get students who did not mark a poll, in roster order, paged by cursor"""
+    after = cursor_param(cursor)
+    poll = await db.run_sync(crud.get_poll, poll_id=poll_id)
+    if not poll:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Poll not found"
         )
-        for r in records
-    ]
     
-    return schemas.AttendanceLogResponse(
-        poll_id=poll.id,
-        start_time=poll.start_time,
-        end_time=poll.end_time,
-        total_students=total_students,
-        present_count=present_count,
-        absent_count=absent_count,
-        attendance_percentage=round(percentage, 2),
-        records=record_responses
+    students = await db.run_sync(
+        crud.get_poll_absentees,
+        poll=poll,
+        department=department,
+        limit=limit,
+        after=after
     )
+    cursor = next_cursor(students, limit, "created_at")
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+    return students
+
+@router.get("/absentees", response_model=List[schemas.PollAbsentees])
+async def get_absentees_for_polls(
+    first_poll_id: int,
+    last_poll_id: int,
+    department: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get the absent student ids of every poll in an id range"""
+    if not 0 <= last_poll_id - first_poll_id < MAX_ABSENTEE_POLL_RANGE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Poll range must cover 1 to {MAX_ABSENTEE_POLL_RANGE} polls"
+        )
+    
+    rows = await db.run_sync(
+        crud.get_absentees_for_polls,
+        first_poll_id=first_poll_id,
+        last_poll_id=last_poll_id,
+        department=department
+    )
+    absentees = {}
+    for row in rows:
+        absentees.setdefault(row.poll_id, []).append(row.student_id)
+    # Include polls nobody missed; rows only exist for absentees
+    poll_ids = await db.run_sync(crud.get_poll_ids_in_range, first_poll_id=first_poll_id, last_poll_id=last_poll_id)
+    return [
+        schemas.PollAbsentees(
+            poll_id=poll_id,
+            absent_count=len(absentees.get(poll_id, [])),
+            student_ids=absentees.get(poll_id, [])
+        )
+        for poll_id in poll_ids
+    ]
 
 @router.get("/logs", response_model=List[schemas.PollResponse])
-def get_all_polls(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
-    """Get all attendance polls"""
-    polls = crud.get_polls(db, skip=skip, limit=limit)
-    return polls
+async def get_all_polls(
+    request: Request,
+    skip: int = 0,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Get all attendance polls, newest first, paged by skip/limit or cursor"""
+    before = cursor_param(cursor)
+    
+    async def build():
+        if settings.FAST_JSON_ENABLED:
+            polls = await db.run_sync(crud.get_poll_rows, skip=skip, limit=limit, before=before)
+            body = fast_json.dump_rows(polls)
+        else:
+            polls = await db.run_sync(crud.get_polls, skip=skip, limit=limit, before=before)
+            body = _poll_list.dump_json(_poll_list.validate_python(polls, from_attributes=True))
+        cursor = next_cursor(polls, limit, "created_at")
+        return body, {NEXT_CURSOR_HEADER: cursor} if cursor else {}
+    
+    return await response_cache.respond(request, ("attendance_polls",), settings.RESPONSE_CACHE_TTL_SECONDS, build)
 
 @router.get("/student/{student_id}", response_model=List[schemas.AttendanceRecordResponse])
-def get_student_attendance(student_id: int, db: Session = Depends(get_db)):
-    """Get attendance history for a specific student"""
-    student = crud.get_student(db, student_id=student_id)
+async def get_student_attendance(
+    student_id: int,
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Get attendance history for a specific student, newest first"""
+    before = cursor_param(cursor)
+    student = await db.run_sync(crud.get_student, student_id=student_id)
     if not student:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Student not found"
         )
     
-    records = crud.get_student_attendance_history(db, student_id=student_id)
+    if settings.FAST_JSON_ENABLED:
+        rows = await db.run_sync(crud.get_student_attendance_rows, student=student, limit=limit, before=before)
+        cursor = next_cursor(rows, limit, "marked_at")
+        return Response(
+            content=fast_json.dump_rows(rows),
+            media_type="application/json",
+            headers={NEXT_CURSOR_HEADER: cursor} if cursor else None
+        )
+    
+    records = await db.run_sync(
+        crud.get_student_attendance_history,
+        student_id=student_id,
+        limit=limit,
+        before=before
+    )
+    cursor = next_cursor(records, limit, "marked_at")
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
     
     return [
         schemas.AttendanceRecordResponse(
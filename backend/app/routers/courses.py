@@ -0,0 +1,108 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from .. import crud, schemas
+from ..database import get_async_db
+from ..pagination import NEXT_CURSOR_HEADER, cursor_param, next_cursor
+
+router = APIRouter(
+    tags=["courses"]
+)
+
+async def _get_section(db: AsyncSession, section_id: int):
+    section = await db.run_sync(crud.get_section, section_id=section_id)
+    if section is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Section not found"
+        )
+    return section
+
+@router.post("/courses/", response_model=schemas.CourseResponse, status_code=status.HTTP_201_CREATED)
+async def create_course(course: schemas.CourseCreate, db: AsyncSession = Depends(get_async_db)):
+    """Create a new course"""
+    if await db.run_sync(crud.get_course_by_code, code=course.code):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Course code already registered"
+        )
+    return await db.run_sync(crud.create_course, course=course)
+
+@router.get("/courses/", response_model=List[schemas.CourseResponse])
+async def get_courses(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_db)):
+    """Get all courses"""
+    return await db.run_sync(crud.get_courses, skip=skip, limit=limit)
+
+@router.get("/courses/{course_id}", response_model=schemas.CourseResponse)
+async def get_course(course_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Get a specific course by ID"""
+    course = await db.run_sync(crud.get_course, course_id=course_id)
+    if course is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Course not found"
+        )
+    return course
+
+@router.post("/courses/{course_id}/sections", response_model=schemas.SectionResponse, status_code=status.HTTP_201_CREATED)
+async def create_section(course_id: int, section: schemas.SectionCreate, db: AsyncSession = Depends(get_async_db)):
+    """Add a section to a course"""
+    if not await db.run_sync(crud.get_course, course_id=course_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Course not found"
+        )
+    if any(existing.name == section.name for existing in await db.run_sync(crud.get_sections, course_id=course_id)):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Section name already used in this course"
+        )
+    return await db.run_sync(crud.create_section, course_id=course_id, section=section)
+
+@router.get("/courses/{course_id}/sections", response_model=List[schemas.SectionResponse])
+async def get_sections(course_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Get the sections of a course"""
+    return await db.run_sync(crud.get_sections, course_id=course_id)
+
+@router.get("/sections/{section_id}", response_model=schemas.SectionResponse)
+async def get_section(section_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Get a specific section by ID"""
+    return await _get_section(db, section_id)
+
+@router.post("/sections/{section_id}/enrollments", response_model=schemas.EnrollmentResponse)
+async def enroll_students(
+    section_id: int,
+    enrollment: schemas.EnrollmentRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Add students to a section's roster; unknown and already-enrolled ids are skipped"""
+    await _get_section(db, section_id)
+    enrolled = await db.run_sync(crud.enroll_students, section_id=section_id, student_ids=enrollment.student_ids)
+    return schemas.EnrollmentResponse(section_id=section_id, enrolled=enrolled)
+
+@router.delete("/sections/{section_id}/enrollments/{student_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def unenroll_student(section_id: int, student_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Remove a student from a section's roster"""
+    if not await db.run_sync(crud.unenroll_student, section_id=section_id, student_id=student_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Enrollment not found"
+        )
+    return None
+
+@router.get("/sections/{section_id}/students", response_model=List[schemas.StudentResponse])
+async def get_section_roster(
+    section_id: int,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get the students enrolled in a section, in roster order, paged by cursor"""
+    after = cursor_param(cursor)
+    await _get_section(db, section_id)
+    students = await db.run_sync(crud.get_section_roster, section_id=section_id, limit=limit, after=after)
+    cursor = next_cursor(students, limit, "created_at")
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+    return students
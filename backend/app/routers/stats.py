@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from .. import crud, schemas
+from ..database import get_async_db
+
+router = APIRouter(
+    prefix="/stats",
+    tags=["stats"]
+)
+
+@router.get("/departments", response_model=List[schemas.DepartmentStatsResponse])
+async def get_department_stats(db: AsyncSession = Depends(get_async_db)):
+    """Get attendance totals and percentage per department"""
+    rows = await db.run_sync(crud.get_department_stats)
+    return [
+        schemas.DepartmentStatsResponse(
+            department=row.department,
+            students=row.students,
+            attended=row.attended,
+            total_polls=row.total_polls,
+            percentage=round(row.attended / row.total_polls * 100, 2) if row.total_polls else None
+        )
+        for row in rows
+    ]
+
+@router.get("/at-risk", response_model=List[schemas.AtRiskStudentResponse])
+async def get_at_risk_students(
+    threshold: float = Query(75.0, ge=0, le=100),
+    department: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get students below the attendance threshold, lowest percentage first"""
+    rows = await db.run_sync(
+        crud.get_at_risk_students,
+        threshold=threshold,
+        department=department,
+        limit=limit
+    )
+    return [
+        schemas.AtRiskStudentResponse(
+            student_id=row.id,
+            name=row.name,
+            roll_no=row.roll_no,
+            department=row.department,
+            attended=row.attended,
+            total_polls=row.total_polls,
+            percentage=round(row.percentage, 2)
+        )
+        for row in rows
+    ]
@@ -1,36 +1,74 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, HTTPException, Request, UploadFile, status
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
-from typing import List
-from .. import crud, schemas
-from ..database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from .. import crud, fast_json, schemas
+from ..database import get_async_db, get_async_read_db, get_db
+from ..imports import import_students_csv
+from ..config import settings
+from ..pagination import NEXT_CURSOR_HEADER, cursor_param, next_cursor
+from ..response_cache import response_cache
 
 router = APIRouter(
     prefix="/students",
     tags=["students"]
 )
 
+_student_list = TypeAdapter(List[schemas.StudentResponse])
+
 @router.post("/", response_model=schemas.StudentResponse, status_code=status.HTTP_201_CREATED)
-def create_student(student: schemas.StudentCreate, db: Session = Depends(get_db)):
+async def create_student(student: schemas.StudentCreate, db: AsyncSession = Depends(get_async_db)):
     """Create a new student"""
     # Check if roll number already exists
-    db_student = crud.get_student_by_roll_no(db, roll_no=student.roll_no)
+    db_student = await db.run_sync(crud.get_student_by_roll_no, roll_no=student.roll_no)
     if db_student:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Roll number already registered"
         )
-    return crud.create_student(db=db, student=student)
+    return await db.run_sync(crud.create_student, student=student)
+
+@router.post("/import", response_model=schemas.StudentImportResponse)
+def import_students(
+    file: UploadFile = File(...),
+    update_existing: bool = False,
+    db: Session = Depends(get_db)
+):
+    """Bulk-create students from a CSV upload with name, roll_no and department columns"""
+    # Sync handler: parsing a large roster runs in the threadpool, off the event loop
+    try:
+        return import_students_csv(db, file.file, update_existing=update_existing)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
 
 @router.get("/", response_model=List[schemas.StudentResponse])
-def get_students(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """Get all students"""
-    students = crud.get_students(db, skip=skip, limit=limit)
-    return students
+async def get_students(
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Get all students, paged by skip/limit or by the X-Next-Cursor of the previous page"""
+    after = cursor_param(cursor)
+    
+    async def build():
+        if settings.FAST_JSON_ENABLED:
+            students = await db.run_sync(crud.get_student_rows, skip=skip, limit=limit, after=after)
+            body = fast_json.dump_rows(students)
+        else:
+            students = await db.run_sync(crud.get_students, skip=skip, limit=limit, after=after)
+            body = _student_list.dump_json(_student_list.validate_python(students, from_attributes=True))
+        cursor = next_cursor(students, limit, "created_at")
+        return body, {NEXT_CURSOR_HEADER: cursor} if cursor else {}
+    
+    return await response_cache.respond(request, ("students",), settings.RESPONSE_CACHE_TTL_SECONDS, build)
 
 @router.get("/{student_id}", response_model=schemas.StudentResponse)
-def get_student(student_id: int, db: Session = Depends(get_db)):
+async def get_student(student_id: int, db: AsyncSession = Depends(get_async_read_db)):
     """Get a specific student by ID"""
-    db_student = crud.get_student(db, student_id=student_id)
+    db_student = await db.run_sync(crud.get_student, student_id=student_id)
     if db_student is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -38,23 +76,39 @@ def get_student(student_id: int, db: Session = Depends(get_db)):
         )
     return db_student
 
+@router.get("/{student_id}/stats", response_model=schemas.StudentStatsResponse)
+async def get_student_stats(student_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Get a student's attended and total poll counts and attendance percentage"""
+    stats = await db.run_sync(crud.get_student_stats, student_id=student_id)
+    if stats is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Student not found"
+        )
+    return schemas.StudentStatsResponse(
+        student_id=stats.student_id,
+        attended=stats.attended,
+        total_polls=stats.total_polls,
+        percentage=round(stats.percentage, 2) if stats.percentage is not None else None
+    )
+
 @router.put("/{student_id}", response_model=schemas.StudentResponse)
-def update_student(
+async def update_student(
     student_id: int,
     student: schemas.StudentUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update a student's information"""
     # If updating roll_no, check it's not taken
     if student.roll_no:
-        existing = crud.get_student_by_roll_no(db, roll_no=student.roll_no)
+        existing = await db.run_sync(crud.get_student_by_roll_no, roll_no=student.roll_no)
         if existing and existing.id != student_id:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Roll number already taken"
             )
     
-    db_student = crud.update_student(db, student_id=student_id, student=student)
+    db_student = await db.run_sync(crud.update_student, student_id=student_id, student=student)
     if db_student is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -63,9 +117,9 @@ def update_student(
     return db_student
 
 @router.delete("/{student_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_student(student_id: int, db: Session = Depends(get_db)):
+async def delete_student(student_id: int, db: AsyncSession = Depends(get_async_db)):
     """Delete a student"""
-    success = crud.delete_student(db, student_id=student_id)
+    success = await db.run_sync(crud.delete_student, student_id=student_id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Literal
 
 # Student Schemas
 class StudentBase(BaseModel):
@@ -23,9 +23,72 @@ class StudentResponse(StudentBase):
     class Config:
         from_attributes = True
 
+class StudentImportError(BaseModel):
+    row: int
+    roll_no: Optional[str] = None
+    detail: str
+
+class StudentImportResponse(BaseModel):
+    total_rows: int
+    created: int
+    updated: int
+    failed: int
+    errors: List[StudentImportError]
+
+# Attendance Rollup Schemas
+class StudentStatsResponse(BaseModel):
+    student_id: int
+    attended: int
+    total_polls: int
+    percentage: Optional[float] = None
+
+class DepartmentStatsResponse(BaseModel):
+    department: str
+    students: int
+    attended: int
+    total_polls: int
+    percentage: Optional[float] = None
+
+class AtRiskStudentResponse(StudentStatsResponse):
+    name: str
+    roll_no: str
+    department: str
+
+# Course and Section Schemas
+class CourseCreate(BaseModel):
+    code: str = Field(..., min_length=1, max_length=50)
+    title: str = Field(..., min_length=1, max_length=200)
+
+class CourseResponse(CourseCreate):
+    id: int
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+class SectionCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=50)
+
+class SectionResponse(SectionCreate):
+    id: int
+    course_id: int
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+class EnrollmentRequest(BaseModel):
+    student_ids: List[int] = Field(..., min_length=1, max_length=5000)
+
+class EnrollmentResponse(BaseModel):
+    section_id: int
+    enrolled: List[int]
+
 # Attendance Poll Schemas
 class PollCreate(BaseModel):
     duration_minutes: int = Field(..., gt=0, le=60)
+    # Omit for a campus-wide poll
+    section_id: Optional[int] = None
 
 class PollResponse(BaseModel):
     id: int
@@ -34,6 +97,8 @@ class PollResponse(BaseModel):
     duration_minutes: int
     is_active: bool
     created_at: datetime
+    section_id: Optional[int] = None
+    present_count: Optional[int] = None
     
     class Config:
         from_attributes = True
@@ -41,15 +106,35 @@ class PollResponse(BaseModel):
 class PollStatus(BaseModel):
     is_active: bool
     poll_id: Optional[int] = None
+    section_id: Optional[int] = None
     start_time: Optional[datetime] = None
     end_time: Optional[datetime] = None
     remaining_seconds: Optional[int] = None
 
+class PollStatusEvent(PollStatus):
+    present_count: int = 0
+
 # Attendance Record Schemas
 class AttendanceMarkRequest(BaseModel):
     student_id: int
     poll_id: int
 
+class AttendanceBatchMarkRequest(BaseModel):
+    records: List[AttendanceMarkRequest] = Field(..., min_length=1, max_length=5000)
+
+class AttendanceBatchItemResult(BaseModel):
+    student_id: int
+    poll_id: int
+    status: Literal["created", "duplicate", "rejected"]
+    record_id: Optional[int] = None
+    detail: Optional[str] = None
+
+class AttendanceBatchMarkResponse(BaseModel):
+    created: int
+    duplicate: int
+    rejected: int
+    results: List[AttendanceBatchItemResult]
+
 class AttendanceRecordResponse(BaseModel):
     id: int
     student_id: int
@@ -61,6 +146,15 @@ class AttendanceRecordResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class AttendanceMarkAck(BaseModel):
+    """Acknowledgement for a mark queued by the write-behind mode"""
+    student_id: int
+    poll_id: int
+    marked_at: datetime
+    student_name: Optional[str] = None
+    student_roll_no: Optional[str] = None
+    queued: bool = True
+
 class AttendanceLogResponse(BaseModel):
     poll_id: int
     start_time: datetime
@@ -69,4 +163,49 @@ class AttendanceLogResponse(BaseModel):
     present_count: int
     absent_count: int
     attendance_percentage: float
-    records: List[AttendanceRecordResponse]
\ No newline at end of file
+    records: List[AttendanceRecordResponse]
+
+class PollAbsentees(BaseModel):
+    poll_id: int
+    absent_count: int
+    student_ids: List[int]
+
+# Analytics Schemas
+class PollTurnout(BaseModel):
+    poll_id: int
+    start_time: datetime
+    eligible: int
+    present: int
+    turnout_percentage: Optional[float] = None
+    median_seconds_to_mark: Optional[float] = None
+    bin_seconds: int
+    # Marks received by the end of each bin since the poll started
+    cumulative_present: List[int]
+
+class DepartmentTrendPoint(BaseModel):
+    poll_id: int
+    start_time: datetime
+    eligible: int
+    present: int
+    percentage: Optional[float] = None
+
+class DepartmentTrend(BaseModel):
+    department: str
+    students: int
+    points: List[DepartmentTrendPoint]
+
+class AbsenceStreak(BaseModel):
+    student_id: int
+    name: str
+    roll_no: str
+    department: str
+    current_absence_streak: int
+    longest_absence_streak: int
+
+class TimeToMarkDistribution(BaseModel):
+    count: int
+    p50_seconds: Optional[float] = None
+    p90_seconds: Optional[float] = None
+    p99_seconds: Optional[float] = None
+    bin_seconds: int
+    histogram: List[int]
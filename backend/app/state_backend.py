@@ -0,0 +1,376 @@
+"""
+State shared between the workers serving one database
+
+Everything a worker keeps outside the database that other workers must agree
+on goes through a state backend with four primitives:
+
+* ``take``: token buckets for rate limiting (app/rate_limit.py)
+* ``claim``/``lookup``: dedupe sets where the first value stored for a key
+  wins. They hold Idempotency-Key responses (app/idempotency.py) and the
+  marks acknowledged by write-behind (app/write_behind.py).
+* ``versions``/``bump``: opaque generations of named state. They signal
+  that the active poll (app/poll_cache.py) or a table behind cached
+  responses (app/response_cache.py) has changed.
+* ``publish``/``read``: pub/sub channels. Poll start and close events fan
+  out to the status streams of every worker through them.
+
+``MemoryStateBackend`` keeps buckets, claims and messages in the process, so
+they are only correct with a single worker. Its versions are stamp files,
+so caches stay coherent across the workers of one host.
+``SQLiteStateBackend`` keeps everything in one WAL-mode SQLite file. With
+it, any number of ``uvicorn --workers`` processes, or containers sharing
+the file on one host, behave as one: a student has one bucket, a key has
+one response and an event reaches every stream. STATE_BACKEND selects the
+backend.
+
+Writes to the SQLite backend take its write lock, and under contention can
+wait up to the busy timeout for it. Async code therefore makes its calls
+through ``call``, which runs them in a thread for backends marked
+``blocking``. Commit hooks use ``bump_soon`` and ``publish_soon``, which do
+the same when the commit runs on the event loop. Reads use a separate connection and never
+wait: in WAL mode, readers do not block on the writer.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Callable, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from . import local_store
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Messages kept per channel for subscribers that fall behind
+MAX_CHANNEL_BACKLOG = 1000
+
+
+def _refill(tokens: float, updated: float, now: float, rate: float, burst: float) -> float:
+    return min(burst, tokens + (now - updated) * rate)
+
+
+def _take(tokens: float, updated: float, now: float, rate: float, burst: float) -> Tuple[float, float]:
+    """(tokens left, seconds to wait) after trying to take one token"""
+    tokens = _refill(tokens, updated, now, rate, burst)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class MemoryStateBackend:
+    blocking = False
+
+    def __init__(self, stamp_prefix: str, max_keys: int):
+        self.stamp_prefix = stamp_prefix
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._claims: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._channels: Dict[str, Deque[Tuple[int, str]]] = {}
+        self._last_message = 0
+
+    def take(self, key: str, rate: float, burst: float, now: float) -> float:
+        """Take a token; returns 0 if allowed, else seconds until a token is available"""
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens, wait = _take(tokens, updated, now, rate, burst)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def claim(self, key: str, value: bytes, ttl: float) -> Optional[bytes]:
+        """Store `value` under `key` unless a live value is there; returns that
+        earlier value, or None if this call claimed the key"""
+        now = time.time()
+        with self._lock:
+            existing = self._claims.get(key)
+            if existing is not None and existing[1] >= now:
+                self._claims.move_to_end(key)
+                return existing[0]
+            self._claims[key] = (value, now + ttl)
+            self._claims.move_to_end(key)
+            while len(self._claims) > self.max_keys:
+                self._claims.popitem(last=False)
+            return None
+
+    def lookup(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            existing = self._claims.get(key)
+            if existing is None:
+                return None
+            if existing[1] < time.time():
+                del self._claims[key]
+                return None
+            self._claims.move_to_end(key)
+            return existing[0]
+
+    def _stamp_path(self, name: str) -> str:
+        return f"{self.stamp_prefix}-{name}.gen"
+
+    def versions(self, names: Sequence[str]) -> tuple:
+        stamps = []
+        for name in names:
+            try:
+                stat = os.stat(self._stamp_path(name))
+                stamps.append((stat.st_ino, stat.st_mtime_ns))
+            except FileNotFoundError:
+                stamps.append(None)
+        return tuple(stamps)
+
+    def bump(self, names: Iterable[str]) -> None:
+        for name in names:
+            path = self._stamp_path(name)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}"
+            with open(tmp_path, "w") as stamp:
+                stamp.write(f"{time.time_ns()} {os.getpid()}\n")
+            os.replace(tmp_path, path)
+
+    def publish(self, channel: str, payload: str) -> None:
+        with self._lock:
+            self._last_message += 1
+            self._channels.setdefault(channel, deque(maxlen=MAX_CHANNEL_BACKLOG)).append(
+                (self._last_message, payload)
+            )
+
+    def read(self, channel: str, after: Optional[int]) -> Tuple[int, List[str]]:
+        """Messages published on `channel` after message id `after`, and the
+        id to pass next time; `after=None` starts from now"""
+        with self._lock:
+            messages = self._channels.get(channel, ())
+            if after is None:
+                return self._last_message, []
+            return self._last_message, [payload for message_id, payload in messages if message_id > after]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+            self._claims.clear()
+            self._channels.clear()
+
+
+class SQLiteStateBackend:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS buckets (
+            key TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS ix_buckets_updated ON buckets (updated);
+        CREATE TABLE IF NOT EXISTS claims (
+            key TEXT PRIMARY KEY,
+            value BLOB NOT NULL,
+            expires_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS ix_claims_expires_at ON claims (expires_at);
+        CREATE TABLE IF NOT EXISTS versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel TEXT NOT NULL,
+            payload TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS ix_messages_channel_id ON messages (channel, id);
+    """
+    # Trim buckets and claims back to max_keys, and channels to their
+    # backlog, every this many writes
+    TRIM_EVERY = 1000
+    blocking = True
+
+    def __init__(self, path: str, max_keys: int):
+        self.path = path
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._conn = local_store.connect(path, self.SCHEMA)
+        self._read_lock = threading.Lock()
+        self._reader = local_store.connect(path, self.SCHEMA)
+        self._writes = 0
+
+    def _write(self, statements) -> object:
+        """Run `statements(conn)` in an IMMEDIATE transaction, which takes the
+        write lock up front so no two workers read the same state to update"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(self._conn)
+                self._writes += 1
+                if self._writes % self.TRIM_EVERY == 0:
+                    self._trim()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return result
+
+    def _trim(self) -> None:
+        self._conn.execute(
+            "DELETE FROM buckets WHERE key IN (SELECT key FROM buckets ORDER BY updated DESC LIMIT -1 OFFSET ?)",
+            (self.max_keys,)
+        )
+        self._conn.execute("DELETE FROM claims WHERE expires_at < ?", (time.time(),))
+        self._conn.execute(
+            "DELETE FROM claims WHERE key IN (SELECT key FROM claims ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_keys,)
+        )
+        self._conn.execute(
+            "DELETE FROM messages WHERE id <= (SELECT MAX(id) FROM messages) - ?",
+            (MAX_CHANNEL_BACKLOG,)
+        )
+
+    def take(self, key: str, rate: float, burst: float, now: float) -> float:
+        """Take a token; returns 0 if allowed, else seconds until a token is available"""
+        def statements(conn):
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, wait = _take(*(row or (burst, now)), now, rate, burst)
+            conn.execute(
+                "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now)
+            )
+            return wait
+        return self._write(statements)
+
+    def claim(self, key: str, value: bytes, ttl: float) -> Optional[bytes]:
+        """Store `value` under `key` unless a live value is there; returns that
+        earlier value, or None if this call claimed the key"""
+        now = time.time()
+
+        def statements(conn):
+            row = conn.execute(
+                "SELECT value FROM claims WHERE key = ? AND expires_at >= ?", (key, now)
+            ).fetchone()
+            if row is not None:
+                return row[0]
+            conn.execute(
+                "INSERT OR REPLACE INTO claims (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + ttl)
+            )
+            return None
+        return self._write(statements)
+
+    def lookup(self, key: str) -> Optional[bytes]:
+        with self._read_lock:
+            row = self._reader.execute(
+                "SELECT value FROM claims WHERE key = ? AND expires_at >= ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def versions(self, names: Sequence[str]) -> tuple:
+        if not names:
+            return ()
+        with self._read_lock:
+            found = dict(self._reader.execute(
+                f"SELECT name, version FROM versions WHERE name IN ({','.join('?' * len(names))})",
+                tuple(names)
+            ).fetchall())
+        return tuple(found.get(name) for name in names)
+
+    def bump(self, names: Iterable[str]) -> None:
+        names = list(names)
+
+        def statements(conn):
+            conn.executemany(
+                "INSERT INTO versions (name, version) VALUES (?, 1) "
+                "ON CONFLICT (name) DO UPDATE SET version = version + 1",
+                [(name,) for name in names]
+            )
+        self._write(statements)
+
+    def publish(self, channel: str, payload: str) -> None:
+        self._write(lambda conn: conn.execute(
+            "INSERT INTO messages (channel, payload) VALUES (?, ?)", (channel, payload)
+        ))
+
+    def read(self, channel: str, after: Optional[int]) -> Tuple[int, List[str]]:
+        """Messages published on `channel` after message id `after`, and the
+        id to pass next time; `after=None` starts from now"""
+        with self._read_lock:
+            if after is None:
+                row = self._reader.execute("SELECT COALESCE(MAX(id), 0) FROM messages").fetchone()
+                return row[0], []
+            rows = self._reader.execute(
+                "SELECT id, payload FROM messages WHERE channel = ? AND id > ? ORDER BY id",
+                (channel, after)
+            ).fetchall()
+        return (rows[-1][0] if rows else after), [payload for _, payload in rows]
+
+    def clear(self) -> None:
+        # Versions are kept: restarting them could repeat one a cache still holds
+        with self._lock:
+            self._conn.executescript("DELETE FROM buckets; DELETE FROM claims; DELETE FROM messages;")
+
+
+async def call(backend, fn: Callable, *args):
+    """Call `fn`, which uses `backend`, without blocking the event loop on a
+    backend that may wait for a lock"""
+    if backend.blocking:
+        return await run_in_threadpool(fn, *args)
+    return fn(*args)
+
+
+def _log_failed_write(future: asyncio.Future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("State backend write failed", exc_info=future.exception())
+
+
+def _soon(backend, fn: Callable, *args) -> None:
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    if loop is None or not backend.blocking:
+        fn(*args)
+        return
+    loop.run_in_executor(None, fn, *args).add_done_callback(_log_failed_write)
+
+
+def bump_soon(backend, names: Iterable[str]) -> None:
+    """Bump `names` from a commit hook. When the commit runs on the event loop,
+    a blocking backend is bumped from a thread instead, so other workers see
+    the bump a moment later; callers drop their own local state first."""
+    _soon(backend, backend.bump, list(names))
+
+
+def publish_soon(backend, channel: str, payload: str) -> None:
+    """Publish from a commit hook, from a thread like ``bump_soon`` when needed"""
+    _soon(backend, backend.publish, channel, payload)
+
+
+async def subscribe(backend, channel: str, interval: float, after: Optional[int] = None) -> AsyncIterator[str]:
+    """Yield messages published on `channel` after message id `after` (default:
+    from now on), checking every `interval` seconds"""
+    if after is None:
+        after, _ = await call(backend, backend.read, channel, None)
+    while True:
+        await asyncio.sleep(interval)
+        after, payloads = await call(backend, backend.read, channel, after)
+        for payload in payloads:
+            yield payload
+
+
+def _default_prefix() -> str:
+    """Stamp files and the SQLite file are per database, so unrelated deployments never collide"""
+    digest = hashlib.sha1(settings.DATABASE_URL.encode()).hexdigest()[:12]
+    return os.path.join(settings.STATE_DIR or tempfile.gettempdir(), f"classcheck-state-{digest}")
+
+
+def create_backend():
+    if settings.STATE_BACKEND == "sqlite":
+        return SQLiteStateBackend(
+            settings.STATE_BACKEND_PATH or f"{_default_prefix()}.db",
+            max_keys=settings.STATE_MAX_KEYS
+        )
+    if settings.STATE_BACKEND == "memory":
+        return MemoryStateBackend(_default_prefix(), max_keys=settings.STATE_MAX_KEYS)
+    raise ValueError("STATE_BACKEND must be one of ('memory', 'sqlite')")
+
+
+state = create_backend()
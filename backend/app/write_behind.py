@@ -0,0 +1,259 @@
+"""
+Write-behind queue for attendance marks
+
+With ``WRITE_BEHIND_ENABLED`` the mark endpoint validates a request, hands
+the record to this queue and acknowledges immediately with the assigned
+``marked_at``. A background task writes queued records in group commits,
+every ``WRITE_BEHIND_FLUSH_INTERVAL_MS`` or as soon as
+``WRITE_BEHIND_MAX_BATCH`` records are waiting, so the poll-opening spike
+costs one fsync per batch instead of one per student.
+
+``WRITE_BEHIND_DURABILITY`` controls what an acknowledgement guarantees:
+
+* ``memory``: nothing until the next flush; a crash loses queued marks
+* ``journal``: the mark is appended to a per-worker journal file first and
+  survives a process crash (not a power loss)
+* ``fsync``: the journal is fsynced before acknowledging. Marks that arrive
+  while an fsync is running share the next one, so the disk sees one fsync
+  at a time however many students mark at once.
+
+After each successful flush the journal is replaced by a new one holding
+only the records still queued, and the old one is deleted. A failed flush
+leaves the journal as it is, so a database outage costs no extra files. On
+startup, journals left behind by dead workers (those whose
+file lock is free) are replayed; the unique (student_id, poll_id) index
+makes a replay of already-written records a no-op.
+"""
+import asyncio
+import fcntl
+import glob
+import json
+import logging
+import os
+import socket
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import crud
+from .config import settings
+from .database import SessionLocal
+from .state_backend import call, state
+
+logger = logging.getLogger(__name__)
+
+DURABILITY_LEVELS = ("memory", "journal", "fsync")
+
+# How long a (student_id, poll_id) pair is remembered for duplicate acks;
+# longer than any poll, and the backend's STATE_MAX_KEYS bounds the total
+MARK_CLAIM_TTL_SECONDS = 86400.0
+
+
+def _encode(record: dict) -> str:
+    return json.dumps({**record, "marked_at": record["marked_at"].isoformat()}) + "\n"
+
+
+def _decode(line: str) -> dict:
+    record = json.loads(line)
+    record["marked_at"] = datetime.fromisoformat(record["marked_at"])
+    return record
+
+
+def write_records(session_factory: Callable[[], Session], records: List[dict]) -> None:
+    db = session_factory()
+    try:
+        crud.insert_attendance_records(db, records)
+    finally:
+        db.close()
+
+
+def recover_journals(journal_dir: str, session_factory: Callable[[], Session]) -> int:
+    """Replay journals abandoned by crashed workers; returns the records replayed"""
+    replayed = 0
+    for path in sorted(glob.glob(os.path.join(journal_dir, "*.journal*"))):
+        with open(path, "r+") as journal:
+            try:
+                fcntl.flock(journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue  # Owned by a live worker
+            records = [_decode(line) for line in journal if line.strip()]
+            if records:
+                write_records(session_factory, records)
+                replayed += len(records)
+            os.unlink(path)
+    return replayed
+
+
+class MarkQueue:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        flush_interval_ms: int,
+        max_batch: int,
+        durability: str,
+        journal_dir: str,
+        backend
+    ):
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f"WRITE_BEHIND_DURABILITY must be one of {DURABILITY_LEVELS}")
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch = max_batch
+        self.durability = durability
+        self.journal_dir = journal_dir
+        self.backend = backend
+        self._pending: List[dict] = []
+        # Journaled records whose claim is still being checked
+        self._claiming: List[dict] = []
+        self._journal = None
+        self._segment = 0
+        # Lines written to any journal so far, and how many of them are known
+        # to be on disk: fsynced, or committed to the database
+        self._written = 0
+        self._synced = 0
+        self._syncing: Optional[asyncio.Future] = None
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def _journal_path(self, segment: int) -> str:
+        # Containers sharing a journal directory reuse pids, but not hostnames
+        return os.path.join(self.journal_dir, f"{socket.gethostname()}-{os.getpid()}.journal.{segment}")
+
+    def _open_journal(self) -> None:
+        if self.durability == "memory":
+            return
+        os.makedirs(self.journal_dir, exist_ok=True)
+        self._segment += 1
+        self._journal = open(self._journal_path(self._segment), "a")
+        fcntl.flock(self._journal, fcntl.LOCK_EX)
+
+    async def _fsync(self) -> None:
+        written = self._written
+        try:
+            await run_in_threadpool(os.fsync, self._journal.fileno())
+            self._synced = max(self._synced, written)
+        finally:
+            self._syncing = None
+
+    async def _sync_journal(self) -> None:
+        """Wait until every line written so far is on disk"""
+        target = self._written
+        while self._synced < target:
+            if self._syncing is None:
+                self._syncing = asyncio.ensure_future(self._fsync())
+            await asyncio.shield(self._syncing)
+
+    async def _rotate_journal(self) -> None:
+        """Replace the journal with one holding only the records still queued;
+        everything else in the old one has been committed"""
+        if self._journal is None:
+            return
+        if self._syncing is not None:
+            # The old journal must not be closed under a running fsync
+            await asyncio.gather(asyncio.shield(self._syncing), return_exceptions=True)
+        closed, written = self._journal, self._written
+        self._open_journal()
+        self._journal.write("".join(_encode(record) for record in (*self._pending, *self._claiming)))
+        self._journal.flush()
+        if self.durability == "fsync":
+            await run_in_threadpool(os.fsync, self._journal.fileno())
+        self._synced = max(self._synced, written)
+        # Unlinked before its lock is released, so recovery never replays it
+        os.unlink(closed.name)
+        closed.close()
+
+    async def enqueue(self, student_id: int, poll_id: int) -> Tuple[datetime, bool]:
+        """Queue a mark; returns (marked_at, created), reusing marked_at for repeats"""
+        record = {"student_id": student_id, "poll_id": poll_id, "marked_at": datetime.utcnow()}
+        # Journaled before it is claimed: a claim left behind by a failed write
+        # would acknowledge every retry as a duplicate of a mark never queued.
+        # A repeat's line is dropped at the next rotation, or replays as a no-op
+        self._claiming.append(record)
+        try:
+            if self._journal is not None:
+                self._journal.write(_encode(record))
+                self._journal.flush()
+                self._written += 1
+                if self.durability == "fsync":
+                    await self._sync_journal()
+
+            # Claimed in the state backend, so a retry that lands on another
+            # worker is acknowledged with the same marked_at and not queued twice
+            marked_at = await call(
+                self.backend, self.backend.claim,
+                f"mark:{student_id}:{poll_id}", record["marked_at"].isoformat().encode(), MARK_CLAIM_TTL_SECONDS
+            )
+        finally:
+            self._claiming.remove(record)
+        if marked_at is not None:
+            return datetime.fromisoformat(marked_at.decode()), False
+
+        self._pending.append(record)
+        if len(self._pending) >= self.max_batch:
+            self._wake.set()
+        return record["marked_at"], True
+
+    async def flush(self) -> int:
+        """Group-commit everything queued so far; returns the number of records written"""
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending, []
+        try:
+            await run_in_threadpool(write_records, self.session_factory, batch)
+        except BaseException:
+            # Retry with the next flush (or stop()); the journal still holds
+            # the records for recovery
+            self._pending[:0] = batch
+            raise
+        await self._rotate_journal()
+        return len(batch)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Write-behind flush failed; records kept for retry")
+
+    async def start(self) -> None:
+        recover_journals(self.journal_dir, self.session_factory)
+        self._wake = asyncio.Event()
+        self._open_journal()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flusher and write out anything still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._pending:
+            await self.flush()
+        if self._journal is not None:
+            self._journal.close()
+            os.unlink(self._journal.name)
+            self._journal = None
+
+
+mark_queue = MarkQueue(
+    session_factory=SessionLocal,
+    flush_interval_ms=settings.WRITE_BEHIND_FLUSH_INTERVAL_MS,
+    max_batch=settings.WRITE_BEHIND_MAX_BATCH,
+    durability=settings.WRITE_BEHIND_DURABILITY,
+    journal_dir=settings.WRITE_BEHIND_JOURNAL_DIR,
+    backend=state
+)
@@ -0,0 +1,9 @@
+"""ClassCheck performance benchmarks
+
+Run individual benchmarks from the backend directory, e.g.
+``python -m benchmarks.bench_mark_batch``.
+
+``python -m benchmarks.loadtest --output run.json`` load-tests the hot
+endpoints, and ``python -m benchmarks.compare old.json new.json`` flags
+regressions between two runs.
+"""
@@ -0,0 +1,97 @@
+"""
+Benchmark: columnar analytics snapshot vs. per-poll ORM reports
+
+Seeds a term of S students x P polls with a random attendance pattern, then
+times a cold snapshot build, a no-change report, an incremental refresh after
+one more poll is marked, and, for comparison, per-poll turnout computed the
+way the JSON endpoints would through ``crud.get_attendance_by_poll``.
+
+Usage: python -m benchmarks.bench_analytics [--students S] [--polls P]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--polls", type=int, default=200)
+    parser.add_argument("--attendance", type=float, default=0.75)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="classcheck-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    # Import after DATABASE_URL is set so the app binds to the scratch database
+    from sqlalchemy import insert
+    from app import crud, models
+    from app.analytics import attendance_analytics
+    from app.database import SessionLocal, engine
+    import app.main  # noqa: F401  (creates the schema)
+
+    rng = random.Random(1)
+    term_start = datetime(2024, 1, 1, 9)
+    departments = ["CS", "EE", "ME", "CE"]
+
+    def marks(poll_id, start):
+        return [
+            {"student_id": sid, "poll_id": poll_id, "marked_at": start + timedelta(seconds=rng.expovariate(1 / 90))}
+            for sid in range(1, args.students + 1)
+            if rng.random() < args.attendance
+        ]
+
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(insert(models.Student), [
+            {"id": i, "name": f"Student {i}", "roll_no": f"A{i:06d}", "department": departments[i % 4],
+             "created_at": term_start - timedelta(days=1)}
+            for i in range(1, args.students + 1)
+        ])
+        conn.execute(insert(models.AttendancePoll), [
+            {"id": p, "start_time": term_start + timedelta(days=p), "end_time": term_start + timedelta(days=p, minutes=10),
+             "duration_minutes": 10, "is_active": False, "created_at": term_start + timedelta(days=p)}
+            for p in range(1, args.polls + 1)
+        ])
+        total = 0
+        for p in range(1, args.polls + 1):
+            rows = marks(p, term_start + timedelta(days=p))
+            conn.execute(insert(models.AttendanceRecord), rows)
+            total += len(rows)
+    print(f"seeded {args.students} students x {args.polls} polls, {total} records in {time.perf_counter() - start:.1f}s")
+
+    db = SessionLocal()
+
+    def timed(label, fn):
+        start = time.perf_counter()
+        fn()
+        print(f"{label:<40} {(time.perf_counter() - start) * 1000:>9.1f} ms")
+
+    timed("cold snapshot (load + compute)", lambda: attendance_analytics.report(db))
+    timed("report, nothing changed", lambda: attendance_analytics.report(db))
+
+    new_poll = args.polls + 1
+    with engine.begin() as conn:
+        conn.execute(insert(models.AttendancePoll), [{
+            "id": new_poll, "start_time": term_start + timedelta(days=new_poll),
+            "end_time": term_start + timedelta(days=new_poll, minutes=10), "duration_minutes": 10,
+            "is_active": False, "created_at": term_start + timedelta(days=new_poll)
+        }])
+        conn.execute(insert(models.AttendanceRecord), marks(new_poll, term_start + timedelta(days=new_poll)))
+    timed("incremental refresh (+1 poll of marks)", lambda: attendance_analytics.report(db))
+
+    def orm_turnout():
+        total_students = crud.count_students(db)
+        for poll_id in range(1, new_poll + 1):
+            len(crud.get_attendance_by_poll(db, poll_id)) / total_students
+            db.expunge_all()
+
+    timed("ORM per-poll turnout only", orm_turnout)
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Benchmark: async request handlers vs. the previous sync handlers
+
+Drives 1k concurrent clients in-process (httpx over ASGI) against the real
+async routes and against sync ``def`` equivalents that use ``get_db``, the way
+the routers were written before the async port. Sync handlers run in
+Starlette's threadpool (40 threads by default); async handlers do not.
+Failures in the sync rows are connection-pool checkout timeouts.
+
+Usage: python -m benchmarks.bench_async_vs_sync [--clients 1000] [--rounds 3]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def build_sync_app():
+    """A FastAPI app exposing the pre-port sync versions of the hot routes"""
+    from fastapi import Depends, FastAPI, HTTPException
+    from sqlalchemy.orm import Session
+    from app import crud, schemas
+    from app.database import get_db
+
+    app = FastAPI()
+
+    @app.get("/students/{student_id}", response_model=schemas.StudentResponse)
+    def get_student(student_id: int, db: Session = Depends(get_db)):
+        student = crud.get_student(db, student_id=student_id)
+        if student is None:
+            raise HTTPException(status_code=404, detail="Student not found")
+        return student
+
+    @app.post("/attendance/mark", response_model=schemas.AttendanceRecordResponse)
+    def mark_attendance(attendance: schemas.AttendanceMarkRequest, db: Session = Depends(get_db)):
+        student = crud.get_student(db, student_id=attendance.student_id)
+        poll = crud.get_cached_poll(db, poll_id=attendance.poll_id)
+        if not student or not poll:
+            raise HTTPException(status_code=404, detail="Not found")
+        record = crud.mark_attendance(db, attendance.student_id, attendance.poll_id)
+        return schemas.AttendanceRecordResponse(
+            id=record.id,
+            student_id=record.student_id,
+            poll_id=record.poll_id,
+            marked_at=record.marked_at,
+            student_name=student.name,
+            student_roll_no=student.roll_no
+        )
+
+    return app
+
+
+async def drive(app, requests):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Open the first connection alone: after dispose() the recreated pool
+        # runs its first-connect hooks under a thread lock that concurrent
+        # greenlets on the same loop would otherwise deadlock on
+        await client.get("/health")
+        await client.get("/students/0")
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(
+            client.request(method, url, json=body) for method, url, body in requests
+        ))
+        elapsed = time.perf_counter() - start
+    failures = sum(1 for response in responses if response.status_code >= 400)
+    return elapsed, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="classcheck-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    # Every simulated client shares one address
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+    from app import models
+    from app.database import async_database_url, get_async_db, get_db
+    from app.main import app as async_app
+
+    # Give both paths more connections than the 40 threadpool workers. Once
+    # in-flight requests exceed the pool, sync handlers still stall: threads
+    # waiting for a connection starve the threadpool that has to close the
+    # sessions holding them. A short pool timeout turns each stall into a
+    # counted failure instead of a 30 s hang.
+    url = os.environ["DATABASE_URL"]
+    sync_engine = create_engine(
+        url, connect_args={"check_same_thread": False}, pool_size=50, max_overflow=0, pool_timeout=5
+    )
+    async_engine = create_async_engine(
+        async_database_url(url), poolclass=AsyncAdaptedQueuePool, pool_size=50, max_overflow=0
+    )
+    SessionLocal = sessionmaker(autoflush=False, bind=sync_engine)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    def bench_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def bench_get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    sync_app = build_sync_app()
+    sync_app.dependency_overrides[get_db] = bench_get_db
+    async_app.dependency_overrides[get_async_db] = bench_get_async_db
+
+    db = SessionLocal()
+    db.add_all(
+        models.Student(name=f"Student {i}", roll_no=f"B{i:06d}", department="Bench")
+        for i in range(args.clients)
+    )
+    db.commit()
+    student_ids = [row[0] for row in db.query(models.Student.id).all()]
+
+    def new_poll():
+        now = datetime.utcnow()
+        poll = models.AttendancePoll(
+            start_time=now, end_time=now + timedelta(minutes=60), duration_minutes=60, is_active=True
+        )
+        db.add(poll)
+        db.commit()
+        return poll.id
+
+    print(f"{'scenario':<28}{'path':<8}{'req/s':>10}{'failures':>10}")
+    for label, make_requests in [
+        ("GET /students/{id}", lambda: [("GET", f"/students/{sid}", None) for sid in student_ids]),
+        ("POST /attendance/mark", None),
+    ]:
+        for path, app in [("sync", sync_app), ("async", async_app)]:
+            best = 0.0
+            total_failures = 0
+            for _ in range(args.rounds):
+                if make_requests is None:
+                    poll_id = new_poll()
+                    requests = [
+                        ("POST", "/attendance/mark", {"student_id": sid, "poll_id": poll_id})
+                        for sid in student_ids
+                    ]
+                else:
+                    requests = make_requests()
+                elapsed, failures = asyncio.run(drive(app, requests))
+                if app is async_app:
+                    # Pooled aiosqlite connections belong to the finished loop
+                    asyncio.run(async_engine.dispose())
+                best = max(best, len(requests) / elapsed)
+                total_failures += failures
+            print(f"{label:<28}{path:<8}{best:>10.0f}{total_failures:>10}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
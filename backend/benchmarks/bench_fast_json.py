@@ -0,0 +1,98 @@
+"""
+Benchmark: Pydantic vs. orjson fast-path encoding of large list responses
+
+For each size N (1k, 10k and 100k rows by default), seeds N students and one
+poll that all N marked. It then fetches ``/students/?limit=N`` and
+``/attendance/logs/{poll_id}`` with FAST_JSON_ENABLED off and on. It reports
+the median latency and the peak Python heap allocated during one request,
+measured by tracemalloc. The response cache is disabled so every request
+rebuilds its body.
+
+Usage: python -m benchmarks.bench_fast_json [--sizes 1000,10000,100000] [--repeat R]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+CHUNK = 50_000
+
+
+def _seed(engine, models, rows):
+    from sqlalchemy import delete, insert
+
+    base = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        for model in (models.AttendanceRecord, models.AttendancePoll, models.Student):
+            conn.execute(delete(model))
+        poll_id = conn.execute(insert(models.AttendancePoll).values(
+            start_time=base,
+            end_time=base + timedelta(days=1),
+            duration_minutes=1440,
+            is_active=False
+        )).inserted_primary_key[0]
+        for offset in range(0, rows, CHUNK):
+            ids = range(offset, min(offset + CHUNK, rows))
+            conn.execute(insert(models.Student), [
+                {"id": i + 1, "name": f"Student {i}", "roll_no": f"J{i:07d}", "department": "Bench",
+                 "created_at": base + timedelta(seconds=i)}
+                for i in ids
+            ])
+            conn.execute(insert(models.AttendanceRecord), [
+                {"student_id": i + 1, "poll_id": poll_id, "marked_at": base + timedelta(seconds=i)}
+                for i in ids
+            ])
+    return poll_id
+
+
+def _measure(client, url, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url)
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+
+    tracemalloc.start()
+    client.get(url)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(samples) * 1000, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="classcheck-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+
+    # Import after DATABASE_URL is set so the app binds to the scratch database
+    from fastapi.testclient import TestClient
+    from app import models
+    from app.config import settings
+    from app.database import engine
+    from app.main import app
+
+    print(f"{'rows':>7} {'endpoint':<10} {'pydantic ms':>12} {'orjson ms':>10} {'pydantic MiB':>13} {'orjson MiB':>11}")
+    with TestClient(app) as client:
+        for rows in (int(size) for size in args.sizes.split(",")):
+            poll_id = _seed(engine, models, rows)
+            for name, url in (("students", f"/students/?limit={rows}"), ("poll log", f"/attendance/logs/{poll_id}")):
+                results = {}
+                for fast in (False, True):
+                    settings.FAST_JSON_ENABLED = fast
+                    client.get(url)
+                    results[fast] = _measure(client, url, args.repeat)
+                (slow_ms, slow_mib), (fast_ms, fast_mib) = results[False], results[True]
+                print(f"{rows:>7} {name:<10} {slow_ms:>12.1f} {fast_ms:>10.1f} {slow_mib:>13.1f} {fast_mib:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark: OFFSET vs. keyset (cursor) pagination of GET /students/
+
+Seeds a file-backed SQLite database with N students and reports the median
+latency of fetching page 1, 10, 100, 1000 and 10000 by ``skip``/``limit`` and by
+the ``cursor`` returned in ``X-Next-Cursor``. OFFSET latency grows with the
+page number; keyset latency should stay flat.
+
+Usage: python -m benchmarks.bench_keyset_pagination [--students N] [--limit M]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+PAGES = (1, 10, 100, 1000, 10000)
+CHUNK = 50_000
+
+
+def _median_ms(client, url, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url)
+        samples.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--students", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="classcheck-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    # Measure the queries, not repeated hits on the response cache
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+
+    # Import after DATABASE_URL is set so the app binds to the scratch database
+    from fastapi.testclient import TestClient
+    from sqlalchemy import insert, select
+    from app import models
+    from app.database import engine
+    from app.main import app
+    from app.pagination import encode_cursor
+
+    start = time.perf_counter()
+    base = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        for offset in range(0, args.students, CHUNK):
+            conn.execute(insert(models.Student), [
+                {
+                    "name": f"Student {i}",
+                    "roll_no": f"K{i:07d}",
+                    "department": "Bench",
+                    "created_at": base + timedelta(seconds=i)
+                }
+                for i in range(offset, min(offset + CHUNK, args.students))
+            ])
+    print(f"seeded {args.students} students in {time.perf_counter() - start:.1f}s")
+
+    # Cursor a client would hold after walking to page N
+    cursors = {}
+    with engine.connect() as conn:
+        for page in PAGES:
+            if page == 1:
+                continue
+            row = conn.execute(
+                select(models.Student.created_at, models.Student.id)
+                .order_by(models.Student.created_at, models.Student.id)
+                .offset((page - 1) * args.limit - 1)
+                .limit(1)
+            ).one_or_none()
+            if row is not None:
+                cursors[page] = encode_cursor(row.created_at, row.id)
+
+    print(f"{'page':>6} {'offset ms':>10} {'cursor ms':>10}")
+    with TestClient(app) as client:
+        client.get("/students/?limit=1")
+        for page in PAGES:
+            if page != 1 and page not in cursors:
+                continue
+            skip = (page - 1) * args.limit
+            offset_ms = _median_ms(client, f"/students/?skip={skip}&limit={args.limit}", args.repeat)
+            cursor_url = f"/students/?limit={args.limit}"
+            if page != 1:
+                cursor_url += f"&cursor={cursors[page]}"
+            cursor_ms = _median_ms(client, cursor_url, args.repeat)
+            print(f"{page:>6} {offset_ms:>10.2f} {cursor_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark: bulk attendance marking vs. the single-mark endpoint
+
+Seeds a file-backed SQLite database with N students and compares rows/second
+for ``POST /attendance/mark`` (one request per student) against
+``POST /attendance/mark/batch`` (one request per chunk of students).
+
+Usage: python -m benchmarks.bench_mark_batch [--students N] [--chunk M]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--chunk", type=int, default=5000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="classcheck-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    # Every mark comes from one TestClient address
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+    # Import after DATABASE_URL is set so the app binds to the scratch database
+    from fastapi.testclient import TestClient
+    from app import models
+    from app.database import SessionLocal
+    from app.main import app
+
+    db = SessionLocal()
+    db.add_all(
+        models.Student(name=f"Student {i}", roll_no=f"B{i:06d}", department="Bench")
+        for i in range(args.students)
+    )
+    now = datetime.utcnow()
+    polls = [
+        models.AttendancePoll(
+            start_time=now,
+            end_time=now + timedelta(minutes=60),
+            duration_minutes=60,
+            is_active=True
+        )
+        for _ in range(2)
+    ]
+    db.add_all(polls)
+    db.commit()
+    student_ids = [row[0] for row in db.query(models.Student.id).all()]
+    single_poll, batch_poll = polls[0].id, polls[1].id
+    db.close()
+
+    # One client context keeps every request on the same event loop
+    with TestClient(app) as client:
+
+        start = time.perf_counter()
+        for student_id in student_ids:
+            response = client.post("/attendance/mark", json={"student_id": student_id, "poll_id": single_poll})
+            assert response.status_code == 200, response.text
+        single_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for offset in range(0, len(student_ids), args.chunk):
+            chunk = student_ids[offset:offset + args.chunk]
+            response = client.post("/attendance/mark/batch", json={"records": [
+                {"student_id": student_id, "poll_id": batch_poll} for student_id in chunk
+            ]})
+            assert response.status_code == 200, response.text
+        batch_elapsed = time.perf_counter() - start
+
+    rows = len(student_ids)
+    print(f"students: {rows}")
+    print(f"single-mark: {single_elapsed:8.3f}s  {rows / single_elapsed:10.0f} rows/s")
+    print(f"batch-mark:  {batch_elapsed:8.3f}s  {rows / batch_elapsed:10.0f} rows/s")
+    print(f"speedup:     {single_elapsed / batch_elapsed:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
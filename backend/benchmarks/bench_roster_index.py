@@ -0,0 +1,82 @@
+"""
+Benchmark: roster index warm-up, size and lookups
+
+For each size N (1k, 10k, 100k and 1M students by default), seeds N students
+and times the startup warm-up: one ``SELECT id, name, roll_no`` and building
+the arrays. It reports the bytes the index holds per student against
+``BYTES_PER_STUDENT_BUDGET``, and the median time to validate a student for
+a mark through the index and through the ``students`` query it replaces.
+
+Usage: python -m benchmarks.bench_roster_index [--sizes 1000,10000,100000,1000000] [--lookups L]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+CHUNK = 50_000
+
+
+def _seed(engine, models, rows):
+    from sqlalchemy import delete, insert
+
+    with engine.begin() as conn:
+        conn.execute(delete(models.Student))
+        for offset in range(0, rows, CHUNK):
+            conn.execute(insert(models.Student), [
+                {"id": i + 1, "name": f"Student {i}", "roll_no": f"J{i:07d}", "department": "Bench"}
+                for i in range(offset, min(offset + CHUNK, rows))
+            ])
+
+
+def _median_us(lookup, ids):
+    samples = []
+    for student_id in ids:
+        start = time.perf_counter()
+        assert lookup(student_id) is not None
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000")
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="classcheck-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["STATE_DIR"] = workdir
+
+    # Import after DATABASE_URL is set so the app binds to the scratch database
+    from app import crud, models
+    from app.database import Base, SessionLocal, engine
+    from app.roster_index import BYTES_PER_STUDENT_BUDGET, roster_index
+
+    Base.metadata.create_all(bind=engine)
+    print(f"{'students':>9} {'warm-up ms':>11} {'B/student':>10} {'budget':>7} {'index us':>9} {'query us':>9}")
+    for rows in (int(size) for size in args.sizes.split(",")):
+        _seed(engine, models, rows)
+        ids = [random.randint(1, rows) for _ in range(args.lookups)]
+        db = SessionLocal()
+        try:
+            roster_index.clear()
+            start = time.perf_counter()
+            roster_index.refresh(lambda: crud.get_roster_rows(db))
+            warm_ms = (time.perf_counter() - start) * 1000
+            per_student = roster_index.nbytes / rows
+
+            index_us = _median_us(lambda student_id: crud.get_roster_entry(db, student_id), ids)
+            query_us = _median_us(lambda student_id: crud.get_student(db, student_id), ids)
+        finally:
+            db.close()
+        print(
+            f"{rows:>9} {warm_ms:>11.1f} {per_student:>10.1f} {BYTES_PER_STUDENT_BUDGET:>7} "
+            f"{index_us:>9.1f} {query_us:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
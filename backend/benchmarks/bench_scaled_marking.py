@@ -0,0 +1,122 @@
+"""
+Benchmark: marking throughput as uvicorn workers are added
+
+Runs the API with ``STATE_BACKEND=sqlite`` under ``uvicorn --workers N`` for
+each N in ``--workers`` (1, 2 and 4 by default). The database is a fresh
+SQLite file each time. Every mark goes through the shared state: the
+student and client rate-limit buckets, an Idempotency-Key claim and, with
+``--write-behind``, the write-behind dedupe claim. The client bucket is
+widened so the load, which all comes from one address, is not refused. For
+each N it reports marks/second, the speed-up over the first N and the
+failures.
+
+Marks go to one poll, so without ``--write-behind`` every mark also waits
+for the database's single writer. That ceiling does not depend on the state
+backend.
+
+Usage: python -m benchmarks.bench_scaled_marking [--workers 1,2,4] [--marks 4000]
+       [--concurrency 64] [--write-behind]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+
+from benchmarks.bench_sqlite_contention import wait_for
+
+
+async def fire_marks(base_url, student_ids, poll_id, concurrency):
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def mark(student_id):
+            async with semaphore:
+                try:
+                    response = await client.post(
+                        "/attendance/mark",
+                        json={"student_id": student_id, "poll_id": poll_id},
+                        headers={"Idempotency-Key": f"bench-{poll_id}-{student_id}"}
+                    )
+                    return response.status_code
+                except httpx.HTTPError:
+                    return 0
+
+        start = time.perf_counter()
+        statuses = await asyncio.gather(*(mark(student_id) for student_id in student_ids))
+        elapsed = time.perf_counter() - start
+    return elapsed, sum(1 for code in statuses if code not in (200, 202))
+
+
+def run_workers(workers, args):
+    workdir = tempfile.mkdtemp(prefix="classcheck-scaled-")
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        STATE_BACKEND="sqlite",
+        STATE_DIR=workdir,
+        WRITE_BEHIND_ENABLED="true" if args.write_behind else "false",
+        WRITE_BEHIND_JOURNAL_DIR=os.path.join(workdir, "journal"),
+        RATE_LIMIT_CLIENT_RATE="1000000",
+        RATE_LIMIT_CLIENT_BURST="1000000",
+    )
+    # Create the schema once, before several workers race to do it
+    subprocess.run([sys.executable, "-c", "import app.main"], env=env, check=True)
+    db = sqlite3.connect(os.path.join(workdir, "bench.db"))
+    db.executemany(
+        "INSERT INTO students (name, roll_no, department, created_at) VALUES (?, ?, 'Bench', ?)",
+        [(f"Student {i}", f"S{i:06d}", datetime.utcnow().isoformat(" ", "microseconds")) for i in range(args.marks)]
+    )
+    db.commit()
+    student_ids = [row[0] for row in db.execute("SELECT id FROM students")]
+    db.close()
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=env
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        wait_for(f"{base_url}/health")
+        request = urllib.request.Request(
+            f"{base_url}/attendance/start", data=b'{"duration_minutes": 60}',
+            headers={"Content-Type": "application/json"}, method="POST"
+        )
+        poll_id = json.load(urllib.request.urlopen(request))["id"]
+        return asyncio.run(fire_marks(base_url, student_ids, poll_id, args.concurrency))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--marks", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--write-behind", action="store_true")
+    parser.add_argument("--port", type=int, default=8767)
+    args = parser.parse_args()
+
+    print(f"{args.marks} marks, {args.concurrency} concurrent clients, "
+          f"write-behind {'on' if args.write_behind else 'off'}, STATE_BACKEND=sqlite")
+    print(f"{'workers':>7}{'marks/s':>10}{'speed-up':>10}{'failures':>10}")
+    baseline = None
+    for workers in (int(n) for n in args.workers.split(",")):
+        elapsed, failures = run_workers(workers, args)
+        rate = args.marks / elapsed
+        baseline = baseline or rate
+        print(f"{workers:>7}{rate:>10.0f}{rate / baseline:>9.2f}x{failures:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark: many concurrent per-section polls
+
+Seeds a roster split into ``--sections`` sections of one course, starts one
+active poll per section, then drives a marking burst on every poll at once
+(requests from all sections interleaved) through the in-process ASGI client.
+Also measures ``GET /attendance/current?section_id=`` across all sections,
+which should stay flat as the number of active polls grows, and checks that
+every poll ends up with exactly one record per student who marked it.
+
+Usage: python -m benchmarks.bench_sections [--sections N] [--roster M] [--burst K] [--env KEY=VALUE]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, default=300)
+    parser.add_argument("--roster", type=int, default=40, help="students per section")
+    parser.add_argument("--burst", type=int, default=40, help="mark requests per poll")
+    parser.add_argument("--lookups", type=int, default=3000, help="GET /attendance/current requests")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="setting override")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="classcheck-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    # Every simulated student shares one address
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    os.environ.update(item.split("=", 1) for item in args.env)
+
+    # Import after DATABASE_URL is set so the app binds to the scratch database
+    from sqlalchemy import func, insert, select
+    from sqlalchemy.orm import Session
+    from app import crud, models
+    from app.database import Base, engine
+    from benchmarks.datagen import marking_burst, seed
+    from benchmarks.loadtest import inprocess_client, run_scenario
+
+    Base.metadata.create_all(bind=engine)
+    start = time.perf_counter()
+    data = seed(engine, args.sections * args.roster, polls=0, seed=args.seed)
+    rosters = [
+        data.student_ids[s * args.roster:(s + 1) * args.roster] for s in range(args.sections)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(models.Course), [{"id": 1, "code": "BENCH", "title": "Benchmark"}])
+        conn.execute(insert(models.Section), [
+            {"id": s + 1, "course_id": 1, "name": f"S{s:03d}"} for s in range(args.sections)
+        ])
+        conn.execute(insert(models.Enrollment), [
+            {"section_id": s + 1, "student_id": student_id}
+            for s, roster in enumerate(rosters)
+            for student_id in roster
+        ])
+    with Session(engine) as db:
+        poll_ids = [crud.create_poll(db, duration_minutes=30, section_id=s + 1).id for s in range(args.sections)]
+    print(f"seeded {args.sections} sections x {args.roster} students, "
+          f"{len(poll_ids)} active polls in {time.perf_counter() - start:.1f}s")
+
+    rng = random.Random(args.seed)
+    marks = [
+        ("POST", "/attendance/mark", body)
+        for roster, poll_id in zip(rosters, poll_ids)
+        for body in marking_burst(roster, poll_id, args.burst, seed=rng.randrange(2**32))
+    ]
+    rng.shuffle(marks)
+    lookups = [
+        ("GET", f"/attendance/current?section_id={rng.randrange(args.sections) + 1}", None)
+        for _ in range(args.lookups)
+    ]
+
+    async def run():
+        async with inprocess_client(args.concurrency) as client:
+            return {
+                "current": await run_scenario(client, lookups, args.concurrency),
+                "mark": await run_scenario(client, marks, args.concurrency),
+            }
+
+    print(f"{'scenario':<10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'errors':>8}")
+    for name, result in asyncio.run(run()).items():
+        print(
+            f"{name:<10}{result['rps']:>10.0f}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+            f"{result['p99_ms']:>10.2f}{result['max_ms']:>10.2f}{result['errors']:>8}"
+        )
+
+    expected = {}
+    for _, _, body in marks:
+        expected.setdefault(body["poll_id"], set()).add(body["student_id"])
+    with engine.connect() as conn:
+        recorded = dict(conn.execute(
+            select(models.AttendanceRecord.poll_id, func.count())
+            .group_by(models.AttendanceRecord.poll_id)
+        ).all())
+    wrong = [poll_id for poll_id in poll_ids if recorded.get(poll_id, 0) != len(expected.get(poll_id, ()))]
+    print(f"records match marks on {len(poll_ids) - len(wrong)}/{len(poll_ids)} polls")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark: SQLite write contention across uvicorn workers
+
+Runs the API under ``uvicorn --workers 4`` twice against a fresh SQLite file:
+once with SQLite's defaults (``SQLITE_TUNING=false``: rollback journal,
+synchronous=FULL) and once with the tuned profile (WAL, synchronous=NORMAL,
+busy_timeout, larger cache, mmap). Each run fires concurrent
+``POST /attendance/mark`` requests and reports marks/second and failures.
+
+Usage: python -m benchmarks.bench_sqlite_contention [--marks 4000] [--concurrency 64]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+
+
+def wait_for(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url)
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server did not come up at {url}")
+
+
+async def fire_marks(base_url, student_ids, poll_id, concurrency):
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def mark(student_id):
+            async with semaphore:
+                try:
+                    response = await client.post(
+                        "/attendance/mark", json={"student_id": student_id, "poll_id": poll_id}
+                    )
+                    return response.status_code
+                except httpx.HTTPError:
+                    return 0
+
+        start = time.perf_counter()
+        statuses = await asyncio.gather(*(mark(student_id) for student_id in student_ids))
+        elapsed = time.perf_counter() - start
+    return elapsed, sum(1 for code in statuses if code != 200)
+
+
+def run_profile(tuned, args):
+    workdir = tempfile.mkdtemp(prefix="classcheck-contention-")
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        SQLITE_TUNING="true" if tuned else "false",
+        # Every request comes from the benchmark's one address
+        RATE_LIMIT_ENABLED="false",
+    )
+    # Create the schema once, before several workers race to do it
+    subprocess.run([sys.executable, "-c", "import app.main"], env=env, check=True)
+    db = sqlite3.connect(os.path.join(workdir, "bench.db"))
+    db.executemany(
+        "INSERT INTO students (name, roll_no, department, created_at) VALUES (?, ?, 'Bench', ?)",
+        [(f"Student {i}", f"C{i:06d}", datetime.utcnow().isoformat(" ", "microseconds")) for i in range(args.marks)]
+    )
+    db.commit()
+    student_ids = [row[0] for row in db.execute("SELECT id FROM students")]
+    db.close()
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        env=env
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        wait_for(f"{base_url}/health")
+        request = urllib.request.Request(
+            f"{base_url}/attendance/start", data=b'{"duration_minutes": 60}',
+            headers={"Content-Type": "application/json"}, method="POST"
+        )
+        poll_id = json.load(urllib.request.urlopen(request))["id"]
+        return asyncio.run(fire_marks(base_url, student_ids, poll_id, args.concurrency))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--marks", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    print(f"{args.marks} marks, {args.concurrency} concurrent clients, {args.workers} workers")
+    print(f"{'profile':<10}{'marks/s':>10}{'failures':>10}")
+    for label, tuned in [("default", False), ("tuned", True)]:
+        elapsed, failures = run_profile(tuned, args)
+        print(f"{label:<10}{args.marks / elapsed:>10.0f}{failures:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark: roster import vs. one POST /students/ per student
+
+Creates N students through ``POST /students/`` and another N through a
+single ``POST /students/import`` CSV upload on a file-backed SQLite database,
+and reports rows/second and SQL statements issued for each.
+
+Usage: python -m benchmarks.bench_student_import [--students N]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--students", type=int, default=20000)
+    parser.add_argument("--single", type=int, default=2000,
+                        help="students created one request at a time (slow path)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="classcheck-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    # Import after DATABASE_URL is set so the app binds to the scratch database
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+    from app.database import async_engine, engine
+    from app.main import app
+
+    statements = [0]
+
+    def count(*_):
+        statements[0] += 1
+
+    for target in (engine, async_engine.sync_engine):
+        event.listen(target, "before_cursor_execute", count)
+
+    csv_body = "name,roll_no,department\n" + "".join(
+        f"Student {i},IMP{i:07d},Bench\n" for i in range(args.students)
+    )
+
+    with TestClient(app) as client:
+        client.get("/students/?limit=1")
+
+        statements[0] = 0
+        start = time.perf_counter()
+        for i in range(args.single):
+            client.post("/students/", json={"name": f"Single {i}", "roll_no": f"ONE{i:07d}", "department": "Bench"})
+        single_elapsed = time.perf_counter() - start
+        single_statements = statements[0]
+
+        statements[0] = 0
+        start = time.perf_counter()
+        response = client.post(
+            "/students/import",
+            files={"file": ("roster.csv", csv_body.encode(), "text/csv")}
+        )
+        import_elapsed = time.perf_counter() - start
+        import_statements = statements[0]
+        assert response.json()["created"] == args.students, response.text
+
+    print(f"POST /students/        {args.single:>7} rows  {args.single / single_elapsed:>9.0f} rows/s  "
+          f"{single_statements:>6} statements")
+    print(f"POST /students/import  {args.students:>7} rows  {args.students / import_elapsed:>9.0f} rows/s  "
+          f"{import_statements:>6} statements")
+
+
+if __name__ == "__main__":
+    main()
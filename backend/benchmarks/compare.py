@@ -0,0 +1,61 @@
+"""
+Compare two load-test result files from ``benchmarks.loadtest --output``
+
+Prints each scenario's throughput and latency percentiles side by side with
+the relative change. Exits with status 1 if any scenario regressed by more than
+``--threshold`` percent: lower req/s, or higher p95 or p99 latency.
+
+Usage: python -m benchmarks.compare BASELINE.json CANDIDATE.json [--threshold 10]
+"""
+import argparse
+import json
+import sys
+
+# Metric, and whether a higher value is better
+METRICS = (("rps", True), ("p50_ms", False), ("p95_ms", False), ("p99_ms", False))
+GATED = {"rps", "p95_ms", "p99_ms"}
+
+
+def compare(baseline, candidate, threshold):
+    """Yield (scenario, metric, old, new, change %, regressed) for scenarios in both runs"""
+    for scenario, old in baseline["results"].items():
+        new = candidate["results"].get(scenario)
+        if new is None:
+            continue
+        for metric, higher_is_better in METRICS:
+            change = (new[metric] - old[metric]) / old[metric] * 100 if old[metric] else 0.0
+            worse = -change if higher_is_better else change
+            yield scenario, metric, old[metric], new[metric], change, metric in GATED and worse > threshold
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed regression in percent")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    for label, report in (("baseline", baseline), ("candidate", candidate)):
+        meta = report["meta"]
+        print(f"{label:<10} {meta.get('commit')} {meta['target']} c={meta['concurrency']} {meta['timestamp']}")
+
+    for key in ("target", "workers", "students", "polls", "requests", "concurrency", "env"):
+        if baseline["meta"].get(key) != candidate["meta"].get(key):
+            print(f"warning: runs differ in {key}: {baseline['meta'].get(key)} vs {candidate['meta'].get(key)}")
+
+    print(f"{'scenario':<10}{'metric':<8}{'baseline':>12}{'candidate':>12}{'change':>9}")
+    regressions = 0
+    for scenario, metric, old, new, change, regressed in compare(baseline, candidate, args.threshold):
+        regressions += regressed
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{scenario:<10}{metric:<8}{old:>12.2f}{new:>12.2f}{change:>+8.1f}%{flag}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
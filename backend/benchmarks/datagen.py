@@ -0,0 +1,86 @@
+"""
+Synthetic data for the load tests
+
+``seed`` fills an empty database with a roster and a history of closed polls
+through Core executemany inserts, then lets the startup migrations backfill
+the attendance rollups. ``marking_burst`` builds the request bodies of a class
+marking a poll: students arrive in random order, and some of them retry.
+"""
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List
+
+from sqlalchemy import insert
+from sqlalchemy.engine import Engine
+
+DEPARTMENTS = ("CS", "EE", "ME", "CE", "Math", "Physics")
+CHUNK = 20_000
+
+
+@dataclass
+class SeededData:
+    student_ids: List[int]
+    poll_ids: List[int]
+
+
+def seed(engine: Engine, students: int, polls: int, attendance_rate: float = 0.8, seed: int = 0) -> SeededData:
+    """Insert `students` and `polls` closed polls, each marked by ~attendance_rate of the roster"""
+    from app import models
+    from app.migrations import run_migrations
+
+    rng = random.Random(seed)
+    # Roster registered a year ago, one poll a day since
+    start = datetime.utcnow() - timedelta(days=365)
+    with engine.begin() as conn:
+        for offset in range(0, students, CHUNK):
+            conn.execute(insert(models.Student), [
+                {
+                    "id": i + 1,
+                    "name": f"Student {i}",
+                    "roll_no": f"R{i:07d}",
+                    "department": DEPARTMENTS[i % len(DEPARTMENTS)],
+                    "created_at": start + timedelta(microseconds=i)
+                }
+                for i in range(offset, min(offset + CHUNK, students))
+            ])
+        if polls:
+            conn.execute(insert(models.AttendancePoll), [
+                {
+                    "id": p + 1,
+                    "start_time": start + timedelta(days=p + 1),
+                    "end_time": start + timedelta(days=p + 1, minutes=10),
+                    "duration_minutes": 10,
+                    "is_active": False,
+                    "created_at": start + timedelta(days=p + 1)
+                }
+                for p in range(polls)
+            ])
+        for p in range(polls):
+            opened = start + timedelta(days=p + 1)
+            present = rng.sample(range(1, students + 1), int(students * attendance_rate))
+            for offset in range(0, len(present), CHUNK):
+                conn.execute(insert(models.AttendanceRecord), [
+                    {
+                        "student_id": student_id,
+                        "poll_id": p + 1,
+                        "marked_at": opened + timedelta(seconds=rng.uniform(0, 600))
+                    }
+                    for student_id in present[offset:offset + CHUNK]
+                ])
+    run_migrations(engine)
+    return SeededData(student_ids=list(range(1, students + 1)), poll_ids=list(range(1, polls + 1)))
+
+
+def marking_burst(student_ids: List[int], poll_id: int, count: int, retry_rate: float = 0.05, seed: int = 0) -> List[dict]:
+    """`count` mark bodies for one poll: shuffled students, a `retry_rate` share of them sent twice"""
+    rng = random.Random(seed)
+    order = rng.sample(student_ids, min(count, len(student_ids)))
+    bodies = []
+    for student_id in order:
+        bodies.append({"student_id": student_id, "poll_id": poll_id})
+        if rng.random() < retry_rate:
+            bodies.append({"student_id": student_id, "poll_id": poll_id})
+    while len(bodies) < count:
+        bodies.append({"student_id": rng.choice(student_ids), "poll_id": poll_id})
+    return bodies[:count]
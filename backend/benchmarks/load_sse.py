@@ -0,0 +1,107 @@
+"""
+Load test: concurrent Server-Sent Events subscribers on a single worker
+
+Starts one uvicorn worker against a scratch SQLite database, opens N
+concurrent ``GET /attendance/current/stream`` connections, starts a poll and
+measures how long it takes for every subscriber to receive the update.
+
+Usage: python -m benchmarks.load_sse [--clients 5000] [--port 8765]
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+
+async def subscriber(host, port, ready, results):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(
+        f"GET /attendance/current/stream HTTP/1.1\r\nHost: {host}\r\n"
+        "Accept: text/event-stream\r\n\r\n".encode()
+    )
+    await writer.drain()
+    ready.append(1)
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            if line.startswith(b"data: "):
+                status = json.loads(line[6:])
+                if status["is_active"]:
+                    results.append(time.perf_counter())
+                    return
+    finally:
+        writer.close()
+
+
+async def run(args):
+    host = "127.0.0.1"
+    ready, results = [], []
+    tasks = []
+    for _ in range(args.clients):
+        tasks.append(asyncio.create_task(subscriber(host, args.port, ready, results)))
+        if len(tasks) % 500 == 0:
+            await asyncio.sleep(0.05)
+    while len(ready) < args.clients:
+        await asyncio.sleep(0.1)
+    # Give the server time to register every subscriber
+    await asyncio.sleep(2)
+
+    request = urllib.request.Request(
+        f"http://{host}:{args.port}/attendance/start",
+        data=json.dumps({"duration_minutes": 5}).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+    started = time.perf_counter()
+    await asyncio.to_thread(urllib.request.urlopen, request)
+    await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), timeout=args.timeout)
+
+    latencies = sorted(t - started for t in results)
+    print(f"clients connected: {len(ready)}")
+    print(f"clients updated:   {len(latencies)}")
+    if latencies:
+        print(f"p50 fan-out: {latencies[len(latencies) // 2] * 1000:8.1f} ms")
+        print(f"p99 fan-out: {latencies[int(len(latencies) * 0.99)] * 1000:8.1f} ms")
+        print(f"max fan-out: {latencies[-1] * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, args.clients * 2 + 256), hard))
+
+    workdir = tempfile.mkdtemp(prefix="classcheck-sse-")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'sse.db')}")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port),
+         "--workers", "1", "--log-level", "warning", "--backlog", str(args.clients)],
+        env=env
+    )
+    try:
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{args.port}/health")
+                break
+            except OSError:
+                time.sleep(0.1)
+        asyncio.run(run(args))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
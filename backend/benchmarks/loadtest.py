@@ -0,0 +1,242 @@
+"""
+Load test: latency percentiles and throughput of the hot endpoints
+
+Seeds a scratch SQLite database (see ``benchmarks/datagen.py``), then drives
+these scenarios with ``--concurrency`` closed-loop clients:
+
+  students  GET  /students/?limit=100&skip=...
+  current   GET  /attendance/current
+  mark      POST /attendance/mark  (a marking burst on a freshly started poll)
+  logs      GET  /attendance/logs/{id}  (closed polls from the seeded history)
+
+``--target inprocess`` runs the ASGI app on the benchmark's own event loop
+through httpx, lifespan included. ``--target uvicorn`` starts ``--workers``
+uvicorn processes on the same database and sends real HTTP. Settings can be
+overridden for either target with ``--env KEY=VALUE``.
+
+Each scenario reports p50/p95/p99/max latency, requests per second and the
+number of error responses. ``--output`` writes the results with run metadata
+as JSON, for ``python -m benchmarks.compare``.
+
+Usage: python -m benchmarks.loadtest [--target inprocess|uvicorn] [--students N]
+       [--polls M] [--requests R] [--concurrency C] [--output results.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+SCENARIOS = ("students", "current", "mark", "logs")
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(sorted_samples, pct):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_samples)))
+    return sorted_samples[min(rank, len(sorted_samples)) - 1]
+
+
+def summarize(latencies, elapsed, errors):
+    samples = sorted(latencies)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "rps": len(samples) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "max_ms": samples[-1] * 1000 if samples else 0.0,
+    }
+
+
+async def run_scenario(client, requests, concurrency):
+    """Send `requests` (method, url, body) with `concurrency` clients; return the summary"""
+    latencies = []
+    errors = 0
+    pending = iter(requests)
+
+    async def worker():
+        nonlocal errors
+        for method, url, body in pending:
+            start = time.perf_counter()
+            response = await client.request(method, url, json=body)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+
+def build_requests(name, count, data, active_poll_id, rng):
+    from benchmarks.datagen import marking_burst
+
+    if name == "students":
+        pages = max(1, len(data.student_ids) // 100)
+        return [("GET", f"/students/?limit=100&skip={rng.randrange(pages) * 100}", None) for _ in range(count)]
+    if name == "current":
+        return [("GET", "/attendance/current", None)] * count
+    if name == "mark":
+        return [
+            ("POST", "/attendance/mark", body)
+            for body in marking_burst(data.student_ids, active_poll_id, count, seed=rng.randrange(2**32))
+        ]
+    if name == "logs":
+        return [("GET", f"/attendance/logs/{rng.choice(data.poll_ids)}", None) for _ in range(count)]
+    raise ValueError(f"Unknown scenario {name!r}")
+
+
+@asynccontextmanager
+async def inprocess_client(concurrency):
+    import httpx
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            yield client
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def uvicorn_client(concurrency, workers):
+    import httpx
+
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=os.environ.copy()
+    )
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() > deadline or server.poll() is not None:
+                    raise RuntimeError("uvicorn did not become ready")
+                await asyncio.sleep(0.2)
+            yield client
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args, data):
+    rng = random.Random(args.seed)
+    if args.target == "uvicorn":
+        client_context = uvicorn_client(args.concurrency, args.workers)
+    else:
+        client_context = inprocess_client(args.concurrency)
+
+    results = {}
+    async with client_context as client:
+        response = await client.post("/attendance/start", json={"duration_minutes": 60})
+        response.raise_for_status()
+        active_poll_id = response.json()["id"]
+        for name in args.scenarios:
+            requests = build_requests(name, args.requests, data, active_poll_id, rng)
+            # Warm up connections, caches and the SQLite page cache
+            await run_scenario(client, requests[:args.concurrency], args.concurrency)
+            results[name] = await run_scenario(client, requests, args.concurrency)
+            summary = results[name]
+            print(
+                f"{name:<10}{summary['rps']:>10.0f}{summary['p50_ms']:>10.2f}{summary['p95_ms']:>10.2f}"
+                f"{summary['p99_ms']:>10.2f}{summary['max_ms']:>10.2f}{summary['errors']:>8}"
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--workers", type=int, default=2, help="uvicorn worker processes")
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--polls", type=int, default=30)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="setting override")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+    args.scenarios = [name for name in args.scenarios.split(",") if name]
+
+    workdir = tempfile.mkdtemp(prefix="classcheck-load-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'load.db')}"
+    # Every simulated student shares the benchmark's address; lift the client
+    # rate limit unless a run overrides it
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    overrides = dict(item.split("=", 1) for item in args.env)
+    os.environ.update(overrides)
+
+    # Import after DATABASE_URL is set so the app binds to the scratch database
+    from app import models  # noqa: F401  (registers tables on Base.metadata)
+    from app.database import Base, engine
+    from benchmarks.datagen import seed
+
+    Base.metadata.create_all(bind=engine)
+    start = time.perf_counter()
+    data = seed(engine, args.students, args.polls, seed=args.seed)
+    print(f"seeded {args.students} students and {args.polls} polls in {time.perf_counter() - start:.1f}s")
+
+    print(f"{'scenario':<10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'errors':>8}")
+    results = asyncio.run(run(args, data))
+
+    if args.output:
+        report = {
+            "meta": {
+                "commit": _git_commit(),
+                "timestamp": datetime.utcnow().isoformat() + "Z",
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "target": args.target,
+                "workers": args.workers if args.target == "uvicorn" else None,
+                "students": args.students,
+                "polls": args.polls,
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "env": overrides,
+            },
+            "results": results,
+        }
+        with open(args.output, "w") as out:
+            json.dump(report, out, indent=2)
+        print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
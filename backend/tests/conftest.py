@@ -1,32 +1,66 @@
 """
 Pytest configuration and fixtures
 """
+import os
+import re
+import shutil
+import tempfile
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
 
 from app.main import app
-from app.database import Base, get_db
+from app.database import Base, async_database_url, configure_sqlite, get_async_db, get_async_read_db, get_db, instrument_queries
 from app import models
+from app.poll_cache import cache as poll_cache
+from app.analytics import attendance_analytics
+from app.response_cache import response_cache
+from app.roster_index import roster_index
+from app.state_backend import state
 
-# Create test database in memory
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+# Sync fixtures and async request handlers must see the same data, so tests
+# share a scratch SQLite file instead of an in-memory database. Engines are
+# bound at import, before any fixture runs; the directory is removed when the
+# session finishes (see pytest_sessionfinish).
+SCRATCH_DIR = tempfile.mkdtemp(prefix="classcheck-test-")
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{os.path.join(SCRATCH_DIR, 'test.db')}"
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
     connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
 )
 
+# TestClient runs each request on a fresh event loop, so don't pool async connections
+async_engine = create_async_engine(async_database_url(SQLALCHEMY_DATABASE_URL), poolclass=NullPool)
+
+configure_sqlite(engine)
+configure_sqlite(async_engine.sync_engine)
+instrument_queries(engine)
+instrument_queries(async_engine.sync_engine)
+
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    """Close the scratch database and remove its directory"""
+    engine.dispose()
+    shutil.rmtree(SCRATCH_DIR, ignore_errors=True)
 
 
 @pytest.fixture(scope="function")
 def db_session():
     """Create a fresh database for each test"""
     Base.metadata.create_all(bind=engine)
+    poll_cache.invalidate()
+    attendance_analytics.invalidate()
+    response_cache.clear()
+    state.clear()
+    roster_index.clear()
     session = TestingSessionLocal()
     try:
         yield session
@@ -44,7 +78,13 @@ def client(db_session):
         finally:
             pass
 
+    async def override_get_async_db():
+        async with TestingAsyncSessionLocal() as db:
+            yield db
+
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_async_read_db] = override_get_async_db
     
     # FIXED: Use app parameter correctly for newer versions
     client = TestClient(app=app)
@@ -54,6 +94,57 @@ def client(db_session):
     app.dependency_overrides.clear()
 
 
+@pytest.fixture
+def query_counter():
+    """Collect every SQL statement executed on the test engine"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    for target in (engine, async_engine.sync_engine):
+        event.listen(target, "before_cursor_execute", record)
+    yield statements
+    for target in (engine, async_engine.sync_engine):
+        event.remove(target, "before_cursor_execute", record)
+
+
+class QueryPlanAuditor:
+    """Capture statements issued on an engine and EXPLAIN them afterwards"""
+
+    # "SCAN students" with no index; covering-index scans are reported as
+    # "SCAN students USING COVERING INDEX ..." and do not match
+    FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)$")
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+            self.statements.append((statement, parameters[0] if executemany else parameters))
+
+    def full_table_scans(self):
+        """(statement, plan detail) for every captured statement that scans a whole table"""
+        scans = []
+        with self.engine.connect() as conn:
+            for statement, parameters in self.statements:
+                plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+                scans.extend(
+                    (statement, row[-1]) for row in plan if self.FULL_SCAN.match(row[-1])
+                )
+        return scans
+
+
+@pytest.fixture
+def query_plans():
+    """Audit the plans of every statement executed on the sync test engine"""
+    auditor = QueryPlanAuditor(engine)
+    event.listen(engine, "before_cursor_execute", auditor.record)
+    yield auditor
+    event.remove(engine, "before_cursor_execute", auditor.record)
+
+
 @pytest.fixture
 def sample_student(db_session):
     """Create a sample student for testing"""
@@ -0,0 +1,164 @@
+"""
+Test the columnar analytics snapshot and /analytics endpoints
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app import models
+from app.analytics import _compress, _longest_true_run, _trailing_true, attendance_analytics
+
+TERM_START = datetime(2024, 1, 1, 9, 0)
+
+
+def _seed(db_session):
+    """Three students, four daily 10-minute polls, and a known attendance pattern"""
+    students = [
+        models.Student(name="Ann", roll_no="S1", department="CS", created_at=TERM_START - timedelta(days=1)),
+        models.Student(name="Ben", roll_no="S2", department="CS", created_at=TERM_START - timedelta(days=1)),
+        # Registers after the first poll
+        models.Student(name="Cat", roll_no="S3", department="EE", created_at=TERM_START + timedelta(hours=1)),
+    ]
+    polls = [
+        models.AttendancePoll(
+            start_time=TERM_START + timedelta(days=day),
+            end_time=TERM_START + timedelta(days=day, minutes=10),
+            duration_minutes=10,
+            is_active=False,
+            created_at=TERM_START + timedelta(days=day)
+        )
+        for day in range(4)
+    ]
+    db_session.add_all(students + polls)
+    db_session.flush()
+    # (student, poll, seconds after start)
+    marks = [(0, 0, 10), (0, 1, 40), (0, 2, 70), (0, 3, 100), (1, 0, 20), (2, 1, 610)]
+    db_session.add_all(
+        models.AttendanceRecord(
+            student_id=students[s].id,
+            poll_id=polls[p].id,
+            marked_at=polls[p].start_time + timedelta(seconds=offset)
+        )
+        for s, p, offset in marks
+    )
+    db_session.commit()
+    return students, polls
+
+
+class TestRunLengths:
+    """Test the vectorized run-length helpers against a plain loop"""
+
+    def test_matches_reference(self):
+        """Test trailing and longest runs on random matrices"""
+        rng = np.random.default_rng(7)
+        matrix = rng.random((200, 30)) < 0.6
+        for row, trailing, longest in zip(matrix, _trailing_true(matrix), _longest_true_run(matrix)):
+            runs = "".join("1" if v else "0" for v in row).split("0")
+            assert trailing == len(runs[-1])
+            assert longest == max(len(run) for run in runs)
+
+    def test_compress_skips_masked_columns(self):
+        """Test runs over a row's masked columns only, right-aligned"""
+        matrix = np.array([[1, 0, 1, 0], [0, 1, 1, 1]], bool)
+        mask = np.array([[1, 0, 1, 0], [1, 1, 0, 0]], bool)
+        assert _compress(matrix, mask).tolist() == [[True, True], [False, True]]
+        assert _compress(np.zeros((2, 0), bool), np.zeros((2, 0), bool)).shape == (2, 0)
+
+    def test_empty_columns(self):
+        """Test matrices with no polls"""
+        matrix = np.zeros((3, 0), bool)
+        assert _trailing_true(matrix).tolist() == [0, 0, 0]
+        assert _longest_true_run(matrix).tolist() == [0, 0, 0]
+
+
+class TestAnalyticsEndpoints:
+    """Test the /analytics reports"""
+
+    def test_turnout(self, client, db_session):
+        """Test eligibility, turnout, curve and median per poll"""
+        _, polls = _seed(db_session)
+        data = client.get("/analytics/turnout").json()
+        assert [p["poll_id"] for p in data] == [p.id for p in polls]
+        assert [(p["eligible"], p["present"]) for p in data] == [(2, 2), (3, 2), (3, 1), (3, 1)]
+        assert data[0]["turnout_percentage"] == 100.0
+        assert data[1]["median_seconds_to_mark"] == 40.0
+        # 30-second bins over 10 minutes; the late mark lands in the last bin
+        assert data[1]["cumulative_present"][:2] == [0, 1]
+        assert data[1]["cumulative_present"][-1] == 2
+        assert len(data[1]["cumulative_present"]) == 21
+
+    def test_department_trends(self, client, db_session):
+        """Test per-department percentages poll by poll"""
+        _seed(db_session)
+        data = {d["department"]: d for d in client.get("/analytics/departments").json()}
+        assert [p["percentage"] for p in data["CS"]["points"]] == [100.0, 50.0, 50.0, 50.0]
+        assert [p["eligible"] for p in data["EE"]["points"]] == [0, 1, 1, 1]
+        assert data["EE"]["points"][0]["percentage"] is None
+
+    def test_absence_streaks(self, client, db_session):
+        """Test current and longest consecutive absences"""
+        students, _ = _seed(db_session)
+        data = client.get("/analytics/streaks?min_current=2").json()
+        assert [(s["roll_no"], s["current_absence_streak"], s["longest_absence_streak"]) for s in data] == [
+            ("S2", 3, 3),
+            ("S3", 2, 2),
+        ]
+
+    def test_time_to_mark(self, client, db_session):
+        """Test the distribution of seconds from poll start to mark"""
+        _seed(db_session)
+        data = client.get("/analytics/time-to-mark").json()
+        assert data["count"] == 6
+        assert data["p50_seconds"] == 55.0
+        assert sum(data["histogram"]) == 6
+
+    def test_empty_database(self, client, db_session):
+        """Test reports with no data"""
+        assert client.get("/analytics/turnout").json() == []
+        assert client.get("/analytics/time-to-mark").json()["count"] == 0
+
+
+class TestIncrementalSnapshot:
+    """Test the snapshot only loads what changed"""
+
+    def test_new_records_load_incrementally(self, client, db_session, query_counter):
+        """Test a new mark is picked up by reading only the new records"""
+        students, polls = _seed(db_session)
+        client.get("/analytics/turnout")
+        db_session.add(models.AttendanceRecord(
+            student_id=students[1].id, poll_id=polls[3].id, marked_at=polls[3].start_time
+        ))
+        db_session.commit()
+
+        query_counter.clear()
+        data = client.get("/analytics/turnout").json()
+        assert data[3]["present"] == 2
+        assert len(query_counter) == 2  # high-water marks, then the new record
+
+    def test_unchanged_data_reuses_report(self, client, db_session):
+        """Test the report is not recomputed when nothing changed"""
+        _seed(db_session)
+        first = attendance_analytics.report(db_session)
+        assert attendance_analytics.report(db_session) is first
+
+    def test_deleted_student_forces_reload(self, client, db_session):
+        """Test deleting a student drops them and their records from the reports"""
+        students, _ = _seed(db_session)
+        client.get("/analytics/turnout")
+        assert client.delete(f"/students/{students[0].id}").status_code == 204
+
+        data = client.get("/analytics/turnout").json()
+        assert [p["present"] for p in data] == [1, 1, 0, 0]
+
+    def test_bulk_update_forces_reload(self, client, db_session):
+        """Test students moved by an import with update_existing show up in their new department"""
+        _seed(db_session)
+        client.get("/analytics/departments")
+        content = "name,roll_no,department\nCat,S3,CS\n"
+        client.post(
+            "/students/import?update_existing=true",
+            files={"file": ("roster.csv", content.encode(), "text/csv")}
+        )
+
+        data = {d["department"]: d for d in client.get("/analytics/departments").json()}
+        assert set(data) == {"CS"}
@@ -150,10 +150,74 @@ class TestAttendanceMarking:
         assert "expired" in response.json()["detail"].lower()
 
 
+class TestBatchAttendanceMarking:
+    """Test bulk attendance marking"""
+
+    def test_mark_batch_success(self, client, sample_students, active_poll):
+        """Test marking a whole batch in one request"""
+        payload = {"records": [
+            {"student_id": s.id, "poll_id": active_poll.id} for s in sample_students
+        ]}
+        response = client.post("/attendance/mark/batch", json=payload)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["created"] == len(sample_students)
+        assert data["duplicate"] == 0
+        assert data["rejected"] == 0
+        assert all(r["record_id"] is not None for r in data["results"])
+
+        logs = client.get(f"/attendance/logs/{active_poll.id}").json()
+        assert logs["present_count"] == len(sample_students)
+
+    def test_mark_batch_duplicates(self, client, sample_student, active_poll):
+        """Test already-marked and repeated pairs are reported as duplicates"""
+        item = {"student_id": sample_student.id, "poll_id": active_poll.id}
+        first = client.post("/attendance/mark", json=item).json()
+
+        response = client.post("/attendance/mark/batch", json={"records": [item, item]})
+        data = response.json()
+        assert data["created"] == 0
+        assert data["duplicate"] == 2
+        assert all(r["record_id"] == first["id"] for r in data["results"])
+
+    def test_mark_batch_rejections(self, client, sample_student, active_poll, db_session):
+        """Test unknown students, unknown polls and expired polls are rejected per item"""
+        from app.models import AttendancePoll
+
+        expired = AttendancePoll(
+            start_time=datetime.utcnow() - timedelta(minutes=10),
+            end_time=datetime.utcnow() - timedelta(minutes=5),
+            duration_minutes=5,
+            is_active=False
+        )
+        db_session.add(expired)
+        db_session.commit()
+
+        payload = {"records": [
+            {"student_id": sample_student.id, "poll_id": active_poll.id},
+            {"student_id": 99999, "poll_id": active_poll.id},
+            {"student_id": sample_student.id, "poll_id": 99999},
+            {"student_id": sample_student.id, "poll_id": expired.id},
+        ]}
+        data = client.post("/attendance/mark/batch", json=payload).json()
+        assert data["created"] == 1
+        assert data["rejected"] == 3
+        statuses = [r["status"] for r in data["results"]]
+        assert statuses == ["created", "rejected", "rejected", "rejected"]
+        assert "student" in data["results"][1]["detail"].lower()
+        assert "poll" in data["results"][2]["detail"].lower()
+        assert "expired" in data["results"][3]["detail"].lower()
+
+    def test_mark_batch_empty(self, client):
+        """Test an empty batch is a validation error"""
+        response = client.post("/attendance/mark/batch", json={"records": []})
+        assert response.status_code == 422
+
+
 class TestAttendanceLogs:
     """Test attendance logs and reports"""
 
-    def test_get_attendance_logs(self, client, active_poll, sample_students, db_session):
+    def test_get_attendance_logs(self, client, sample_students, active_poll, db_session):
         """Test getting attendance logs for a poll"""
         from app.models import AttendanceRecord
         
@@ -175,6 +239,16 @@ class TestAttendanceLogs:
         assert data["absent_count"] == 1
         assert len(data["records"]) == 2
 
+    def test_logs_count_roster_when_poll_started(self, client, sample_student):
+        """Test students registered after a poll started are not counted absent from it"""
+        poll = client.post("/attendance/start", json={"duration_minutes": 5}).json()
+        late = client.post("/students/", json={"name": "Late", "roll_no": "LATE1", "department": "CS"}).json()
+        assert client.get(f"/attendance/logs/{poll['id']}").json()["total_students"] == 1
+
+        client.post("/attendance/mark", json={"student_id": late["id"], "poll_id": poll["id"]})
+        data = client.get(f"/attendance/logs/{poll['id']}").json()
+        assert (data["total_students"], data["present_count"], data["absent_count"]) == (2, 1, 1)
+
     def test_get_logs_nonexistent_poll(self, client):
         """Test getting logs for non-existent poll"""
         response = client.get("/attendance/logs/99999")
@@ -228,11 +302,171 @@ class TestAttendanceLogs:
         assert len(data) == 3
         assert all(r["student_id"] == sample_student.id for r in data)
 
+    def test_polls_cursor_pagination(self, client, db_session):
+        """Test paging polls newest first by cursor"""
+        from app.models import AttendancePoll
+        
+        created_at = datetime(2024, 1, 1)
+        polls = [
+            AttendancePoll(
+                start_time=created_at,
+                end_time=created_at + timedelta(minutes=5),
+                duration_minutes=5,
+                is_active=False,
+                created_at=created_at + timedelta(minutes=i // 2)
+            )
+            for i in range(5)
+        ]
+        db_session.add_all(polls)
+        db_session.commit()
+        expected = [p.id for p in sorted(polls, key=lambda p: (p.created_at, p.id), reverse=True)]
+
+        seen = []
+        response = client.get("/attendance/logs?limit=2")
+        while True:
+            seen.extend(p["id"] for p in response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+            response = client.get(f"/attendance/logs?limit=2&cursor={cursor}")
+        assert seen == expected
+
+    def test_student_history_cursor_pagination(self, client, sample_student, db_session):
+        """Test paging a student's history newest first by cursor"""
+        from app.models import AttendancePoll, AttendanceRecord
+        
+        marked_at = datetime(2024, 1, 1)
+        for i in range(5):
+            poll = AttendancePoll(
+                start_time=marked_at,
+                end_time=marked_at + timedelta(minutes=5),
+                duration_minutes=5,
+                is_active=False
+            )
+            db_session.add(poll)
+            db_session.flush()
+            db_session.add(AttendanceRecord(
+                student_id=sample_student.id,
+                poll_id=poll.id,
+                marked_at=marked_at + timedelta(days=i)
+            ))
+        db_session.commit()
+
+        url = f"/attendance/student/{sample_student.id}?limit=3"
+        first = client.get(url)
+        assert [r["marked_at"][:10] for r in first.json()] == ["2024-01-05", "2024-01-04", "2024-01-03"]
+        second = client.get(f"{url}&cursor={first.headers['X-Next-Cursor']}")
+        assert [r["marked_at"][:10] for r in second.json()] == ["2024-01-02", "2024-01-01"]
+        assert "X-Next-Cursor" not in second.headers
+
+
+class TestAbsentees:
+    """Test absentee listings"""
+
+    def _seed(self, db_session, marked):
+        """Students registered before two polls, with (student, poll) marks by index"""
+        from app.models import AttendancePoll, AttendanceRecord, Student
+        
+        registered = datetime.utcnow() - timedelta(days=1)
+        students = [
+            Student(name=f"Student {i}", roll_no=f"R{i}", department="CS" if i % 2 else "EE", created_at=registered)
+            for i in range(6)
+        ]
+        polls = [
+            AttendancePoll(
+                start_time=datetime.utcnow(),
+                end_time=datetime.utcnow() + timedelta(minutes=5),
+                duration_minutes=5,
+                is_active=False
+            )
+            for _ in range(2)
+        ]
+        db_session.add_all(students + polls)
+        db_session.flush()
+        db_session.add_all(
+            AttendanceRecord(student_id=students[s].id, poll_id=polls[p].id) for s, p in marked
+        )
+        db_session.commit()
+        return students, polls
+
+    def test_poll_absentees(self, client, db_session):
+        """Test students who did not mark are listed in roster order"""
+        students, polls = self._seed(db_session, [(0, 0), (3, 0)])
+        response = client.get(f"/attendance/logs/{polls[0].id}/absentees")
+        assert response.status_code == 200
+        assert [s["roll_no"] for s in response.json()] == ["R1", "R2", "R4", "R5"]
+
+    def test_poll_absentees_department_and_cursor(self, client, db_session):
+        """Test department filtering and paging by cursor"""
+        students, polls = self._seed(db_session, [(1, 0)])
+        url = f"/attendance/logs/{polls[0].id}/absentees?department=CS&limit=1"
+        first = client.get(url)
+        assert [s["roll_no"] for s in first.json()] == ["R3"]
+        second = client.get(f"{url}&cursor={first.headers['X-Next-Cursor']}")
+        assert [s["roll_no"] for s in second.json()] == ["R5"]
+        assert client.get(f"{url}&cursor={second.headers['X-Next-Cursor']}").json() == []
+
+    def test_poll_absentees_skip_later_registrations(self, client, db_session, active_poll):
+        """Test students registered after the poll was created are not absentees"""
+        from app.models import Student
+        
+        db_session.add(Student(name="Late", roll_no="LATE", department="CS", created_at=datetime.utcnow() + timedelta(minutes=1)))
+        db_session.commit()
+        assert client.get(f"/attendance/logs/{active_poll.id}/absentees").json() == []
+
+    def test_poll_absentees_nonexistent_poll(self, client):
+        """Test absentees of an unknown poll"""
+        assert client.get("/attendance/logs/99999/absentees").status_code == 404
+
+    def test_absentees_for_poll_range(self, client, db_session):
+        """Test one request returns the absentees of each poll in the range"""
+        students, polls = self._seed(db_session, [(s, 0) for s in range(6)] + [(0, 1), (1, 1)])
+        response = client.get(
+            f"/attendance/absentees?first_poll_id={polls[0].id}&last_poll_id={polls[1].id}&department=EE"
+        )
+        assert response.json() == [
+            {"poll_id": polls[0].id, "absent_count": 0, "student_ids": []},
+            {"poll_id": polls[1].id, "absent_count": 2, "student_ids": [students[2].id, students[4].id]},
+        ]
+
+    def test_absentees_range_limit(self, client):
+        """Test reversed or oversized poll ranges are rejected"""
+        assert client.get("/attendance/absentees?first_poll_id=5&last_poll_id=1").status_code == 400
+        assert client.get("/attendance/absentees?first_poll_id=1&last_poll_id=1000").status_code == 400
+
+class TestAttendanceLogQueries:
+    """Regression checks for the SQL issued by the log endpoint"""
+
+    @pytest.mark.slow
+    def test_logs_constant_query_count_large_roster(self, client, active_poll, db_session, query_counter):
+        """Test logs over 10k students and 10k records use a fixed number of statements"""
+        from sqlalchemy import insert
+        from app.models import AttendanceRecord, Student
+
+        db_session.execute(insert(Student), [
+            {"name": f"Student {i}", "roll_no": f"R{i:05d}", "department": "Load"}
+            for i in range(10000)
+        ])
+        db_session.execute(insert(AttendanceRecord), [
+            {"student_id": student_id, "poll_id": active_poll.id}
+            for student_id in range(1, 10001)
+        ])
+        db_session.commit()
+        poll_id = active_poll.id
+        query_counter.clear()
+
+        response = client.get(f"/attendance/logs/{poll_id}")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total_students"] == 10000
+        assert data["present_count"] == 10000
+        assert len(query_counter) == 3
+
 
 class TestAttendanceStatistics:
     """Test attendance statistics calculations"""
 
-    def test_attendance_percentage_calculation(self, client, active_poll, sample_students, db_session):
+    def test_attendance_percentage_calculation(self, client, sample_students, active_poll, db_session):
         """Test attendance percentage is calculated correctly"""
         from app.models import AttendanceRecord
         
@@ -250,7 +484,7 @@ class TestAttendanceStatistics:
         expected_percentage = (2 / 3) * 100
         assert abs(data["attendance_percentage"] - expected_percentage) < 0.01
 
-    def test_empty_attendance(self, client, active_poll, sample_students):
+    def test_empty_attendance(self, client, sample_students, active_poll):
         """Test logs when no one has marked attendance"""
         response = client.get(f"/attendance/logs/{active_poll.id}")
         data = response.json()
@@ -0,0 +1,149 @@
+"""
+Test poll status fan-out to streaming subscribers
+"""
+import asyncio
+import json
+
+from app.broadcast import PollStatusBroadcaster, sse_events
+from app.routers.attendance import _live_poll_status
+
+
+async def take(iterator, count):
+    return [await iterator.__anext__() for _ in range(count)]
+
+
+class TestPollStatusBroadcaster:
+    """Test the broadcaster computes once and fans out to everyone"""
+
+    def test_fan_out_computes_once_per_tick(self):
+        """Test a thousand subscribers share a single computation"""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return json.dumps({"tick": len(calls)})
+
+        async def scenario():
+            broadcaster = PollStatusBroadcaster(compute, interval=60)
+            subscriptions = [broadcaster.subscribe() for _ in range(1000)]
+            first = await asyncio.gather(*(take(s, 1) for s in subscriptions))
+            assert broadcaster.subscriber_count == 1000
+            for subscription in subscriptions:
+                await subscription.aclose()
+            assert broadcaster.subscriber_count == 0
+            return first
+
+        first = asyncio.run(scenario())
+        assert len(calls) == 1
+        assert all(payloads == ['{"tick": 1}'] for payloads in first)
+
+    def test_slow_subscriber_only_sees_latest(self):
+        """Test an unread payload is replaced rather than queued"""
+        async def scenario():
+            broadcaster = PollStatusBroadcaster(lambda: "initial", interval=60)
+            subscription = broadcaster.subscribe()
+            assert await take(subscription, 1) == ["initial"]
+            broadcaster.publish("stale")
+            broadcaster.publish("fresh")
+            latest = await take(subscription, 1)
+            await subscription.aclose()
+            return latest
+
+        assert asyncio.run(scenario()) == ["fresh"]
+
+    def test_failed_tick_keeps_producing(self):
+        """Test an error in one computation is logged and the next tick still runs"""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("database unavailable")
+            return "recovered"
+
+        async def scenario():
+            broadcaster = PollStatusBroadcaster(compute, interval=0.01)
+            subscription = broadcaster.subscribe()
+            payload = await asyncio.wait_for(take(subscription, 1), 5)
+            await subscription.aclose()
+            return payload
+
+        assert asyncio.run(scenario()) == ["recovered"]
+
+    def test_keepalive_while_idle(self):
+        """Test an unchanged status yields keepalives at the configured interval"""
+        async def scenario():
+            broadcaster = PollStatusBroadcaster(lambda: "same", interval=0.01, keepalive=0.05)
+            subscription = broadcaster.subscribe()
+            payloads = await take(subscription, 3)
+            await subscription.aclose()
+            return payloads
+
+        assert asyncio.run(scenario()) == ["same", None, None]
+
+    def test_on_idle_after_last_subscriber(self):
+        """Test on_idle runs once the last subscriber leaves, not before"""
+        idle = []
+
+        async def scenario():
+            broadcaster = PollStatusBroadcaster(lambda: "status", interval=60, on_idle=idle.append)
+            subscriptions = [broadcaster.subscribe() for _ in range(2)]
+            await asyncio.gather(*(take(s, 1) for s in subscriptions))
+            await subscriptions[0].aclose()
+            assert idle == []
+            await subscriptions[1].aclose()
+            return broadcaster
+
+        assert idle == [asyncio.run(scenario())]
+
+    def test_sse_framing(self):
+        """Test payloads are framed as SSE data events and keepalives as comments"""
+        async def payloads():
+            yield '{"is_active": false}'
+            yield None
+
+        async def scenario():
+            return [event async for event in sse_events(payloads())]
+
+        assert asyncio.run(scenario()) == ['data: {"is_active": false}\n\n', ": keepalive\n\n"]
+
+
+class TestLiveStatus:
+    """Test the streamed status payload"""
+
+    def test_stream_unknown_section(self, client):
+        """Test streaming an unknown section is a 404 and registers no broadcaster"""
+        from app.routers.attendance import broadcasters
+
+        response = client.get("/attendance/current/stream", params={"section_id": 99999})
+        assert response.status_code == 404
+        assert 99999 not in broadcasters
+
+    def test_broadcaster_dropped_when_idle(self, client):
+        """Test a section's broadcaster leaves the registry with its last subscriber"""
+        from app.routers.attendance import _broadcaster, broadcasters
+
+        async def scenario():
+            broadcaster = _broadcaster(12345)
+            broadcaster.compute = lambda: "status"
+            subscription = broadcaster.subscribe()
+            await take(subscription, 1)
+            assert broadcasters[12345] is broadcaster
+            await subscription.aclose()
+
+        asyncio.run(scenario())
+        assert 12345 not in broadcasters
+
+    def test_live_status_includes_present_count(self, client, sample_students, active_poll, monkeypatch):
+        """Test the pushed status carries the poll and its present count"""
+        from tests.conftest import TestingSessionLocal
+        import app.routers.attendance as attendance_router
+
+        monkeypatch.setattr(attendance_router, "SessionLocal", TestingSessionLocal)
+        poll_id = active_poll.id
+        client.post("/attendance/mark", json={"student_id": sample_students[0].id, "poll_id": poll_id})
+
+        status = json.loads(_live_poll_status())
+        assert status["is_active"] is True
+        assert status["poll_id"] == poll_id
+        assert status["present_count"] == 1
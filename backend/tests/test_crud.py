@@ -1,8 +1,10 @@
 """
 Test CRUD operations directly
 """
+import pytest
 from datetime import datetime, timedelta
-from app import crud, schemas
+from sqlalchemy.exc import IntegrityError
+from app import crud, models, schemas
 
 
 class TestStudentCRUD:
@@ -61,4 +63,22 @@ class TestAttendanceCRUD:
         crud.mark_attendance(db_session, sample_student.id, active_poll.id)
         records = crud.get_attendance_by_poll(db_session, active_poll.id)
         assert len(records) == 1
-        assert records[0].student_id == sample_student.id
\ No newline at end of file
+        assert records[0].student_id == sample_student.id
+
+    def test_mark_attendance_twice_returns_existing(self, db_session, sample_student, active_poll):
+        """Test a repeated mark is a no-op returning the original record"""
+        first = crud.mark_attendance(db_session, sample_student.id, active_poll.id)
+        second = crud.mark_attendance(db_session, sample_student.id, active_poll.id)
+        assert second.id == first.id
+        assert len(crud.get_attendance_by_poll(db_session, active_poll.id)) == 1
+
+    def test_duplicate_record_rejected_by_database(self, db_session, sample_student, active_poll):
+        """Test the unique index rejects a second record for the same student and poll"""
+        for _ in range(2):
+            db_session.add(models.AttendanceRecord(
+                student_id=sample_student.id,
+                poll_id=active_poll.id
+            ))
+        with pytest.raises(IntegrityError):
+            db_session.commit()
+        db_session.rollback()
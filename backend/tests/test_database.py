@@ -0,0 +1,79 @@
+"""
+Test database engine configuration
+"""
+import asyncio
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.config import settings
+from app.database import async_database_url, configure_sqlite, engine_options
+
+
+def read_pragmas(conn):
+    return {
+        name: conn.execute(text(f"PRAGMA {name}")).scalar()
+        for name in ("journal_mode", "synchronous", "busy_timeout", "cache_size")
+    }
+
+
+class TestSQLiteProfile:
+    """Test the SQLite performance profile is applied per connection"""
+
+    def test_sync_engine_pragmas(self, tmp_path):
+        """Test WAL, synchronous=NORMAL, busy timeout and cache size on a sync engine"""
+        url = f"sqlite:///{tmp_path / 'tuned.db'}"
+        tuned = create_engine(url, **engine_options(url))
+        configure_sqlite(tuned)
+        with tuned.connect() as conn:
+            pragmas = read_pragmas(conn)
+        assert pragmas["journal_mode"] == "wal"
+        assert pragmas["synchronous"] == 1  # NORMAL
+        assert pragmas["busy_timeout"] == settings.SQLITE_BUSY_TIMEOUT_MS
+        assert pragmas["cache_size"] == -settings.SQLITE_CACHE_SIZE_KB
+
+    def test_async_engine_pragmas(self, tmp_path):
+        """Test the same profile reaches aiosqlite connections"""
+        url = async_database_url(f"sqlite:///{tmp_path / 'tuned.db'}")
+        tuned = create_async_engine(url, **engine_options(url, is_async=True))
+        configure_sqlite(tuned.sync_engine)
+
+        async def scenario():
+            async with tuned.connect() as conn:
+                pragmas = await conn.run_sync(read_pragmas)
+            await tuned.dispose()
+            return pragmas
+
+        pragmas = asyncio.run(scenario())
+        assert pragmas["journal_mode"] == "wal"
+        assert pragmas["synchronous"] == 1
+
+    def test_tuning_can_be_disabled(self, tmp_path, monkeypatch):
+        """Test SQLITE_TUNING=false leaves SQLite's defaults in place"""
+        monkeypatch.setattr(settings, "SQLITE_TUNING", False)
+        url = f"sqlite:///{tmp_path / 'plain.db'}"
+        plain = create_engine(url, **engine_options(url))
+        configure_sqlite(plain)
+        with plain.connect() as conn:
+            pragmas = read_pragmas(conn)
+        assert pragmas["journal_mode"] == "delete"
+        assert pragmas["synchronous"] == 2  # FULL
+
+
+class TestEngineOptions:
+    """Test pool options chosen per URL"""
+
+    def test_file_database_is_pooled(self):
+        """Test file databases get the configured pool size"""
+        options = engine_options("sqlite:///./classcheck.db", is_async=True)
+        assert options["pool_size"] == settings.DB_POOL_SIZE
+        assert options["max_overflow"] == settings.DB_MAX_OVERFLOW
+
+    def test_memory_database_keeps_default_pool(self):
+        """Test in-memory databases are not given a multi-connection pool"""
+        assert "pool_size" not in engine_options("sqlite:///:memory:")
+
+    def test_async_url_translation(self):
+        """Test sync URLs map to their async drivers"""
+        assert async_database_url("sqlite:///./x.db") == "sqlite+aiosqlite:///./x.db"
+        assert async_database_url("postgresql://u:p@h/db") == "postgresql+asyncpg://u:p@h/db"
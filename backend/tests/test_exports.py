@@ -0,0 +1,168 @@
+"""
+Test streaming attendance exports
+"""
+import csv
+import io
+import json
+import tracemalloc
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, insert, select
+
+from app import models
+from app.exports import attendance_matrix_export, poll_log_export
+from tests.conftest import TestingSessionLocal
+
+
+@pytest.fixture
+def export_client(client, monkeypatch):
+    """Client whose export generators read the test database"""
+    import app.routers.attendance as attendance_router
+
+    monkeypatch.setattr(attendance_router, "SessionLocal", TestingSessionLocal)
+    return client
+
+
+def _add_poll(db_session, days_ago=0):
+    start = datetime.utcnow() - timedelta(days=days_ago)
+    poll = models.AttendancePoll(
+        start_time=start,
+        end_time=start + timedelta(minutes=5),
+        duration_minutes=5,
+        is_active=False,
+        created_at=start
+    )
+    db_session.add(poll)
+    db_session.commit()
+    return poll
+
+
+def _seed_poll(db_session, students):
+    """One poll with a record for each of `students` new students"""
+    poll = _add_poll(db_session)
+    first_id = (db_session.scalar(select(func.max(models.Student.id))) or 0) + 1
+    db_session.execute(insert(models.Student), [
+        {"id": first_id + i, "name": f"Student {i}", "roll_no": f"X{first_id + i:07d}", "department": "CS"}
+        for i in range(students)
+    ])
+    db_session.execute(insert(models.AttendanceRecord), [
+        {"student_id": first_id + i, "poll_id": poll.id, "marked_at": datetime.utcnow()}
+        for i in range(students)
+    ])
+    db_session.commit()
+    return poll.id
+
+
+class TestPollLogExport:
+    """Test GET /attendance/logs/{poll_id}/export"""
+
+    def test_export_csv(self, export_client, active_poll, sample_students, db_session):
+        """Test the CSV export lists each record with the student's details"""
+        for student in sample_students[:2]:
+            db_session.add(models.AttendanceRecord(student_id=student.id, poll_id=active_poll.id))
+        db_session.commit()
+
+        response = export_client.get(f"/attendance/logs/{active_poll.id}/export")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert f"poll-{active_poll.id}.csv" in response.headers["content-disposition"]
+
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert sorted(r["roll_no"] for r in rows) == ["CS001", "CS002"]
+        assert rows[0]["name"] in {"Alice Smith", "Bob Johnson"}
+
+    def test_export_ndjson(self, export_client, active_poll, sample_student, db_session):
+        """Test the NDJSON export emits one object per line"""
+        db_session.add(models.AttendanceRecord(student_id=sample_student.id, poll_id=active_poll.id))
+        db_session.commit()
+
+        response = export_client.get(f"/attendance/logs/{active_poll.id}/export?format=ndjson")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert len(lines) == 1
+        assert lines[0]["student_id"] == sample_student.id
+        assert lines[0]["roll_no"] == sample_student.roll_no
+
+    def test_export_spans_batches(self, export_client, db_session):
+        """Test exports larger than one batch are complete"""
+        poll_id = _seed_poll(db_session, 2500)
+
+        response = export_client.get(f"/attendance/logs/{poll_id}/export?format=ndjson")
+        assert len(response.text.splitlines()) == 2500
+
+    def test_export_nonexistent_poll(self, export_client):
+        """Test exporting an unknown poll"""
+        response = export_client.get("/attendance/logs/99999/export")
+        assert response.status_code == 404
+
+    def test_export_invalid_format(self, export_client, active_poll):
+        """Test an unsupported format is rejected"""
+        response = export_client.get(f"/attendance/logs/{active_poll.id}/export?format=xml")
+        assert response.status_code == 422
+
+
+class TestAttendanceMatrixExport:
+    """Test GET /attendance/export/matrix"""
+
+    def test_matrix_csv(self, export_client, sample_students, db_session):
+        """Test one row per student with a cell per poll, oldest poll first"""
+        older, newer = _add_poll(db_session, days_ago=1), _add_poll(db_session)
+        db_session.add_all([
+            models.AttendanceRecord(student_id=sample_students[0].id, poll_id=older.id),
+            models.AttendanceRecord(student_id=sample_students[0].id, poll_id=newer.id),
+            models.AttendanceRecord(student_id=sample_students[2].id, poll_id=newer.id),
+        ])
+        db_session.commit()
+
+        response = export_client.get("/attendance/export/matrix")
+        assert response.status_code == 200
+        header, *rows = list(csv.reader(io.StringIO(response.text)))
+        assert header[4].startswith(f"poll_{older.id} ")
+        assert header[5].startswith(f"poll_{newer.id} ")
+        # The older poll predates the students, so it only counts where attended
+        assert [row[4:] for row in rows] == [
+            ["1", "1", "2", "2"],
+            ["0", "0", "0", "1"],
+            ["0", "1", "1", "1"],
+        ]
+
+    def test_matrix_ndjson(self, export_client, sample_students, active_poll, db_session):
+        """Test the NDJSON matrix lists the polls each student attended"""
+        db_session.add(models.AttendanceRecord(student_id=sample_students[1].id, poll_id=active_poll.id))
+        db_session.commit()
+
+        response = export_client.get("/attendance/export/matrix?format=ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["present_poll_ids"] for line in lines] == [[], [active_poll.id], []]
+        assert all(line["total_polls"] == 1 for line in lines)
+
+
+class TestExportMemory:
+    """Test exports stream instead of materializing every row"""
+
+    def _peak_bytes(self, export):
+        tracemalloc.start()
+        try:
+            size = sum(len(chunk) for chunk in export)
+            return size, tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    @pytest.mark.slow
+    @pytest.mark.parametrize("export", [
+        lambda poll_id: poll_log_export(TestingSessionLocal, poll_id, "csv"),
+        lambda poll_id: attendance_matrix_export(TestingSessionLocal, "ndjson"),
+    ])
+    def test_memory_flat_as_export_grows(self, db_session, export):
+        """Test peak memory barely grows when the export is ten times larger"""
+        small_poll = _seed_poll(db_session, 2000)
+        self._peak_bytes(export(small_poll))  # warm statement caches
+        small_size, small_peak = self._peak_bytes(export(small_poll))
+
+        large_poll = _seed_poll(db_session, 18000)
+        large_size, large_peak = self._peak_bytes(export(large_poll))
+
+        assert large_size > 5 * small_size
+        assert large_peak < 1.5 * small_peak
@@ -0,0 +1,67 @@
+"""
+Test the orjson fast path for list endpoints
+"""
+import pytest
+
+from app.config import settings
+from app.response_cache import response_cache
+
+
+@pytest.fixture
+def both_paths(client, monkeypatch):
+    """Fetch a URL through the Pydantic path and the fast path"""
+    def fetch(url):
+        responses = []
+        for fast in (False, True):
+            monkeypatch.setattr(settings, "FAST_JSON_ENABLED", fast)
+            response_cache.clear()
+            responses.append(client.get(url))
+        return responses
+    return fetch
+
+
+class TestFastJsonParity:
+    """Test the fast path produces the same responses as the Pydantic path"""
+
+    def test_students_list(self, both_paths, sample_students):
+        """Test /students/ bodies and cursors are byte-identical"""
+        slow, fast = both_paths("/students/?limit=2")
+        assert fast.status_code == 200
+        assert fast.content == slow.content
+        assert fast.headers["x-next-cursor"] == slow.headers["x-next-cursor"]
+
+    def test_polls_list(self, both_paths, active_poll):
+        """Test /attendance/logs bodies are byte-identical"""
+        slow, fast = both_paths("/attendance/logs")
+        assert fast.content == slow.content
+        assert len(fast.json()) == 1
+
+    def test_poll_log(self, client, both_paths, sample_students, active_poll):
+        """Test /attendance/logs/{id} bodies are byte-identical"""
+        poll_id = active_poll.id
+        for student in sample_students[:2]:
+            client.post("/attendance/mark", json={"student_id": student.id, "poll_id": poll_id})
+
+        slow, fast = both_paths(f"/attendance/logs/{poll_id}")
+        assert fast.content == slow.content
+        assert fast.json()["present_count"] == 2
+
+    def test_empty_poll_log(self, both_paths, active_poll):
+        """Test a log with no students encodes the percentage the same way"""
+        slow, fast = both_paths(f"/attendance/logs/{active_poll.id}")
+        assert fast.content == slow.content
+
+    def test_student_history(self, client, both_paths, sample_student, active_poll):
+        """Test /attendance/student/{id} bodies and cursors are byte-identical"""
+        student_id = sample_student.id
+        client.post("/attendance/mark", json={"student_id": student_id, "poll_id": active_poll.id})
+
+        slow, fast = both_paths(f"/attendance/student/{student_id}?limit=1")
+        assert fast.content == slow.content
+        assert fast.headers["x-next-cursor"] == slow.headers["x-next-cursor"]
+        assert fast.json()[0]["student_name"] == sample_student.name
+
+    def test_student_history_not_found(self, both_paths):
+        """Test the fast path still 404s for an unknown student"""
+        slow, fast = both_paths("/attendance/student/999")
+        assert fast.status_code == slow.status_code == 404
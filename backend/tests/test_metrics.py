@@ -0,0 +1,108 @@
+"""
+Test request timing and SQL metrics
+"""
+import logging
+import re
+
+import pytest
+
+from app.config import settings
+from app.metrics import registry
+
+
+@pytest.fixture
+def metrics(client):
+    registry.reset()
+    yield lambda: client.get("/metrics").text
+
+
+def _sample(text, name, **labels):
+    """Value of the sample `name` whose labels include `labels`"""
+    for line in text.splitlines():
+        if line.startswith(name + "{") and all(f'{key}="{value}"' in line for key, value in labels.items()):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+class TestServerTiming:
+    """Test the Server-Timing response header"""
+
+    def test_header_reports_app_and_sql_time(self, client, sample_student):
+        """Test responses carry app and sql durations with the statement count"""
+        header = client.get(f"/students/{sample_student.id}").headers["server-timing"]
+        assert re.fullmatch(r'app;dur=[\d.]+, sql;dur=[\d.]+;desc="1 statements"', header)
+
+    def test_disabled(self, client, monkeypatch):
+        """Test METRICS_ENABLED=false skips instrumentation"""
+        monkeypatch.setattr(settings, "METRICS_ENABLED", False)
+        assert "server-timing" not in client.get("/health").headers
+
+
+class TestMetricsEndpoint:
+    """Test the Prometheus /metrics endpoint"""
+
+    def test_requests_are_labelled_by_route_template(self, client, metrics, sample_student):
+        """Test path parameters collapse into the route template"""
+        client.get(f"/students/{sample_student.id}")
+        client.get("/students/999999")
+        text = metrics()
+        assert _sample(text, "classcheck_requests_total", route="/students/{student_id}", status="200") == 1
+        assert _sample(text, "classcheck_requests_total", route="/students/{student_id}", status="404") == 1
+        assert _sample(text, "classcheck_request_duration_seconds_count", route="/students/{student_id}") == 2
+
+    def test_unmatched_paths_share_one_label(self, client, metrics):
+        """Test unknown URLs do not create a label per path"""
+        client.get("/no/such/path")
+        client.get("/another/missing/path")
+        assert _sample(metrics(), "classcheck_requests_total", route="<unmatched>", status="404") == 2
+
+    def test_sql_and_rows_are_counted(self, client, metrics, sample_students):
+        """Test statements, loaded rows and written rows are attributed to routes"""
+        client.get("/students/")
+        client.post("/attendance/start", json={"duration_minutes": 5})
+        text = metrics()
+        assert _sample(text, "classcheck_sql_statements_total", method="GET", route="/students/") == 1
+        assert _sample(text, "classcheck_sql_rows_loaded_total", method="GET", route="/students/") == len(sample_students)
+        assert _sample(text, "classcheck_sql_rows_written_total", route="/attendance/start") >= 1
+
+    def test_plain_rows_are_counted(self, client, metrics, sample_students, monkeypatch):
+        """Test rows fetched as plain rows, not ORM objects, count as loaded"""
+        monkeypatch.setattr(settings, "FAST_JSON_ENABLED", True)
+        client.get("/students/?limit=2")
+        client.get("/attendance/logs")
+        text = metrics()
+        assert _sample(text, "classcheck_sql_rows_loaded_total", method="GET", route="/students/") == 2
+        assert _sample(text, "classcheck_sql_rows_loaded_total", method="GET", route="/attendance/logs") == 0
+
+    def test_poll_log_statement_count_is_flat(self, client, metrics, sample_students, active_poll):
+        """Test the log endpoint's statement count does not grow with its records (no N+1)"""
+        poll_id = active_poll.id
+        client.post("/attendance/mark", json={"student_id": sample_students[0].id, "poll_id": poll_id})
+        registry.reset()
+        client.get(f"/attendance/logs/{poll_id}")
+        one = _sample(metrics(), "classcheck_sql_statements_total", route="/attendance/logs/{poll_id}")
+
+        for student in sample_students[1:]:
+            client.post("/attendance/mark", json={"student_id": student.id, "poll_id": poll_id})
+        registry.reset()
+        client.get(f"/attendance/logs/{poll_id}")
+        assert _sample(metrics(), "classcheck_sql_statements_total", route="/attendance/logs/{poll_id}") == one
+
+
+class TestSlowQueryLog:
+    """Test the slow-query log"""
+
+    def test_slow_queries_are_logged_with_route(self, client, metrics, monkeypatch, caplog):
+        """Test statements over the threshold are logged and counted"""
+        monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", 1e-9)
+        with caplog.at_level(logging.WARNING, logger="app.metrics"):
+            client.get("/students/")
+        assert any("Slow query" in message and "/students/" in message for message in caplog.messages)
+        assert int(re.search(r"^classcheck_slow_queries_total (\d+)$", metrics(), re.M).group(1)) >= 1
+
+    def test_threshold_zero_disables(self, client, monkeypatch, caplog):
+        """Test a zero threshold logs nothing"""
+        monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", 0)
+        with caplog.at_level(logging.WARNING, logger="app.metrics"):
+            client.get("/students/")
+        assert not any("Slow query" in message for message in caplog.messages)
@@ -0,0 +1,162 @@
+"""
+Test schema migrations on existing databases
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.migrations import backfill_student_stats, run_migrations
+
+
+def make_legacy_engine():
+    """Create a database shaped like one created before the unique index existed"""
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_attendance_records_student_poll"))
+    return engine
+
+
+def test_migration_removes_duplicates_and_adds_index():
+    """Test duplicates are collapsed to the earliest record before indexing"""
+    engine = make_legacy_engine()
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO students (id, name, roll_no, department, created_at) VALUES (1, 'A', 'R1', 'CS', :now)"),
+            {"now": now},
+        )
+        conn.execute(
+            text(
+                "INSERT INTO attendance_polls (id, start_time, end_time, duration_minutes, is_active, created_at) "
+                "VALUES (1, :start, :end, 5, 1, :start)"
+            ),
+            {"start": now, "end": now + timedelta(minutes=5)},
+        )
+        for record_id in (1, 2, 3):
+            conn.execute(
+                text("INSERT INTO attendance_records (id, student_id, poll_id, marked_at) VALUES (:id, 1, 1, :now)"),
+                {"id": record_id, "now": now},
+            )
+
+    run_migrations(engine)
+
+    with engine.connect() as conn:
+        ids = [row[0] for row in conn.execute(text("SELECT id FROM attendance_records"))]
+    assert ids == [1]
+    index_names = {index["name"] for index in inspect(engine).get_indexes("attendance_records")}
+    assert "ix_attendance_records_student_poll" in index_names
+
+
+def test_migrations_are_idempotent():
+    """Test running migrations on an up-to-date database changes nothing"""
+    engine = make_legacy_engine()
+    run_migrations(engine)
+    run_migrations(engine)
+    index_names = {index["name"] for index in inspect(engine).get_indexes("attendance_records")}
+    assert "ix_attendance_records_student_poll" in index_names
+
+
+def test_migration_adds_poll_sections():
+    """Test polls of a database created before sections become campus-wide polls
+    and gain the columns added since"""
+    engine = make_legacy_engine()
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE attendance_polls"))
+        conn.execute(text(
+            "CREATE TABLE attendance_polls (id INTEGER PRIMARY KEY, start_time DATETIME NOT NULL, "
+            "end_time DATETIME NOT NULL, duration_minutes INTEGER NOT NULL, is_active BOOLEAN, created_by VARCHAR, "
+            "created_at DATETIME)"
+        ))
+        conn.execute(text(
+            "CREATE INDEX ix_attendance_polls_active_end_time ON attendance_polls (end_time) WHERE is_active"
+        ))
+        conn.execute(
+            text(
+                "INSERT INTO attendance_polls (id, start_time, end_time, duration_minutes, is_active) "
+                "VALUES (1, :start, :end, 5, 1)"
+            ),
+            {"start": datetime.utcnow(), "end": datetime.utcnow() + timedelta(minutes=5)},
+        )
+
+    run_migrations(engine)
+
+    columns = {column["name"] for column in inspect(engine).get_columns("attendance_polls")}
+    assert {"section_id", "present_count"} <= columns
+    index_names = {index["name"] for index in inspect(engine).get_indexes("attendance_polls")}
+    assert "ix_attendance_polls_active_section" in index_names
+    assert "ix_attendance_polls_active_end_time" not in index_names
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT section_id FROM attendance_polls")).scalar_one() is None
+
+
+def test_migration_backfills_pagination_keys():
+    """Test NULL timestamps of an older database are filled in, so every row has a cursor"""
+    engine = make_legacy_engine()
+    start = datetime(2024, 1, 8, 9, 0, 0, 250000)
+    with engine.begin() as conn:
+        for table, columns in (
+            ("students", "id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, roll_no VARCHAR NOT NULL, "
+                         "department VARCHAR NOT NULL, created_at DATETIME"),
+            ("attendance_records", "id INTEGER PRIMARY KEY, student_id INTEGER NOT NULL, "
+                                   "poll_id INTEGER NOT NULL, marked_at DATETIME"),
+            ("attendance_polls", "id INTEGER PRIMARY KEY, start_time DATETIME NOT NULL, end_time DATETIME NOT NULL, "
+                                 "duration_minutes INTEGER NOT NULL, is_active BOOLEAN, created_by VARCHAR, "
+                                 "created_at DATETIME, section_id INTEGER, present_count INTEGER"),
+        ):
+            conn.execute(text(f"DROP TABLE {table}"))
+            conn.execute(text(f"CREATE TABLE {table} ({columns})"))
+        conn.execute(text("INSERT INTO students (id, name, roll_no, department) VALUES (1, 'A', 'R1', 'CS')"))
+        for poll_id, days in ((1, 0), (2, 7)):
+            conn.execute(
+                text(
+                    "INSERT INTO attendance_polls (id, start_time, end_time, duration_minutes, is_active) "
+                    "VALUES (:id, :start, :start, 5, 0)"
+                ),
+                {"id": poll_id, "start": start + timedelta(days=days)},
+            )
+        conn.execute(text("INSERT INTO attendance_records (id, student_id, poll_id) VALUES (1, 1, 2)"))
+
+    run_migrations(engine)
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT created_at FROM attendance_polls ORDER BY id")).scalars().all() == [
+            str(start), str(start + timedelta(days=7))
+        ]
+        assert conn.execute(text("SELECT marked_at FROM attendance_records")).scalar_one() == str(
+            start + timedelta(days=7)
+        )
+        assert conn.execute(text("SELECT created_at FROM students")).scalar_one() == str(start)
+        assert conn.execute(text("SELECT total_polls FROM student_stats")).scalar_one() == 2
+
+
+def test_student_stats_backfill_counts_polls_without_created_at():
+    """Test a campus-wide poll with no created_at counts for every student, as in crud"""
+    engine = make_legacy_engine()
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE attendance_polls"))
+        conn.execute(text(
+            "CREATE TABLE attendance_polls (id INTEGER PRIMARY KEY, start_time DATETIME NOT NULL, "
+            "end_time DATETIME NOT NULL, duration_minutes INTEGER NOT NULL, is_active BOOLEAN, created_by VARCHAR, "
+            "created_at DATETIME, section_id INTEGER, present_count INTEGER)"
+        ))
+        conn.execute(
+            text("INSERT INTO students (id, name, roll_no, department, created_at) VALUES (1, 'A', 'R1', 'CS', :now)"),
+            {"now": now},
+        )
+        conn.execute(
+            text(
+                "INSERT INTO attendance_polls (id, start_time, end_time, duration_minutes, is_active) "
+                "VALUES (1, :start, :start, 5, 0)"
+            ),
+            {"start": now - timedelta(days=1)},
+        )
+        backfill_student_stats(conn)
+
+        assert conn.execute(text("SELECT total_polls FROM student_stats")).scalar_one() == 1
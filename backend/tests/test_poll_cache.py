@@ -0,0 +1,90 @@
+"""
+Test the active-poll cache
+"""
+import time
+from datetime import datetime, timedelta
+
+from app.poll_cache import PollCache
+from app.state_backend import MemoryStateBackend
+
+
+class TestActivePollCache:
+    """Test /attendance/current is served from memory"""
+
+    def test_current_poll_steady_state_skips_database(self, client, active_poll, query_counter):
+        """Test repeated status checks do not query the database"""
+        poll_id = active_poll.id
+        assert client.get("/attendance/current").json()["poll_id"] == poll_id
+        query_counter.clear()
+
+        for _ in range(5):
+            assert client.get("/attendance/current").json()["poll_id"] == poll_id
+        assert query_counter == []
+
+    def test_no_active_poll_is_cached(self, client, query_counter):
+        """Test the absence of a poll is cached as well"""
+        client.get("/attendance/current")
+        query_counter.clear()
+        assert client.get("/attendance/current").json()["is_active"] is False
+        assert query_counter == []
+
+    def test_start_poll_invalidates_cache(self, client):
+        """Test starting a poll is visible immediately"""
+        assert client.get("/attendance/current").json()["is_active"] is False
+        poll = client.post("/attendance/start", json={"duration_minutes": 5}).json()
+        current = client.get("/attendance/current").json()
+        assert current["is_active"] is True
+        assert current["poll_id"] == poll["id"]
+
+    def test_expired_poll_reported_inactive_without_reload(self, client, db_session, query_counter):
+        """Test a cached poll stops being current once its end time passes"""
+        from app.models import AttendancePoll
+
+        poll = AttendancePoll(
+            start_time=datetime.utcnow() - timedelta(minutes=5),
+            end_time=datetime.utcnow() + timedelta(milliseconds=300),
+            duration_minutes=5,
+            is_active=True
+        )
+        db_session.add(poll)
+        db_session.commit()
+        assert client.get("/attendance/current").json()["is_active"] is True
+
+        time.sleep(0.4)
+        query_counter.clear()
+
+        assert client.get("/attendance/current").json()["is_active"] is False
+        assert query_counter == []
+
+    def test_mark_uses_cached_poll(self, client, sample_student, active_poll, query_counter):
+        """Test marking reads the poll from the cache"""
+        student_id, poll_id = sample_student.id, active_poll.id
+        client.get("/attendance/current")
+        client.post("/attendance/mark", json={"student_id": student_id, "poll_id": poll_id})
+        query_counter.clear()
+
+        client.post("/attendance/mark", json={"student_id": student_id, "poll_id": poll_id})
+        assert not any("FROM attendance_polls" in statement for statement in query_counter)
+
+
+class TestGenerationStamp:
+    """Test cross-worker invalidation through the state backend"""
+
+    def test_other_worker_invalidation_is_observed(self, tmp_path):
+        """Test a write published by one cache reloads another sharing the backend"""
+        prefix = str(tmp_path / "state")
+        worker_a = PollCache(MemoryStateBackend(prefix, max_keys=10))
+        worker_b = PollCache(MemoryStateBackend(prefix, max_keys=10))
+        loads = []
+
+        def load():
+            loads.append(1)
+            return None
+
+        worker_b.get_active(None, load)
+        worker_b.get_active(None, load)
+        assert len(loads) == 1
+
+        worker_a.invalidate()
+        worker_b.get_active(None, load)
+        assert len(loads) == 2
@@ -0,0 +1,140 @@
+"""
+Test the background poll expiry scheduler
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+from app import crud, models
+from app.poll_expiry import PollExpiryScheduler
+from tests.conftest import TestingSessionLocal
+
+
+def make_scheduler(grace_seconds=0.0, resync_seconds=60.0):
+    return PollExpiryScheduler(TestingSessionLocal, grace_seconds=grace_seconds, resync_seconds=resync_seconds)
+
+
+def _poll(db_session, ends_in, section_id=None):
+    now = datetime.utcnow()
+    poll = models.AttendancePoll(
+        section_id=section_id,
+        start_time=now - timedelta(minutes=5),
+        end_time=now + ends_in,
+        duration_minutes=5,
+        is_active=True
+    )
+    db_session.add(poll)
+    db_session.commit()
+    return poll
+
+
+class TestCloseExpiredPolls:
+    """Test closing polls and finalizing their counts"""
+
+    def test_closes_ended_polls_only(self, db_session, sample_students):
+        """Test ended polls are closed with their final present count"""
+        ended = _poll(db_session, timedelta(seconds=-1))
+        open_poll = _poll(db_session, timedelta(minutes=5), section_id=1)
+        crud.insert_attendance_records(db_session, [
+            {"student_id": student.id, "poll_id": ended.id, "marked_at": datetime.utcnow()}
+            for student in sample_students[:2]
+        ])
+
+        closed = crud.close_expired_polls(db_session, datetime.utcnow())
+        assert [row.id for row in closed] == [ended.id]
+        db_session.expire_all()
+        assert (ended.is_active, ended.present_count) == (False, 2)
+        assert (open_poll.is_active, open_poll.present_count) == (True, None)
+        assert crud.close_expired_polls(db_session, datetime.utcnow()) == []
+
+    def test_late_records_update_closed_count(self, db_session, sample_students):
+        """Test write-behind records landing after close are counted"""
+        poll = _poll(db_session, timedelta(seconds=-1))
+        crud.close_expired_polls(db_session, datetime.utcnow())
+        crud.insert_attendance_records(db_session, [
+            {"student_id": sample_students[0].id, "poll_id": poll.id, "marked_at": poll.end_time}
+        ])
+        db_session.expire_all()
+        assert poll.present_count == 1
+
+    def test_starting_poll_closes_previous(self, db_session, sample_student):
+        """Test a superseded poll is closed with its count"""
+        first = crud.create_poll(db_session, duration_minutes=5)
+        crud.mark_attendance(db_session, sample_student.id, first.id)
+        crud.create_poll(db_session, duration_minutes=5)
+        db_session.expire_all()
+        assert (first.is_active, first.present_count) == (False, 1)
+
+    def test_closed_poll_rejects_marks(self, client, sample_student):
+        """Test marking a superseded poll fails even before its end time"""
+        first = client.post("/attendance/start", json={"duration_minutes": 5}).json()
+        client.post("/attendance/start", json={"duration_minutes": 5})
+        response = client.post("/attendance/mark", json={"student_id": sample_student.id, "poll_id": first["id"]})
+        assert response.status_code == 400
+
+    def test_closing_invalidates_active_poll_cache(self, client, db_session):
+        """Test /attendance/current stops reporting a poll once it is closed"""
+        poll = _poll(db_session, timedelta(minutes=5))
+        assert client.get("/attendance/current").json()["poll_id"] == poll.id
+        crud.close_expired_polls(db_session, poll.end_time)
+        assert client.get("/attendance/current").json()["is_active"] is False
+
+
+class TestScheduler:
+    """Test the deadline heap and background task"""
+
+    def test_closes_poll_at_deadline(self, db_session):
+        """Test a scheduled poll is closed shortly after its deadline"""
+        scheduler = make_scheduler()
+        closed = []
+
+        async def listener(rows):
+            closed.extend(row.id for row in rows)
+
+        scheduler.add_listener(listener)
+
+        async def scenario():
+            await scheduler.start()
+            await asyncio.sleep(0.05)
+            poll = _poll(db_session, timedelta(seconds=0.2))
+            scheduler.schedule(poll.id, poll.end_time)
+            assert scheduler.next_deadline == poll.end_time
+            await asyncio.sleep(0.6)
+            await scheduler.stop()
+            return poll.id
+
+        poll_id = asyncio.run(scenario())
+        assert closed == [poll_id]
+        db_session.expire_all()
+        assert crud.get_poll(db_session, poll_id).is_active is False
+
+    def test_startup_closes_polls_that_ended_while_down(self, db_session):
+        """Test the first resync closes polls whose deadline already passed"""
+        ended = _poll(db_session, timedelta(minutes=-10))
+        pending = _poll(db_session, timedelta(minutes=10), section_id=1)
+        scheduler = make_scheduler()
+
+        async def scenario():
+            await scheduler.start()
+            await asyncio.sleep(0.1)
+            deadline = scheduler.next_deadline
+            await scheduler.stop()
+            return deadline
+
+        assert asyncio.run(scenario()) == pending.end_time
+        db_session.expire_all()
+        assert ended.is_active is False
+        assert pending.is_active is True
+
+    def test_grace_delays_closing(self, db_session):
+        """Test polls stay open for the grace period after their deadline"""
+        poll = _poll(db_session, timedelta(seconds=-1))
+        scheduler = make_scheduler(grace_seconds=60)
+        assert asyncio.run(scheduler.close_due()) == []
+        db_session.expire_all()
+        assert poll.is_active is True
+
+    def test_schedule_is_ignored_when_stopped(self):
+        """Test scheduling without a running task does not grow the heap"""
+        scheduler = make_scheduler()
+        scheduler.schedule(1, datetime.utcnow())
+        assert scheduler.next_deadline is None
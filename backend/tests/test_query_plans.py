@@ -0,0 +1,167 @@
+"""
+Test that crud queries are served by indexes
+"""
+import inspect
+from datetime import datetime, timedelta
+
+from app import crud, models, schemas
+from app.pagination import decode_cursor, encode_cursor
+from app.roster_index import roster_index
+
+# Tables that functions touch in full by design: exports, aggregates over
+# every student, and counting a new poll for every student
+WHOLE_TABLE_ACCESS = {
+    "iter_attendance_matrix": {"students"},
+    "get_department_stats": {"students", "student_stats"},
+    "create_poll": {"student_stats"},
+    # Every student is checked against every poll in the range, or the one poll
+    "get_absentees_for_polls": {"students"},
+    "count_poll_roster": {"students"},
+    # The roster index loads every student at once
+    "get_roster_rows": {"students"},
+}
+
+
+def _crud_calls(db, student, poll):
+    """One representative call per public crud function"""
+    cursor = decode_cursor(encode_cursor(datetime.utcnow(), 1))
+    return {
+        "create_student": lambda: crud.create_student(
+            db, schemas.StudentCreate(name="Plan", roll_no="PLAN2", department="CS")
+        ),
+        "get_student": lambda: crud.get_student(db, student.id),
+        "get_student_by_roll_no": lambda: crud.get_student_by_roll_no(db, student.roll_no),
+        "get_roster_rows": lambda: crud.get_roster_rows(db),
+        # A stale index falls back to the students table
+        "get_roster_entry": lambda: (roster_index.clear(), crud.get_roster_entry(db, student.id)),
+        "get_students": lambda: (
+            crud.get_students(db, skip=0, limit=10),
+            crud.get_students(db, limit=10, after=cursor),
+        ),
+        "get_student_rows": lambda: (
+            crud.get_student_rows(db, skip=0, limit=10),
+            crud.get_student_rows(db, limit=10, after=cursor),
+        ),
+        "bulk_upsert_students": lambda: crud.bulk_upsert_students(
+            db,
+            [schemas.StudentCreate(name="Bulk", roll_no=roll_no, department="CS") for roll_no in ("PLAN1", "PLAN3")],
+            update_existing=True
+        ),
+        "update_student": lambda: crud.update_student(
+            db, student.id, schemas.StudentUpdate(name="Renamed")
+        ),
+        "delete_student": lambda: crud.delete_student(db, crud.get_student_by_roll_no(db, "PLAN2").id),
+        "create_course": lambda: crud.create_course(db, schemas.CourseCreate(code="PLAN101", title="Plans")),
+        "get_course": lambda: crud.get_course(db, crud.get_course_by_code(db, "PLAN101").id),
+        "get_course_by_code": lambda: crud.get_course_by_code(db, "PLAN101"),
+        "get_courses": lambda: crud.get_courses(db, skip=0, limit=10),
+        "create_section": lambda: crud.create_section(
+            db, crud.get_course_by_code(db, "PLAN101").id, schemas.SectionCreate(name="A")
+        ),
+        "get_sections": lambda: crud.get_sections(db, crud.get_course_by_code(db, "PLAN101").id),
+        "get_section": lambda: crud.get_section(db, 1),
+        "enroll_students": lambda: crud.enroll_students(db, 1, [student.id]),
+        "is_enrolled": lambda: crud.is_enrolled(db, 1, student.id),
+        "get_section_roster": lambda: (
+            crud.get_section_roster(db, 1, limit=10),
+            crud.get_section_roster(db, 1, limit=10, after=cursor),
+        ),
+        "get_student_section_ids": lambda: crud.get_student_section_ids(db, student.id),
+        "create_poll": lambda: (
+            crud.create_poll(db, duration_minutes=5),
+            crud.create_poll(db, duration_minutes=5, section_id=1),
+        ),
+        "get_active_poll": lambda: (
+            crud.get_active_poll(db),
+            crud.get_active_poll(db, section_id=1),
+        ),
+        "get_poll": lambda: crud.get_poll(db, poll.id),
+        "get_cached_active_poll": lambda: crud.get_cached_active_poll(db),
+        "get_cached_poll": lambda: crud.get_cached_poll(db, poll.id),
+        "get_poll_deadlines": lambda: crud.get_poll_deadlines(db),
+        "get_poll_timeline": lambda: crud.get_poll_timeline(db),
+        "get_poll_ids_in_range": lambda: crud.get_poll_ids_in_range(db, poll.id, poll.id + 5),
+        "get_polls": lambda: (
+            crud.get_polls(db, skip=0, limit=10),
+            crud.get_polls(db, limit=10, before=cursor),
+        ),
+        "get_poll_rows": lambda: (
+            crud.get_poll_rows(db, skip=0, limit=10),
+            crud.get_poll_rows(db, limit=10, before=cursor),
+        ),
+        "mark_attendance": lambda: (
+            crud.mark_attendance(db, student.id, poll.id),
+            crud.mark_attendance(db, student.id, poll.id),
+        ),
+        "insert_attendance_records": lambda: crud.insert_attendance_records(
+            db, [{"student_id": student.id, "poll_id": poll.id, "marked_at": datetime.utcnow()}]
+        ),
+        "mark_attendance_batch": lambda: crud.mark_attendance_batch(db, [(student.id, poll.id)]),
+        "get_attendance_by_poll": lambda: crud.get_attendance_by_poll(db, poll.id),
+        "count_poll_attendance": lambda: crud.count_poll_attendance(db, poll.id),
+        "get_attendance_log_rows": lambda: crud.get_attendance_log_rows(db, poll.id),
+        "iter_attendance_log_rows": lambda: list(crud.iter_attendance_log_rows(db, poll.id)),
+        "iter_attendance_matrix": lambda: list(crud.iter_attendance_matrix(db)),
+        "get_student_attendance_history": lambda: (
+            crud.get_student_attendance_history(db, student.id),
+            crud.get_student_attendance_history(db, student.id, limit=10, before=cursor),
+        ),
+        "get_student_attendance_rows": lambda: (
+            crud.get_student_attendance_rows(db, student),
+            crud.get_student_attendance_rows(db, student, limit=10, before=cursor),
+        ),
+        "get_poll_absentees": lambda: (
+            crud.get_poll_absentees(db, poll),
+            crud.get_poll_absentees(db, poll, department="CS", after=cursor),
+        ),
+        "count_poll_roster": lambda: crud.count_poll_roster(db, poll.id),
+        "get_absentees_for_polls": lambda: (
+            crud.get_absentees_for_polls(db, poll.id, poll.id + 5),
+            crud.get_absentees_for_polls(db, poll.id, poll.id + 5, department="CS"),
+        ),
+        "get_student_stats": lambda: crud.get_student_stats(db, student.id),
+        "get_department_stats": lambda: crud.get_department_stats(db),
+        "unenroll_student": lambda: crud.unenroll_student(db, 1, student.id),
+        "get_at_risk_students": lambda: (
+            crud.get_at_risk_students(db, threshold=75),
+            crud.get_at_risk_students(db, threshold=75, department="CS"),
+        ),
+        # Last: closes the poll the other calls use
+        "close_expired_polls": lambda: crud.close_expired_polls(db, datetime.utcnow() + timedelta(hours=1)),
+    }
+
+
+class TestQueryPlans:
+    """Test EXPLAIN QUERY PLAN of every crud query"""
+
+    def test_every_crud_function_is_audited(self, db_session):
+        """Test new crud functions are added to the plan audit"""
+        public = {
+            name for name, fn in inspect.getmembers(crud, inspect.isfunction)
+            if fn.__module__ == crud.__name__ and not name.startswith("_")
+        }
+        assert set(_crud_calls(db_session, None, None)) == public
+
+    def test_crud_queries_avoid_full_table_scans(self, db_session, query_plans):
+        """Test no crud query scans a whole table"""
+        student = models.Student(name="Plan", roll_no="PLAN1", department="CS", stats=models.StudentStats())
+        poll = models.AttendancePoll(
+            start_time=datetime.utcnow(),
+            end_time=datetime.utcnow() + timedelta(minutes=5),
+            duration_minutes=5,
+            is_active=True
+        )
+        db_session.add_all([student, poll])
+        db_session.commit()
+
+        scans = {}
+        for name, call in _crud_calls(db_session, student, poll).items():
+            query_plans.statements.clear()
+            call()
+            assert query_plans.statements, name
+            allowed = WHOLE_TABLE_ACCESS.get(name, set())
+            scans[name] = [
+                (statement, detail) for statement, detail in query_plans.full_table_scans()
+                if query_plans.FULL_SCAN.match(detail).group(1) not in allowed
+            ]
+        assert {name: found for name, found in scans.items() if found} == {}
@@ -0,0 +1,170 @@
+"""
+Test rate limiting and Idempotency-Key support on attendance marking
+"""
+import asyncio
+
+from app import crud
+from app.config import settings
+from app.idempotency import IdempotencyStore, StoredResponse
+from app.rate_limit import RateLimiter
+from app.state_backend import MemoryStateBackend, SQLiteStateBackend
+
+
+class TestTokenBucket:
+    """Test the token buckets of the state backends"""
+
+    def test_burst_then_refill(self, tmp_path):
+        """Test a bucket allows `burst` takes, then refills at `rate`"""
+        store = MemoryStateBackend(str(tmp_path / "state"), max_keys=10)
+        assert [store.take("k", rate=2, burst=3, now=100.0) for _ in range(3)] == [0, 0, 0]
+        assert store.take("k", rate=2, burst=3, now=100.0) == 0.5
+        assert store.take("k", rate=2, burst=3, now=100.5) == 0
+
+    def test_keys_are_independent(self, tmp_path):
+        """Test one key's bucket does not drain another's"""
+        store = MemoryStateBackend(str(tmp_path / "state"), max_keys=10)
+        store.take("a", rate=1, burst=1, now=0.0)
+        assert store.take("a", rate=1, burst=1, now=0.0) > 0
+        assert store.take("b", rate=1, burst=1, now=0.0) == 0
+
+    def test_memory_is_bounded(self, tmp_path):
+        """Test only max_keys buckets are kept, least recently used evicted"""
+        store = MemoryStateBackend(str(tmp_path / "state"), max_keys=2)
+        for key in ("a", "b", "c"):
+            store.take(key, rate=1, burst=1, now=0.0)
+        assert len(store._buckets) == 2
+        # "a" was evicted, so it starts from a full bucket again
+        assert store.take("a", rate=1, burst=1, now=0.0) == 0
+
+    def test_sqlite_store_is_shared(self, tmp_path):
+        """Test two store instances on one file draw from the same bucket"""
+        path = str(tmp_path / "state.db")
+        worker_a = RateLimiter(SQLiteStateBackend(path, max_keys=10), rate=0.001, burst=2)
+        worker_b = RateLimiter(SQLiteStateBackend(path, max_keys=10), rate=0.001, burst=2)
+        assert asyncio.run(worker_a.check("k")) == 0
+        assert asyncio.run(worker_b.check("k")) == 0
+        assert asyncio.run(worker_a.check("k")) > 0
+
+    def test_sqlite_store_trims_to_max_keys(self, tmp_path):
+        """Test the shared table is trimmed back to max_keys"""
+        store = SQLiteStateBackend(str(tmp_path / "state.db"), max_keys=5)
+        for i in range(store.TRIM_EVERY):
+            store.take(f"k{i}", rate=1, burst=1, now=float(i))
+        assert store._conn.execute("SELECT COUNT(*) FROM buckets").fetchone()[0] == 5
+
+
+class TestMarkRateLimit:
+    """Test POST /attendance/mark is rate limited"""
+
+    def test_student_retries_get_429(self, client, sample_student, active_poll):
+        """Test a student past their burst is refused with Retry-After"""
+        body = {"student_id": sample_student.id, "poll_id": active_poll.id}
+        statuses = [client.post("/attendance/mark", json=body).status_code for _ in range(int(settings.RATE_LIMIT_STUDENT_BURST) + 1)]
+        assert statuses[:-1] == [200] * int(settings.RATE_LIMIT_STUDENT_BURST)
+        assert statuses[-1] == 429
+
+        response = client.post("/attendance/mark", json=body)
+        assert response.status_code == 429
+        assert int(response.headers["retry-after"]) >= 1
+
+    def test_limited_request_skips_database(self, client, sample_student, active_poll, query_counter, monkeypatch):
+        """Test a refused request runs no queries"""
+        monkeypatch.setattr("app.routers.attendance.student_limiter.burst", 1)
+        body = {"student_id": sample_student.id, "poll_id": active_poll.id}
+        client.post("/attendance/mark", json=body)
+        query_counter.clear()
+        assert client.post("/attendance/mark", json=body).status_code == 429
+        assert query_counter == []
+
+    def test_refused_student_retries_do_not_drain_client(self, client, sample_students, active_poll, monkeypatch):
+        """Test retries refused by a student's bucket leave the shared client bucket alone"""
+        # Room for the student's burst and for two other students
+        burst = int(settings.RATE_LIMIT_STUDENT_BURST)
+        monkeypatch.setattr("app.routers.attendance.client_limiter.burst", burst + 2)
+        monkeypatch.setattr("app.routers.attendance.client_limiter.rate", 0.001)
+        retries = {"student_id": sample_students[0].id, "poll_id": active_poll.id}
+        statuses = [client.post("/attendance/mark", json=retries).status_code for _ in range(burst + 3)]
+        assert statuses[burst:] == [429] * 3
+
+        others = [
+            client.post("/attendance/mark", json={"student_id": s.id, "poll_id": active_poll.id}).status_code
+            for s in sample_students[1:]
+        ]
+        assert others == [200, 200]
+
+    def test_disabled(self, client, sample_student, active_poll, monkeypatch):
+        """Test RATE_LIMIT_ENABLED=false lets every request through"""
+        monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
+        body = {"student_id": sample_student.id, "poll_id": active_poll.id}
+        for _ in range(int(settings.RATE_LIMIT_STUDENT_BURST) + 3):
+            assert client.post("/attendance/mark", json=body).status_code == 200
+
+
+class TestIdempotencyKey:
+    """Test Idempotency-Key on POST /attendance/mark"""
+
+    def test_retry_replays_first_response(self, client, sample_student, active_poll, monkeypatch):
+        """Test a retry gets the stored response without calling crud.mark_attendance"""
+        body = {"student_id": sample_student.id, "poll_id": active_poll.id}
+        headers = {"Idempotency-Key": "phone-1-attempt"}
+        first = client.post("/attendance/mark", json=body, headers=headers)
+        assert first.status_code == 200
+
+        def fail(*args, **kwargs):
+            raise AssertionError("retry reached crud.mark_attendance")
+        monkeypatch.setattr(crud, "mark_attendance", fail)
+
+        for _ in range(10):
+            retry = client.post("/attendance/mark", json=body, headers=headers)
+            assert retry.status_code == 200
+            assert retry.content == first.content
+            assert retry.headers["idempotent-replayed"] == "true"
+
+    def test_replay_skips_database_and_rate_limit(self, client, sample_student, active_poll, query_counter):
+        """Test replays run no queries and are not rate limited"""
+        body = {"student_id": sample_student.id, "poll_id": active_poll.id}
+        headers = {"Idempotency-Key": "k1"}
+        client.post("/attendance/mark", json=body, headers=headers)
+        query_counter.clear()
+        for _ in range(int(settings.RATE_LIMIT_STUDENT_BURST) * 2):
+            assert client.post("/attendance/mark", json=body, headers=headers).status_code == 200
+        assert query_counter == []
+
+    def test_key_reused_for_different_request(self, client, sample_students, active_poll):
+        """Test a key sent with a different body is rejected"""
+        headers = {"Idempotency-Key": "shared"}
+        client.post("/attendance/mark", json={"student_id": sample_students[0].id, "poll_id": active_poll.id}, headers=headers)
+        response = client.post(
+            "/attendance/mark", json={"student_id": sample_students[1].id, "poll_id": active_poll.id}, headers=headers
+        )
+        assert response.status_code == 422
+
+    def test_errors_are_not_stored(self, client, sample_student, active_poll):
+        """Test a failed attempt can be retried under the same key"""
+        headers = {"Idempotency-Key": "after-404"}
+        body = {"student_id": 999999, "poll_id": active_poll.id}
+        assert client.post("/attendance/mark", json=body, headers=headers).status_code == 404
+        retry = client.post("/attendance/mark", json=body, headers=headers)
+        assert retry.status_code == 404
+        assert "idempotent-replayed" not in retry.headers
+
+    def test_memory_store_is_bounded(self, tmp_path):
+        """Test only max_keys responses are kept and expired ones are dropped"""
+        store = IdempotencyStore(MemoryStateBackend(str(tmp_path / "state"), max_keys=2))
+        for key in ("a", "b", "c"):
+            asyncio.run(store.put(key, StoredResponse("f", 200, b"{}", expires_at=float("inf"))))
+        assert asyncio.run(store.get("a")) is None
+        assert asyncio.run(store.get("c")) is not None
+
+        asyncio.run(store.put("old", StoredResponse("f", 200, b"{}", expires_at=0.0)))
+        assert asyncio.run(store.get("old")) is None
+
+    def test_sqlite_store_first_response_wins(self, tmp_path):
+        """Test workers sharing the file agree on the first stored response"""
+
+        path = str(tmp_path / "state.db")
+        worker_a = IdempotencyStore(SQLiteStateBackend(path, max_keys=10))
+        worker_b = IdempotencyStore(SQLiteStateBackend(path, max_keys=10))
+        asyncio.run(worker_a.put("k", StoredResponse("f", 200, b'{"a":1}', expires_at=float("inf"))))
+        assert asyncio.run(worker_b.put("k", StoredResponse("f", 200, b'{"b":1}', expires_at=float("inf")))).body == b'{"a":1}'
+        assert asyncio.run(worker_b.get("k")).body == b'{"a":1}'
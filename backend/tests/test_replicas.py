@@ -0,0 +1,175 @@
+"""
+Test read-replica routing of the read-only endpoints
+"""
+import asyncio
+import sqlite3
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+from starlette.requests import Request
+
+from app.database import (
+    READ_YOUR_WRITES_HEADER, ReadSessionRouter, async_database_url, configure_sqlite,
+    create_replica_sessionmaker, get_async_read_db
+)
+from app.main import app
+from app.poll_cache import PollCache
+from app.state_backend import MemoryStateBackend
+from tests.conftest import SQLALCHEMY_DATABASE_URL, TestingAsyncSessionLocal
+
+PRIMARY_PATH = make_url(SQLALCHEMY_DATABASE_URL).database
+
+
+def read_only_url(path: str) -> str:
+    return f"sqlite:///file:{path}?mode=ro&uri=true"
+
+
+def snapshot_replica(path: str) -> str:
+    """Copy the primary as it is now, like a replica that stops replicating"""
+    with sqlite3.connect(PRIMARY_PATH) as primary, sqlite3.connect(path) as replica:
+        primary.backup(replica)
+        # A read-only connection cannot create the -shm file a WAL database needs
+        replica.execute("PRAGMA journal_mode=DELETE")
+    return read_only_url(path)
+
+
+def replica_sessions(url: str) -> async_sessionmaker:
+    # TestClient runs each request on a fresh event loop, so don't pool
+    engine = create_async_engine(async_database_url(url), poolclass=NullPool)
+    configure_sqlite(engine.sync_engine, read_only=True)
+    return async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+
+def _create_student(client, roll_no):
+    return client.post("/students/", json={"name": roll_no, "roll_no": roll_no, "department": "CS"}).json()
+
+
+def _request(pinned_until=""):
+    headers = [(READ_YOUR_WRITES_HEADER.lower().encode(), pinned_until.encode())] if pinned_until else []
+    return Request({"type": "http", "headers": headers})
+
+
+@pytest.fixture
+def use_replica():
+    """Route read-only handlers to the replica at the given URL"""
+    def route(url):
+        app.dependency_overrides[get_async_read_db] = ReadSessionRouter(
+            TestingAsyncSessionLocal, [replica_sessions(url)]
+        )
+    return route
+
+
+class TestReadRouting:
+    """Test which database the read-only handlers use"""
+
+    def test_reads_go_to_replica(self, client, use_replica, tmp_path):
+        """Test lists and details come from the replica, writes from the primary"""
+        first = _create_student(client, "CS001")
+        use_replica(snapshot_replica(str(tmp_path / "replica.db")))
+        second = _create_student(client, "CS002")
+        assert second["id"] != first["id"]
+
+        assert [s["roll_no"] for s in client.get("/students/").json()] == ["CS001"]
+        assert client.get(f"/students/{first['id']}").status_code == 200
+        assert client.get(f"/students/{second['id']}").status_code == 404
+
+    def test_mark_pins_client_to_primary(self, client, use_replica, tmp_path):
+        """Test a client that just marked reads its own writes, while others read the replica"""
+        student = _create_student(client, "CS001")
+        use_replica(snapshot_replica(str(tmp_path / "replica.db")))
+        poll = client.post("/attendance/start", json={"duration_minutes": 5}).json()
+        assert client.get("/attendance/logs").json() == []
+
+        mark = client.post("/attendance/mark", json={"student_id": student["id"], "poll_id": poll["id"]})
+        pinned = {READ_YOUR_WRITES_HEADER: mark.headers[READ_YOUR_WRITES_HEADER]}
+        assert not mark.cookies
+        assert [p["id"] for p in client.get("/attendance/logs", headers=pinned).json()] == [poll["id"]]
+        assert client.get(f"/attendance/logs/{poll['id']}", headers=pinned).json()["present_count"] == 1
+        history = client.get(f"/attendance/student/{student['id']}", headers=pinned).json()
+        assert [record["poll_id"] for record in history] == [poll["id"]]
+
+        # Cached replica responses are never served to the pinned client, nor
+        # primary responses to everyone else
+        assert client.get("/attendance/logs").json() == []
+
+    def test_pin_header_exposed_cross_origin(self, client, sample_student, active_poll):
+        """Test a browser on another origin can read the pin from a mark's response"""
+        from app.config import settings
+
+        mark = client.post(
+            "/attendance/mark",
+            json={"student_id": sample_student.id, "poll_id": active_poll.id},
+            headers={"Origin": settings.cors_origins_list[0]}
+        )
+        exposed = mark.headers["access-control-expose-headers"].lower().split(",")
+        assert READ_YOUR_WRITES_HEADER.lower() in [header.strip() for header in exposed]
+
+    def test_replica_responses_expire_after_lag_window(self, client, use_replica, tmp_path, monkeypatch):
+        """Test a lagging replica response is rebuilt once the replica can have caught up"""
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "READ_YOUR_WRITES_SECONDS", 0.2)
+        replica = tmp_path / "replica.db"
+        use_replica(snapshot_replica(str(replica)))
+        _create_student(client, "CS001")
+        assert client.get("/students/").json() == []
+
+        # The replica catches up; the lagging copy is kept only for the window
+        snapshot_replica(str(replica))
+        assert client.get("/students/").json() == []
+        time.sleep(0.25)
+        assert [s["roll_no"] for s in client.get("/students/").json()] == ["CS001"]
+
+    def test_read_only_uri_on_live_database(self, client, use_replica):
+        """Test a mode=ro connection to the primary file sees every commit"""
+        use_replica(read_only_url(PRIMARY_PATH))
+        _create_student(client, "CS001")
+        assert [s["roll_no"] for s in client.get("/students/").json()] == ["CS001"]
+
+    def test_replica_rejects_writes(self, db_session):
+        """Test replica sessions are read-only"""
+        sessions = create_replica_sessionmaker(read_only_url(PRIMARY_PATH))
+
+        async def write():
+            try:
+                async with sessions() as db:
+                    await db.execute(text("DELETE FROM students"))
+            finally:
+                await sessions.kw["bind"].dispose()
+
+        with pytest.raises(OperationalError, match="readonly"):
+            asyncio.run(write())
+
+
+class TestReadSessionRouter:
+    """Test replica selection"""
+
+    def test_round_robin_and_pinning(self):
+        """Test replicas take turns unless the read-your-writes header is live"""
+        router = ReadSessionRouter("primary", ["a", "b"])
+        assert [router.choose(_request()) for _ in range(3)] == ["a", "b", "a"]
+        assert router.choose(_request("9999999999")) is None
+        assert router.choose(_request("1")) == "b"
+        assert router.choose(_request("junk")) == "a"
+
+    def test_no_replicas_reads_primary(self):
+        """Test the primary serves reads when no replica is configured"""
+        assert ReadSessionRouter("primary", []).choose(_request()) is None
+
+    def test_replica_loads_are_not_cached(self, tmp_path):
+        """Test polls loaded from a replica are served but not cached"""
+        cache = PollCache(MemoryStateBackend(str(tmp_path / "state"), max_keys=10))
+        loads = []
+
+        def load():
+            loads.append(1)
+            return None
+
+        cache.get_active(None, load, store=False)
+        cache.get_active(None, load, store=False)
+        assert len(loads) == 2
@@ -0,0 +1,196 @@
+"""
+Test the ETag response cache
+"""
+import time
+from datetime import datetime, timedelta
+
+from app import crud
+from app.models import AttendancePoll
+from app.response_cache import CachedResponse, ResponseCache
+from app.state_backend import MemoryStateBackend
+
+
+class TestConditionalGet:
+    """Test ETags and 304 responses on cached read endpoints"""
+
+    def test_students_list_has_strong_etag(self, client, sample_students):
+        """Test list responses carry a quoted, non-weak ETag"""
+        response = client.get("/students/")
+        assert response.status_code == 200
+        etag = response.headers["etag"]
+        assert etag.startswith('"') and etag.endswith('"')
+        assert len(response.json()) == len(sample_students)
+
+    def test_if_none_match_returns_304(self, client, sample_students):
+        """Test a matching If-None-Match is answered without a body"""
+        etag = client.get("/students/").headers["etag"]
+        response = client.get("/students/", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
+    def test_stale_etag_returns_body(self, client, sample_students):
+        """Test a non-matching If-None-Match gets the full response"""
+        response = client.get("/students/", headers={"If-None-Match": '"stale"'})
+        assert response.status_code == 200
+        assert len(response.json()) == len(sample_students)
+
+    def test_cached_response_skips_database(self, client, sample_students, query_counter):
+        """Test a repeated request is served from memory"""
+        first = client.get("/students/?limit=2")
+        query_counter.clear()
+        second = client.get("/students/?limit=2")
+        assert second.content == first.content
+        assert second.headers["x-next-cursor"] == first.headers["x-next-cursor"]
+        assert query_counter == []
+
+    def test_query_params_are_part_of_key(self, client, sample_students):
+        """Test different parameters are cached separately"""
+        assert len(client.get("/students/?limit=1").json()) == 1
+        assert len(client.get("/students/?limit=2").json()) == 2
+
+
+class TestInvalidation:
+    """Test writes invalidate dependent responses"""
+
+    def test_create_student_invalidates_list(self, client, sample_student):
+        """Test a new student appears in a previously cached list"""
+        etag = client.get("/students/").headers["etag"]
+        client.post("/students/", json={"name": "New", "roll_no": "NEW001", "department": "CS"})
+
+        response = client.get("/students/", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert len(response.json()) == 2
+
+    def test_mark_invalidates_open_poll_log(self, client, sample_student, active_poll):
+        """Test marking attendance is visible in the poll log immediately"""
+        student_id, poll_id = sample_student.id, active_poll.id
+        assert client.get(f"/attendance/logs/{poll_id}").json()["present_count"] == 0
+
+        client.post("/attendance/mark", json={"student_id": student_id, "poll_id": poll_id})
+        assert client.get(f"/attendance/logs/{poll_id}").json()["present_count"] == 1
+
+    def test_start_poll_invalidates_poll_list(self, client):
+        """Test a new poll appears in a previously cached poll list"""
+        assert client.get("/attendance/logs").json() == []
+        client.post("/attendance/start", json={"duration_minutes": 5})
+        assert len(client.get("/attendance/logs").json()) == 1
+
+    def test_rollback_does_not_invalidate(self, client, db_session, sample_students, query_counter):
+        """Test a rolled-back write keeps cached responses"""
+        client.get("/students/")
+        sample_students[0].name = "Renamed"
+        db_session.flush()
+        db_session.rollback()
+
+        query_counter.clear()
+        client.get("/students/")
+        assert query_counter == []
+
+    def test_closed_poll_log_ignores_record_writes(self, client, db_session, sample_student, query_counter):
+        """Test a closed poll's log stays cached across attendance writes elsewhere"""
+        closed = AttendancePoll(
+            start_time=datetime.utcnow() - timedelta(hours=2),
+            end_time=datetime.utcnow() - timedelta(hours=1),
+            duration_minutes=60,
+            is_active=False
+        )
+        db_session.add(closed)
+        db_session.commit()
+        poll_id = closed.id
+        client.get(f"/attendance/logs/{poll_id}")
+
+        poll = client.post("/attendance/start", json={"duration_minutes": 5}).json()
+        client.post("/attendance/mark", json={"student_id": sample_student.id, "poll_id": poll["id"]})
+
+        query_counter.clear()
+        assert client.get(f"/attendance/logs/{poll_id}").json()["present_count"] == 0
+        # Starting a poll reloads the poll snapshot, but the log itself is not rebuilt
+        assert not any("attendance_records" in sql for sql in query_counter)
+
+    def test_closed_poll_log_sees_late_records(self, client, db_session, sample_student):
+        """Test records replayed into a closed poll invalidate its long-lived log"""
+        closed = AttendancePoll(
+            start_time=datetime.utcnow() - timedelta(hours=2),
+            end_time=datetime.utcnow() - timedelta(hours=1),
+            duration_minutes=60,
+            is_active=False
+        )
+        db_session.add(closed)
+        db_session.commit()
+        poll_id = closed.id
+        assert client.get(f"/attendance/logs/{poll_id}").json()["present_count"] == 0
+
+        crud.insert_attendance_records(db_session, [
+            {"student_id": sample_student.id, "poll_id": poll_id, "marked_at": datetime.utcnow() - timedelta(hours=1)}
+        ])
+        assert client.get(f"/attendance/logs/{poll_id}").json()["present_count"] == 1
+
+    def test_closed_poll_log_follows_roster(self, client, db_session, sample_student):
+        """Test a closed poll's log still reflects roster changes"""
+        closed = AttendancePoll(
+            start_time=datetime.utcnow() - timedelta(hours=2),
+            end_time=datetime.utcnow() - timedelta(hours=1),
+            duration_minutes=60,
+            is_active=False
+        )
+        db_session.add(closed)
+        db_session.commit()
+        poll_id = closed.id
+        crud.insert_attendance_records(db_session, [
+            {"student_id": sample_student.id, "poll_id": poll_id, "marked_at": closed.start_time}
+        ])
+        assert client.get(f"/attendance/logs/{poll_id}").json()["records"][0]["student_name"] == "John Doe"
+
+        client.put(f"/students/{sample_student.id}", json={"name": "Jane Doe"})
+        assert client.get(f"/attendance/logs/{poll_id}").json()["records"][0]["student_name"] == "Jane Doe"
+
+
+class TestResponseCacheBounds:
+    """Test the LRU and TTL bounds"""
+
+    def _entry(self, cache, body=b"{}", ttl=60.0):
+        return CachedResponse(
+            body=body,
+            etag='"x"',
+            headers={},
+            generation=cache.generation(("t",)),
+            expires_at=time.monotonic() + ttl
+        )
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        """Test the oldest untouched entry is evicted past max_entries"""
+        cache = ResponseCache(MemoryStateBackend(str(tmp_path / "state"), max_keys=10), max_entries=2, max_bytes=1 << 20)
+        generation = cache.generation(("t",))
+        cache.put("a", self._entry(cache))
+        cache.put("b", self._entry(cache))
+        assert cache.get("a", generation) is not None
+        cache.put("c", self._entry(cache))
+
+        assert cache.get("b", generation) is None
+        assert cache.get("a", generation) is not None
+        assert cache.get("c", generation) is not None
+
+    def test_evicts_past_max_bytes(self, tmp_path):
+        """Test total body size is bounded"""
+        cache = ResponseCache(MemoryStateBackend(str(tmp_path / "state"), max_keys=10), max_entries=100, max_bytes=10)
+        generation = cache.generation(("t",))
+        cache.put("a", self._entry(cache, body=b"123456"))
+        cache.put("b", self._entry(cache, body=b"123456"))
+        assert cache.get("a", generation) is None
+        assert cache.get("b", generation) is not None
+
+    def test_expired_entry_misses(self, tmp_path):
+        """Test entries past their TTL are not served"""
+        cache = ResponseCache(MemoryStateBackend(str(tmp_path / "state"), max_keys=10), max_entries=10, max_bytes=1 << 20)
+        cache.put("a", self._entry(cache, ttl=-1))
+        assert cache.get("a", cache.generation(("t",))) is None
+
+    def test_invalidation_is_shared_through_backend(self, tmp_path):
+        """Test another cache instance's invalidation makes entries stale"""
+        cache = ResponseCache(MemoryStateBackend(str(tmp_path / "state"), max_keys=10), max_entries=10, max_bytes=1 << 20)
+        other_worker = ResponseCache(MemoryStateBackend(str(tmp_path / "state"), max_keys=10), max_entries=10, max_bytes=1 << 20)
+        cache.put("a", self._entry(cache))
+
+        other_worker.invalidate(["t"])
+        assert cache.get("a", cache.generation(("t",))) is None
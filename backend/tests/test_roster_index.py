@@ -0,0 +1,180 @@
+"""
+Test the in-memory roster index and its consistency with the students table
+"""
+import asyncio
+import json
+import re
+import threading
+
+from app import crud
+from app.config import settings
+from app.roster_index import BYTES_PER_STUDENT_BUDGET, VERSION_NAMES, RosterEntry, RosterIndex, _Roster, roster_index
+from app.state_backend import MemoryStateBackend, SQLiteStateBackend
+
+
+def _rows(count):
+    return [(i, f"Student {i}", f"CS{i:06d}") for i in range(1, count + 1)]
+
+
+class TestRoster:
+    """Test the arrays behind the index"""
+
+    def test_bytes_per_student_within_budget(self):
+        """Test 100k students fit in the documented budget"""
+        roster = _Roster.build(_rows(100_000))
+        assert len(roster) == 100_000
+        assert roster.nbytes / len(roster) < BYTES_PER_STUDENT_BUDGET
+        assert roster.get(54_321) == RosterEntry(54_321, "Student 54321", "CS054321")
+
+    def test_put_rename_remove(self):
+        """Test lookups by id and roll_no follow renames and deletions"""
+        roster = _Roster.build(_rows(3))
+        roster.put(2, "Zoë Renamed", "EE000002")
+        assert roster.get(2) == RosterEntry(2, "Zoë Renamed", "EE000002")
+        assert roster.get_by_roll_no("EE000002").id == 2
+        assert roster.get_by_roll_no("CS000002") is None
+
+        roster.remove(1)
+        assert roster.get(1) is None and roster.get_by_roll_no("CS000001") is None
+        roster.put(10, "New", "CS000001")
+        assert roster.get_by_roll_no("CS000001").id == 10
+        assert roster.get(99) is None and len(roster) == 3
+
+    def test_roll_no_swap_within_one_commit(self):
+        """Test a roll_no taken over before its old owner is renamed stays with the new owner"""
+        roster = _Roster.build(_rows(2))
+        roster.put(2, "Student 2", "CS000001")
+        roster.put(1, "Student 1", "CS000002")
+        assert roster.get_by_roll_no("CS000001").id == 2
+        assert roster.get_by_roll_no("CS000002").id == 1
+
+    def test_churn_compacts_strings(self):
+        """Test repeated renames neither lose students nor grow the strings without bound"""
+        roster = _Roster.build(_rows(100))
+        for round in range(200):
+            for student_id in range(1, 101):
+                roster.put(student_id, f"Name {round}", f"R{student_id:04d}")
+        assert roster.get_by_roll_no("R0042") == RosterEntry(42, "Name 199", "R0042")
+        assert len(roster.data) < 2 * 100 * len("Name 199R0042") + 4096
+
+
+class TestRosterIndex:
+    """Test the index stays in sync with the students table"""
+
+    def test_api_writes_update_index(self, client, db_session):
+        """Test create, update and delete are applied without reloading the roster"""
+        roster_index.refresh(lambda: crud.get_roster_rows(db_session))
+        created = client.post("/students/", json={"name": "Ann", "roll_no": "A1", "department": "CS"}).json()
+        assert roster_index.get(created["id"]) == RosterEntry(created["id"], "Ann", "A1")
+        client.put(f"/students/{created['id']}", json={"name": "Ann B"})
+        assert roster_index.get(created["id"]).name == "Ann B"
+        client.delete(f"/students/{created['id']}")
+        assert roster_index.get(created["id"]) is None
+        assert roster_index.get_by_roll_no("A1") is None
+
+    def test_mark_issues_no_students_query(self, client, db_session, sample_student, active_poll, query_counter):
+        """Test a mark validates its student against the index"""
+        roster_index.refresh(lambda: crud.get_roster_rows(db_session))
+        client.post("/attendance/mark", json={"student_id": sample_student.id, "poll_id": active_poll.id})
+        query_counter.clear()
+        other = client.post("/students/", json={"name": "Bo", "roll_no": "B1", "department": "CS"}).json()
+        query_counter.clear()
+
+        response = client.post("/attendance/mark", json={"student_id": other["id"], "poll_id": active_poll.id})
+        assert response.status_code == 200
+        assert (response.json()["student_name"], response.json()["student_roll_no"]) == ("Bo", "B1")
+        # The stats rollup still reads the student's registration time
+        lookups = [s for s in query_counter if s.lstrip().startswith("SELECT")]
+        assert not [s for s in lookups if re.search(r"\bstudents\b", s)]
+
+        missing = client.post("/attendance/mark", json={"student_id": 9999, "poll_id": active_poll.id})
+        assert missing.status_code == 404
+
+    def test_bulk_import_falls_back_to_table(self, client, db_session, sample_student):
+        """Test students written by bulk statements are found while the index is stale"""
+        roster_index.refresh(lambda: crud.get_roster_rows(db_session))
+        content = "name,roll_no,department\nImported,IMP1,CS\n"
+        client.post("/students/import", files={"file": ("roster.csv", content.encode(), "text/csv")})
+        imported = crud.get_student_by_roll_no(db_session, "IMP1")
+        assert roster_index.get(imported.id) is None
+        assert crud.get_roster_entry(db_session, imported.id) == RosterEntry(imported.id, "Imported", "IMP1")
+        assert crud.get_roster_entry(db_session, sample_student.id).roll_no == sample_student.roll_no
+
+    def test_changes_during_reload_are_kept(self, tmp_path):
+        """Test a change that arrives while the roster loads is applied to the new roster"""
+        index = RosterIndex(MemoryStateBackend(str(tmp_path / "state"), max_keys=10))
+        message = json.dumps({"origin": "other", "changes": [[2, "Renamed", "CS000002"], [3, "New", "CS000003"]]})
+
+        def load():
+            index.receive(message)
+            return _rows(2)
+
+        index.refresh(load)
+        assert index.get(2).name == "Renamed"
+        assert index.get(3) == RosterEntry(3, "New", "CS000003") and len(index) == 3
+
+
+class TestOtherWorkers:
+    """Test changes made by other workers sharing the state backend"""
+
+    async def _until(self, predicate):
+        for _ in range(200):
+            if predicate():
+                return
+            await asyncio.sleep(0.01)
+        raise AssertionError("timed out")
+
+    def test_row_changes_applied_without_reload(self, tmp_path, monkeypatch):
+        """Test a student added or renamed by another worker is applied in place"""
+        monkeypatch.setattr(settings, "STATE_SUBSCRIBE_INTERVAL_SECONDS", 0.01)
+        path = str(tmp_path / "state.db")
+        mine = RosterIndex(SQLiteStateBackend(path, max_keys=10))
+        theirs = RosterIndex(SQLiteStateBackend(path, max_keys=10))
+        loads = []
+
+        def load():
+            loads.append(1)
+            return _rows(2)
+
+        async def scenario():
+            await mine.start(load)
+            try:
+                theirs.apply([(1, "Renamed", "CS000001"), (3, "New", "CS000003")], complete=True)
+                await self._until(lambda: mine.get(3) is not None)
+                assert mine.get(1).name == "Renamed"
+            finally:
+                await mine.stop()
+
+        asyncio.run(scenario())
+        assert len(loads) == 1
+
+    def test_bulk_change_reloads_in_background(self, tmp_path, monkeypatch):
+        """Test a bulk change elsewhere reloads the roster off the caller's path"""
+        monkeypatch.setattr(settings, "STATE_SUBSCRIBE_INTERVAL_SECONDS", 0.01)
+        path = str(tmp_path / "state.db")
+        mine = RosterIndex(SQLiteStateBackend(path, max_keys=10))
+        theirs = RosterIndex(SQLiteStateBackend(path, max_keys=10))
+        rows = _rows(2)
+        loaded = threading.Event()
+        release = threading.Event()
+
+        def load():
+            if loaded.is_set():
+                release.wait(5)
+            loaded.set()
+            return list(rows)
+
+        async def scenario():
+            await mine.start(load)
+            try:
+                rows[0] = (1, "Bulk", "CS000001")
+                theirs.backend.bump(VERSION_NAMES)
+                # Stale: lookups return at once and callers read the table
+                assert mine.get(1) is None and mine.get(2) is None
+                release.set()
+                await self._until(lambda: mine.get(1) is not None)
+                assert mine.get(1).name == "Bulk"
+            finally:
+                await mine.stop()
+
+        asyncio.run(scenario())
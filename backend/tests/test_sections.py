@@ -0,0 +1,189 @@
+"""
+Test courses, sections, enrollments and per-section polls
+"""
+from app import models
+from app.analytics import attendance_analytics
+
+
+def _section(client, code="CS101", name="A"):
+    course = client.post("/courses/", json={"code": code, "title": "Intro"}).json()
+    return client.post(f"/courses/{course['id']}/sections", json={"name": name}).json()
+
+
+def _enroll(client, section, students):
+    return client.post(
+        f"/sections/{section['id']}/enrollments",
+        json={"student_ids": [student.id for student in students]}
+    )
+
+
+def _start(client, section=None):
+    payload = {"duration_minutes": 5}
+    if section is not None:
+        payload["section_id"] = section["id"]
+    return client.post("/attendance/start", json=payload).json()
+
+
+class TestCourses:
+    """Test the course and section endpoints"""
+
+    def test_create_course_and_sections(self, client):
+        """Test sections are listed under their course"""
+        section = _section(client)
+        course_id = section["course_id"]
+        assert client.get(f"/courses/{course_id}").json()["code"] == "CS101"
+        assert [s["name"] for s in client.get(f"/courses/{course_id}/sections").json()] == ["A"]
+        assert client.get(f"/sections/{section['id']}").json()["name"] == "A"
+
+    def test_duplicate_course_code_rejected(self, client):
+        """Test course codes are unique"""
+        client.post("/courses/", json={"code": "CS101", "title": "Intro"})
+        response = client.post("/courses/", json={"code": "CS101", "title": "Again"})
+        assert response.status_code == 400
+
+    def test_duplicate_section_name_rejected(self, client):
+        """Test section names are unique within a course"""
+        section = _section(client)
+        response = client.post(f"/courses/{section['course_id']}/sections", json={"name": "A"})
+        assert response.status_code == 400
+
+    def test_unknown_course_and_section(self, client):
+        """Test missing courses and sections return 404"""
+        assert client.get("/courses/999").status_code == 404
+        assert client.post("/courses/999/sections", json={"name": "A"}).status_code == 404
+        assert client.get("/sections/999/students").status_code == 404
+        assert client.post("/attendance/start", json={"duration_minutes": 5, "section_id": 999}).status_code == 404
+
+
+class TestEnrollments:
+    """Test section rosters"""
+
+    def test_enroll_skips_duplicates_and_unknown_students(self, client, sample_students):
+        """Test only new, existing students are reported as enrolled"""
+        section = _section(client)
+        first = _enroll(client, section, sample_students[:2]).json()
+        assert first["enrolled"] == [sample_students[0].id, sample_students[1].id]
+
+        response = client.post(
+            f"/sections/{section['id']}/enrollments",
+            json={"student_ids": [sample_students[1].id, sample_students[2].id, 999]}
+        )
+        assert response.json()["enrolled"] == [sample_students[2].id]
+
+    def test_roster_is_paged(self, client, sample_students):
+        """Test the roster follows the cursor"""
+        section = _section(client)
+        _enroll(client, section, sample_students)
+        first = client.get(f"/sections/{section['id']}/students?limit=2")
+        assert [s["roll_no"] for s in first.json()] == ["CS001", "CS002"]
+        rest = client.get(f"/sections/{section['id']}/students?limit=2&cursor={first.headers['x-next-cursor']}")
+        assert [s["roll_no"] for s in rest.json()] == ["EC001"]
+        assert client.get(f"/sections/{section['id']}/students?cursor=not-a-cursor").status_code == 400
+
+    def test_unenroll(self, client, sample_student):
+        """Test a student can be removed from a roster once"""
+        section = _section(client)
+        _enroll(client, section, [sample_student])
+        url = f"/sections/{section['id']}/enrollments/{sample_student.id}"
+        assert client.delete(url).status_code == 204
+        assert client.delete(url).status_code == 404
+        assert client.get(f"/sections/{section['id']}/students").json() == []
+
+    def test_deleting_student_removes_enrollments(self, client, db_session, sample_student):
+        """Test enrollments cascade with their student"""
+        section = _section(client)
+        _enroll(client, section, [sample_student])
+        assert client.delete(f"/students/{sample_student.id}").status_code == 204
+        assert db_session.query(models.Enrollment).count() == 0
+
+
+class TestSectionPolls:
+    """Test many concurrent active polls, one per section"""
+
+    def test_sections_have_independent_active_polls(self, client):
+        """Test starting a poll only replaces the same section's poll"""
+        a, b = _section(client, name="A"), _section(client, code="CS102", name="B")
+        poll_a = _start(client, a)
+        poll_b = _start(client, b)
+        campus = _start(client)
+
+        assert client.get(f"/attendance/current?section_id={a['id']}").json()["poll_id"] == poll_a["id"]
+        assert client.get(f"/attendance/current?section_id={b['id']}").json()["poll_id"] == poll_b["id"]
+        assert client.get("/attendance/current").json()["poll_id"] == campus["id"]
+
+        replacement = _start(client, a)
+        assert client.get(f"/attendance/current?section_id={a['id']}").json()["poll_id"] == replacement["id"]
+        assert client.get(f"/attendance/current?section_id={b['id']}").json()["poll_id"] == poll_b["id"]
+        assert client.get("/attendance/current").json()["poll_id"] == campus["id"]
+
+    def test_student_current_polls(self, client, sample_students):
+        """Test a student sees the campus poll and their own sections' polls"""
+        a, b = _section(client, name="A"), _section(client, code="CS102", name="B")
+        _enroll(client, a, sample_students[:1])
+        poll_a = _start(client, a)
+        _start(client, b)
+        campus = _start(client)
+
+        polls = client.get(f"/attendance/current/student/{sample_students[0].id}").json()
+        assert sorted(p["poll_id"] for p in polls) == sorted([campus["id"], poll_a["id"]])
+        assert {p["section_id"] for p in polls} == {None, a["id"]}
+
+    def test_mark_requires_enrollment(self, client, sample_students):
+        """Test students outside the section cannot mark its poll"""
+        section = _section(client)
+        _enroll(client, section, sample_students[:1])
+        poll = _start(client, section)
+
+        enrolled = client.post("/attendance/mark", json={"student_id": sample_students[0].id, "poll_id": poll["id"]})
+        assert enrolled.status_code == 200
+        outsider = client.post("/attendance/mark", json={"student_id": sample_students[1].id, "poll_id": poll["id"]})
+        assert outsider.status_code == 403
+
+    def test_batch_rejects_unenrolled(self, client, sample_students):
+        """Test batch marking rejects students outside the section"""
+        section = _section(client)
+        _enroll(client, section, sample_students[:1])
+        poll = _start(client, section)
+
+        response = client.post("/attendance/mark/batch", json={"records": [
+            {"student_id": sample_students[0].id, "poll_id": poll["id"]},
+            {"student_id": sample_students[1].id, "poll_id": poll["id"]},
+        ]}).json()
+        assert [r["status"] for r in response["results"]] == ["created", "rejected"]
+
+    def test_section_poll_counts_only_for_roster(self, client, db_session):
+        """Test rollups, logs, absentees and analytics only count enrolled students"""
+        for roll_no in ("CS001", "CS002", "EC001"):
+            client.post("/students/", json={"name": roll_no, "roll_no": roll_no, "department": "CS"})
+        sample_students = db_session.query(models.Student).order_by(models.Student.id).all()
+        section = _section(client)
+        _enroll(client, section, sample_students[:2])
+        poll = _start(client, section)
+        client.post("/attendance/mark", json={"student_id": sample_students[0].id, "poll_id": poll["id"]})
+
+        totals = [client.get(f"/students/{s.id}/stats").json()["total_polls"] for s in sample_students]
+        assert totals == [1, 1, 0]
+        log = client.get(f"/attendance/logs/{poll['id']}").json()
+        assert (log["total_students"], log["present_count"]) == (2, 1)
+        absentees = client.get(f"/attendance/logs/{poll['id']}/absentees").json()
+        assert [s["roll_no"] for s in absentees] == ["CS002"]
+
+        attendance_analytics.invalidate()
+        turnout = client.get("/analytics/turnout").json()
+        assert (turnout[0]["eligible"], turnout[0]["present"]) == (2, 1)
+
+    def test_streaks_skip_other_sections(self, client, sample_students):
+        """Test absence streaks count a student's own polls, not other sections' in between"""
+        mine, other = _section(client, name="A"), _section(client, code="CS102", name="B")
+        _enroll(client, mine, sample_students[:1])
+        _enroll(client, other, sample_students[1:2])
+        for section in (mine, other, mine, other):
+            poll = _start(client, section)
+            if section is other:
+                client.post("/attendance/mark", json={"student_id": sample_students[1].id, "poll_id": poll["id"]})
+
+        attendance_analytics.invalidate()
+        streaks = client.get("/analytics/streaks?min_current=1").json()
+        assert [(s["roll_no"], s["current_absence_streak"], s["longest_absence_streak"]) for s in streaks] == [
+            (sample_students[0].roll_no, 2, 2)
+        ]
@@ -0,0 +1,216 @@
+"""
+Test the shared state backends and their consistency across worker processes
+"""
+import asyncio
+import json
+import multiprocessing
+import time
+
+import pytest
+
+from app import state_backend
+from app.idempotency import IdempotencyStore, StoredResponse
+from app.rate_limit import RateLimiter
+from app.routers.attendance import POLL_EVENTS_CHANNEL
+from app.state_backend import MemoryStateBackend, SQLiteStateBackend, bump_soon, state, subscribe
+
+WORKERS = 8
+BURST = 50
+TAKES_PER_WORKER = 20
+KEYS = 20
+BUMPS_PER_WORKER = 10
+MESSAGES_PER_WORKER = 10
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteStateBackend(str(tmp_path / "state.db"), max_keys=100)
+    return MemoryStateBackend(str(tmp_path / "state"), max_keys=100)
+
+
+class TestBackend:
+    """Test the primitives every backend provides"""
+
+    def test_claim_first_value_wins(self, backend):
+        """Test later claims see the first value until it expires"""
+        assert backend.claim("k", b"a", ttl=60) is None
+        assert backend.claim("k", b"b", ttl=60) == b"a"
+        assert backend.lookup("k") == b"a"
+        assert backend.claim("old", b"a", ttl=-1) is None
+        assert backend.lookup("old") is None
+        assert backend.claim("old", b"b", ttl=60) is None
+
+    def test_bump_changes_only_named_versions(self, backend):
+        """Test a bump is seen in its own version and no other"""
+        before = backend.versions(("a", "b"))
+        backend.bump(["a"])
+        after = backend.versions(("a", "b"))
+        assert after[0] != before[0]
+        assert after[1] == before[1]
+
+    def test_read_returns_messages_after_id(self, backend):
+        """Test readers start from now and then see every message of their channel in order"""
+        backend.publish("c", "early")
+        after, payloads = backend.read("c", None)
+        assert payloads == []
+        backend.publish("c", "one")
+        backend.publish("other", "skipped")
+        backend.publish("c", "two")
+        after, payloads = backend.read("c", after)
+        assert payloads == ["one", "two"]
+        assert backend.read("c", after)[1] == []
+
+    def test_subscribe_yields_published_messages(self, backend):
+        """Test the async subscription delivers messages published after its starting point"""
+        async def scenario():
+            received = []
+            after, _ = backend.read("c", None)
+
+            async def consume():
+                async for payload in subscribe(backend, "c", interval=0.01, after=after):
+                    received.append(payload)
+                    if len(received) == 2:
+                        return
+
+            consumer = asyncio.create_task(consume())
+            backend.publish("c", "one")
+            backend.publish("c", "two")
+            await asyncio.wait_for(consumer, timeout=2)
+            return received
+
+        assert asyncio.run(scenario()) == ["one", "two"]
+
+    def test_sqlite_trims_messages(self, tmp_path, monkeypatch):
+        """Test old messages are trimmed back to the backlog"""
+        monkeypatch.setattr(state_backend, "MAX_CHANNEL_BACKLOG", 10)
+        backend = SQLiteStateBackend(str(tmp_path / "state.db"), max_keys=100)
+        backend.TRIM_EVERY = 50
+        for i in range(120):
+            backend.publish("c", str(i))
+        # Trimmed at the 100th write, then 20 more arrived
+        assert backend._conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0] == 30
+
+
+class TestSQLiteLocking:
+    """Test the event loop never waits for another worker's write lock"""
+
+    @pytest.fixture
+    def locked(self, tmp_path):
+        """A backend, and another worker holding the write lock of its file"""
+        path = str(tmp_path / "state.db")
+        backend = SQLiteStateBackend(path, max_keys=100)
+        other = SQLiteStateBackend(path, max_keys=100)
+        other._conn.execute("BEGIN IMMEDIATE")
+        yield backend, other
+        if other._conn.in_transaction:
+            other._conn.execute("ROLLBACK")
+
+    def test_reads_do_not_wait(self, locked):
+        """Test versions, lookups and reads return while the write lock is taken"""
+        backend, _ = locked
+        start = time.monotonic()
+        assert backend.versions(("polls",)) == (None,)
+        assert backend.lookup("k") is None
+        backend.read("c", None)
+        assert time.monotonic() - start < 1
+
+    def test_bump_soon_runs_off_the_loop(self, locked):
+        """Test a bump from a commit on the event loop leaves the loop free until it lands"""
+        backend, other = locked
+
+        async def scenario():
+            start = time.monotonic()
+            bump_soon(backend, ["polls"])
+            returned_after = time.monotonic() - start
+            await asyncio.sleep(0.2)
+            assert backend.versions(("polls",)) == (None,)
+            other._conn.execute("COMMIT")
+            return returned_after
+
+        assert asyncio.run(scenario()) < 0.1
+        # asyncio.run waits for the executor, so the bump has landed
+        assert backend.versions(("polls",)) == (1,)
+
+
+class TestPollEvents:
+    """Test poll events are published for other workers"""
+
+    def test_start_poll_publishes_event(self, client):
+        """Test starting a poll publishes its id and deadline"""
+        after, _ = state.read(POLL_EVENTS_CHANNEL, None)
+        poll = client.post("/attendance/start", json={"duration_minutes": 5}).json()
+        _, payloads = state.read(POLL_EVENTS_CHANNEL, after)
+        event = json.loads(payloads[-1])
+        assert (event["event"], event["poll_id"], event["section_id"]) == ("started", poll["id"], None)
+        assert event["end_time"].startswith(poll["end_time"][:19])
+
+
+def _worker(path: str, worker: int, start, done, results) -> None:
+    backend = SQLiteStateBackend(path, max_keys=10_000)
+    limiter = RateLimiter(backend, rate=1e-9, burst=BURST)
+    idempotency = IdempotencyStore(backend)
+    after, _ = backend.read("events", None)
+    start.wait()
+
+    granted = sum(asyncio.run(limiter.check("shared")) == 0 for _ in range(TAKES_PER_WORKER))
+    winners = {}
+    for key in range(KEYS):
+        kept = asyncio.run(idempotency.put(str(key), StoredResponse(
+            fingerprint="f", status_code=200, body=str(worker).encode(), expires_at=time.time() + 60
+        )))
+        winners[key] = int(kept.body)
+    for _ in range(BUMPS_PER_WORKER):
+        backend.bump(["polls"])
+    for i in range(MESSAGES_PER_WORKER):
+        backend.publish("events", f"{worker}:{i}")
+
+    done.wait()
+    _, messages = backend.read("events", after)
+    results.put({
+        "worker": worker,
+        "granted": granted,
+        "winners": winners,
+        "seen": {key: int(asyncio.run(idempotency.get(str(key))).body) for key in range(KEYS)},
+        "version": backend.versions(("polls",))[0],
+        "messages": messages,
+    })
+
+
+class TestMultiProcess:
+    """Test workers sharing one SQLite state file behave as one"""
+
+    def test_eight_workers_agree(self, tmp_path):
+        """Test buckets, claims, versions and pub/sub stay consistent across 8 processes"""
+        path = str(tmp_path / "state.db")
+        SQLiteStateBackend(path, max_keys=10_000)
+        context = multiprocessing.get_context("fork")
+        start, done = context.Barrier(WORKERS), context.Barrier(WORKERS)
+        results = context.Queue()
+        processes = [
+            context.Process(target=_worker, args=(path, worker, start, done, results))
+            for worker in range(WORKERS)
+        ]
+        for process in processes:
+            process.start()
+        reports = [results.get(timeout=120) for _ in processes]
+        for process in processes:
+            process.join(timeout=30)
+            assert process.exitcode == 0
+
+        # Exactly `burst` tokens were handed out, however the takes interleaved
+        assert sum(report["granted"] for report in reports) == BURST
+        # Each key has one winner, and every worker was told the same one
+        for key in range(KEYS):
+            winners = {report["winners"][key] for report in reports} | {report["seen"][key] for report in reports}
+            assert len(winners) == 1
+        # No bump was lost and every worker reads the same version
+        assert {report["version"] for report in reports} == {WORKERS * BUMPS_PER_WORKER}
+        # Every worker received every message, each worker's in publish order
+        expected = {f"{worker}:{i}" for worker in range(WORKERS) for i in range(MESSAGES_PER_WORKER)}
+        for report in reports:
+            assert len(report["messages"]) == len(expected)
+            assert set(report["messages"]) == expected
+            for worker in range(WORKERS):
+                mine = [m for m in report["messages"] if m.startswith(f"{worker}:")]
+                assert mine == [f"{worker}:{i}" for i in range(MESSAGES_PER_WORKER)]
@@ -0,0 +1,174 @@
+"""
+Test attendance rollups and stats endpoints
+"""
+from datetime import datetime
+
+from sqlalchemy import delete
+
+from app import crud, models
+from app.migrations import backfill_student_stats
+
+
+def _create_students(client, *specs):
+    return [
+        client.post("/students/", json={"name": name, "roll_no": roll_no, "department": department}).json()["id"]
+        for name, roll_no, department in specs
+    ]
+
+
+def _start_poll(client):
+    return client.post("/attendance/start", json={"duration_minutes": 5}).json()["id"]
+
+
+def _mark(client, student_id, poll_id):
+    response = client.post("/attendance/mark", json={"student_id": student_id, "poll_id": poll_id})
+    assert response.status_code == 200
+
+
+class TestStudentStats:
+    """Test GET /students/{id}/stats"""
+
+    def test_new_student_has_no_percentage(self, client):
+        """Test a student with no polls yet has zero counts and no percentage"""
+        (student_id,) = _create_students(client, ("Ann", "S1", "CS"))
+        response = client.get(f"/students/{student_id}/stats")
+        assert response.status_code == 200
+        assert response.json() == {"student_id": student_id, "attended": 0, "total_polls": 0, "percentage": None}
+
+    def test_marks_and_polls_update_rollup(self, client):
+        """Test each poll counts toward the total and each mark toward attended"""
+        present, absent = _create_students(client, ("Ann", "S1", "CS"), ("Ben", "S2", "CS"))
+        for _ in range(3):
+            poll_id = _start_poll(client)
+        _mark(client, present, poll_id)
+        _mark(client, present, poll_id)  # duplicate mark is not counted twice
+
+        assert client.get(f"/students/{present}/stats").json() == {
+            "student_id": present, "attended": 1, "total_polls": 3, "percentage": 33.33
+        }
+        assert client.get(f"/students/{absent}/stats").json()["percentage"] == 0.0
+
+    def test_poll_before_registration_counts_once_attended(self, client):
+        """Test a poll created before the student registered only counts if they attend it"""
+        poll_id = _start_poll(client)
+        late, later = _create_students(client, ("Late", "S1", "CS"), ("Later", "S2", "CS"))
+        _mark(client, late, poll_id)
+
+        assert client.get(f"/students/{late}/stats").json()["total_polls"] == 1
+        assert client.get(f"/students/{later}/stats").json()["total_polls"] == 0
+
+    def test_batch_and_write_behind_paths_update_rollup(self, client, db_session):
+        """Test marks written in bulk are counted"""
+        first, second = _create_students(client, ("Ann", "S1", "CS"), ("Ben", "S2", "CS"))
+        poll_id = _start_poll(client)
+        client.post("/attendance/mark/batch", json={"records": [
+            {"student_id": first, "poll_id": poll_id},
+            {"student_id": first, "poll_id": poll_id},
+        ]})
+        crud.insert_attendance_records(db_session, [
+            {"student_id": sid, "poll_id": poll_id, "marked_at": datetime.utcnow()} for sid in (first, second)
+        ])
+
+        assert client.get(f"/students/{first}/stats").json()["attended"] == 1
+        assert client.get(f"/students/{second}/stats").json()["attended"] == 1
+
+    def test_imported_students_get_rollup(self, client):
+        """Test students created by roster import have stats"""
+        client.post("/students/import", files={"file": ("r.csv", b"name,roll_no,department\nAnn,S1,CS\n", "text/csv")})
+        student_id = client.get("/students/").json()[0]["id"]
+        assert client.get(f"/students/{student_id}/stats").status_code == 200
+
+    def test_stats_nonexistent_student(self, client):
+        """Test stats for an unknown student"""
+        assert client.get("/students/99999/stats").status_code == 404
+
+    def test_delete_student_removes_rollup(self, client, db_session):
+        """Test deleting a student also deletes their records and rollup"""
+        (student_id,) = _create_students(client, ("Ann", "S1", "CS"))
+        _mark(client, student_id, _start_poll(client))
+
+        assert client.delete(f"/students/{student_id}").status_code == 204
+        assert db_session.get(models.StudentStats, student_id) is None
+        assert db_session.query(models.AttendanceRecord).count() == 0
+
+
+class TestRollupBackfill:
+    """Test the migration that builds missing rollups"""
+
+    def test_backfill_matches_incremental_rollup(self, client, db_session):
+        """Test rebuilding rollups from history gives the maintained values"""
+        early = _create_students(client, ("Ann", "S1", "CS"), ("Ben", "S2", "EE"))
+        first_poll = _start_poll(client)
+        (late,) = _create_students(client, ("Cat", "S3", "CS"))
+        _mark(client, early[0], first_poll)
+        _mark(client, late, first_poll)
+        second_poll = _start_poll(client)
+        _mark(client, early[1], second_poll)
+
+        def snapshot():
+            db_session.expire_all()
+            return {
+                s.student_id: (s.attended, s.total_polls, s.percentage)
+                for s in db_session.query(models.StudentStats)
+            }
+
+        maintained = snapshot()
+        db_session.execute(delete(models.StudentStats))
+        backfill_student_stats(db_session.connection())
+        db_session.commit()
+        assert snapshot() == maintained
+
+
+class TestDepartmentAndAtRiskStats:
+    """Test GET /stats/departments and GET /stats/at-risk"""
+
+    def _seed(self, client):
+        ids = _create_students(
+            client,
+            ("Ann", "S1", "CS"), ("Ben", "S2", "CS"), ("Cat", "S3", "EE"), ("Dan", "S4", "EE")
+        )
+        attended = {ids[0]: 4, ids[1]: 1, ids[2]: 2, ids[3]: 0}
+        # Starting a poll closes the previous one, so each is marked while current
+        for number in range(4):
+            poll_id = _start_poll(client)
+            records = [
+                {"student_id": student_id, "poll_id": poll_id}
+                for student_id, count in attended.items() if number < count
+            ]
+            if records:
+                client.post("/attendance/mark/batch", json={"records": records})
+        return ids
+
+    def test_department_stats(self, client):
+        """Test totals and percentage per department"""
+        self._seed(client)
+        data = client.get("/stats/departments").json()
+        assert data == [
+            {"department": "CS", "students": 2, "attended": 5, "total_polls": 8, "percentage": 62.5},
+            {"department": "EE", "students": 2, "attended": 2, "total_polls": 8, "percentage": 25.0},
+        ]
+
+    def test_at_risk_lowest_first(self, client):
+        """Test students under the threshold are listed lowest percentage first"""
+        ids = self._seed(client)
+        data = client.get("/stats/at-risk?threshold=60").json()
+        assert [(s["student_id"], s["percentage"]) for s in data] == [(ids[3], 0.0), (ids[1], 25.0), (ids[2], 50.0)]
+        assert data[0]["roll_no"] == "S4"
+
+    def test_at_risk_department_filter_and_limit(self, client):
+        """Test filtering by department and limiting the listing"""
+        ids = self._seed(client)
+        assert [s["student_id"] for s in client.get("/stats/at-risk?department=CS").json()] == [ids[1]]
+        assert len(client.get("/stats/at-risk?threshold=100&limit=2").json()) == 2
+
+    def test_at_risk_excludes_students_without_polls(self, client):
+        """Test students who have not had a poll yet are not at risk"""
+        _create_students(client, ("Ann", "S1", "CS"))
+        assert client.get("/stats/at-risk?threshold=100").json() == []
+
+    def test_at_risk_single_query(self, client, query_counter):
+        """Test the listing is answered by one statement regardless of roster size"""
+        self._seed(client)
+        query_counter.clear()
+        client.get("/stats/at-risk")
+        assert len(query_counter) == 1
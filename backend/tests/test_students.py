@@ -2,6 +2,7 @@
 Test student CRUD operations
 """
 import pytest
+from datetime import datetime
 
 
 class TestStudentCreation:
@@ -78,6 +79,101 @@ class TestStudentRetrieval:
         assert response.json() == []
 
 
+
+class TestStudentPagination:
+    """Test cursor pagination of the student list"""
+
+    def _walk(self, client, limit):
+        pages = []
+        response = client.get(f"/students/?limit={limit}")
+        while True:
+            assert response.status_code == 200
+            pages.append([s["roll_no"] for s in response.json()])
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                return pages
+            response = client.get(f"/students/?limit={limit}&cursor={cursor}")
+
+    def test_cursor_walks_all_students_once(self, client, db_session):
+        """Test following X-Next-Cursor visits every student exactly once in order"""
+        from app.models import Student
+
+        created_at = datetime(2024, 1, 1)
+        # Shared timestamps force the id tie-breaker to keep pages disjoint
+        db_session.add_all(
+            Student(name=f"Student {i}", roll_no=f"R{i:03d}", department="CS", created_at=created_at)
+            for i in range(7)
+        )
+        db_session.commit()
+
+        pages = self._walk(client, limit=3)
+        assert [len(page) for page in pages] == [3, 3, 1]
+        assert [roll for page in pages for roll in page] == [f"R{i:03d}" for i in range(7)]
+
+    def test_cursor_matches_skip_limit(self, client, sample_students):
+        """Test the cursor page equals the equivalent skip/limit page"""
+        first = client.get("/students/?limit=2")
+        by_cursor = client.get(f"/students/?limit=2&cursor={first.headers['X-Next-Cursor']}")
+        by_offset = client.get("/students/?skip=2&limit=2")
+        assert by_cursor.json() == by_offset.json()
+        assert "X-Next-Cursor" not in by_cursor.headers
+
+    def test_invalid_cursor(self, client):
+        """Test a malformed cursor is rejected"""
+        response = client.get("/students/?cursor=not-a-cursor")
+        assert response.status_code == 400
+
+
+class TestStudentImport:
+    """Test bulk roster import from CSV"""
+
+    def _upload(self, client, content, **params):
+        return client.post(
+            "/students/import",
+            params=params,
+            files={"file": ("roster.csv", content.encode(), "text/csv")}
+        )
+
+    def test_import_creates_students(self, client):
+        """Test every valid row becomes a student"""
+        rows = "\n".join(f"Student {i},IMP{i:05d},CS" for i in range(2500))
+        response = self._upload(client, "name,roll_no,department\n" + rows + "\n")
+        assert response.status_code == 200
+        data = response.json()
+        assert (data["total_rows"], data["created"], data["failed"]) == (2500, 2500, 0)
+        assert len(client.get("/students/?limit=5000").json()) == 2500
+
+    def test_import_reports_row_errors(self, client, sample_student):
+        """Test invalid, repeated and already registered rows are reported by row number"""
+        content = (
+            "roll_no,name,department\n"
+            "A1,Ann,CS\n"
+            f"{sample_student.roll_no},Taken,CS\n"
+            "A2,,CS\n"
+            "A1,Ann Again,CS\n"
+            "A3,Cam,EE\n"
+        )
+        data = self._upload(client, content).json()
+        assert (data["total_rows"], data["created"], data["failed"]) == (5, 2, 3)
+        errors = {error["row"]: error for error in data["errors"]}
+        assert errors[3]["detail"] == "Roll number already registered"
+        assert errors[4]["roll_no"] == "A2" and "name" in errors[4]["detail"]
+        assert "first seen on row 2" in errors[5]["detail"]
+
+    def test_import_update_existing(self, client, sample_student):
+        """Test update_existing rewrites name and department of registered roll numbers"""
+        content = f"name,roll_no,department\nRenamed,{sample_student.roll_no},Physics\n"
+        data = self._upload(client, content, update_existing="true").json()
+        assert (data["created"], data["updated"], data["failed"]) == (0, 1, 0)
+        student = client.get(f"/students/{sample_student.id}").json()
+        assert (student["name"], student["department"]) == ("Renamed", "Physics")
+
+    def test_import_missing_column(self, client):
+        """Test a header without the required columns is rejected"""
+        response = self._upload(client, "name,roll_no\nAnn,A1\n")
+        assert response.status_code == 400
+        assert "department" in response.json()["detail"]
+
 class TestStudentUpdate:
     """Test student update"""
 
@@ -0,0 +1,244 @@
+"""
+Test the write-behind attendance mark queue
+"""
+import asyncio
+import os
+import time
+
+import pytest
+
+from app import crud
+from app.config import settings
+from app.state_backend import MemoryStateBackend
+from app.write_behind import MarkQueue, recover_journals
+from tests.conftest import TestingSessionLocal
+
+
+def make_queue(tmp_path, durability="journal", max_batch=500):
+    return MarkQueue(
+        session_factory=TestingSessionLocal,
+        flush_interval_ms=10_000,
+        max_batch=max_batch,
+        durability=durability,
+        journal_dir=str(tmp_path / "journal"),
+        backend=MemoryStateBackend(str(tmp_path / "state"), max_keys=1000),
+    )
+
+
+class TestMarkQueue:
+    """Test queuing and group commits"""
+
+    def test_group_commit_writes_batch_in_one_statement(self, db_session, sample_students, active_poll, tmp_path, query_counter):
+        """Test queued marks are written by a single INSERT"""
+        queue = make_queue(tmp_path, durability="memory")
+        poll_id = active_poll.id
+        for student in sample_students:
+            asyncio.run(queue.enqueue(student.id, poll_id))
+        assert queue.pending_count == len(sample_students)
+        query_counter.clear()
+
+        assert asyncio.run(queue.flush()) == len(sample_students)
+        inserts = [s for s in query_counter if s.startswith("INSERT INTO attendance_records")]
+        assert len(inserts) == 1
+        assert len(crud.get_attendance_by_poll(db_session, poll_id)) == len(sample_students)
+
+    def test_repeat_mark_reuses_marked_at(self, tmp_path):
+        """Test a retried mark is acknowledged with the original timestamp"""
+        queue = make_queue(tmp_path, durability="memory")
+        first, created = asyncio.run(queue.enqueue(1, 1))
+        again, created_again = asyncio.run(queue.enqueue(1, 1))
+        assert created is True and created_again is False
+        assert again == first
+        assert queue.pending_count == 1
+
+    def test_full_batch_wakes_flusher(self, tmp_path):
+        """Test reaching max_batch triggers an early flush"""
+        queue = make_queue(tmp_path, durability="memory", max_batch=2)
+        asyncio.run(queue.enqueue(1, 1))
+        assert not queue._wake.is_set()
+        asyncio.run(queue.enqueue(2, 1))
+        assert queue._wake.is_set()
+
+    def test_stop_flushes_pending_marks(self, db_session, sample_student, active_poll, tmp_path):
+        """Test shutdown writes everything still queued"""
+        queue = make_queue(tmp_path)
+        student_id, poll_id = sample_student.id, active_poll.id
+
+        async def scenario():
+            await queue.start()
+            await queue.enqueue(student_id, poll_id)
+            await queue.stop()
+
+        asyncio.run(scenario())
+        assert len(crud.get_attendance_by_poll(db_session, poll_id)) == 1
+        assert os.listdir(tmp_path / "journal") == []
+
+    def test_invalid_durability_rejected(self, tmp_path):
+        """Test unknown durability levels fail fast"""
+        with pytest.raises(ValueError):
+            make_queue(tmp_path, durability="eventually")
+
+
+class TestFailures:
+    """Test marks are neither lost nor leaked when writes fail"""
+
+    def test_failed_flushes_keep_one_journal(self, db_session, sample_students, active_poll, tmp_path, monkeypatch):
+        """Test a database outage neither opens journals nor loses records, and the next success cleans up"""
+        import app.write_behind as write_behind
+
+        queue = make_queue(tmp_path)
+        poll_id = active_poll.id
+        student_ids = [student.id for student in sample_students]
+        write_records = write_behind.write_records
+
+        def down(session_factory, records):
+            raise OSError("database is unavailable")
+
+        async def scenario():
+            queue._open_journal()
+            for student_id in student_ids:
+                await queue.enqueue(student_id, poll_id)
+            monkeypatch.setattr(write_behind, "write_records", down)
+            for _ in range(5):
+                with pytest.raises(OSError):
+                    await queue.flush()
+            journals = os.listdir(tmp_path / "journal")
+            monkeypatch.setattr(write_behind, "write_records", write_records)
+            written = await queue.flush()
+            return journals, written
+
+        journals, written = asyncio.run(scenario())
+        assert len(journals) == 1
+        assert written == len(student_ids) and queue.pending_count == 0
+        assert len(crud.get_attendance_by_poll(db_session, poll_id)) == len(student_ids)
+        assert os.listdir(tmp_path / "journal") != journals
+        with open(queue._journal.name) as journal:
+            assert journal.read() == ""
+        queue._journal.close()
+
+    def test_cancelled_flush_keeps_batch(self, tmp_path, monkeypatch):
+        """Test a flush cancelled mid-write puts its batch back for stop() to write"""
+        import app.write_behind as write_behind
+
+        def cancelled(session_factory, records):
+            raise asyncio.CancelledError()
+
+        monkeypatch.setattr(write_behind, "write_records", cancelled)
+        queue = make_queue(tmp_path, durability="memory")
+        asyncio.run(queue.enqueue(1, 1))
+        with pytest.raises(asyncio.CancelledError):
+            asyncio.run(queue.flush())
+        assert queue.pending_count == 1
+
+    def test_failed_journal_write_leaves_no_claim(self, tmp_path):
+        """Test a mark that could not be journaled is accepted when retried"""
+        queue = make_queue(tmp_path)
+        queue._open_journal()
+        journal = queue._journal
+
+        class FullDisk:
+            def write(self, line):
+                raise OSError(28, "No space left on device")
+
+        queue._journal = FullDisk()
+        with pytest.raises(OSError):
+            asyncio.run(queue.enqueue(1, 1))
+        queue._journal = journal
+        assert asyncio.run(queue.enqueue(1, 1))[1] is True
+        assert queue.pending_count == 1
+        journal.close()
+
+    def test_concurrent_marks_share_fsyncs(self, tmp_path, monkeypatch):
+        """Test marks arriving together wait for one fsync between them, not one each"""
+        import app.write_behind as write_behind
+
+        fsyncs = []
+
+        def slow_fsync(fd):
+            fsyncs.append(fd)
+            time.sleep(0.05)
+
+        monkeypatch.setattr(write_behind.os, "fsync", slow_fsync)
+        queue = make_queue(tmp_path, durability="fsync")
+
+        async def scenario():
+            queue._open_journal()
+            await asyncio.gather(*(queue.enqueue(student_id, 1) for student_id in range(50)))
+
+        asyncio.run(scenario())
+        assert queue.pending_count == 50
+        assert len(fsyncs) <= 2
+        assert queue._synced == queue._written == 50
+        queue._journal.close()
+
+
+class TestCrashRecovery:
+    """Test journaled marks survive a worker crash"""
+
+    def test_journal_replayed_after_crash(self, db_session, sample_students, active_poll, tmp_path):
+        """Test marks acknowledged before a crash are written on the next startup"""
+        queue = make_queue(tmp_path, durability="fsync")
+        poll_id = active_poll.id
+        student_ids = [student.id for student in sample_students]
+
+        async def crash():
+            await queue.start()
+            for student_id in student_ids:
+                await queue.enqueue(student_id, poll_id)
+            # Simulate the process dying: the flusher never runs and the
+            # journal's lock is released without the records being written
+            queue._task.cancel()
+            queue._journal.close()
+
+        asyncio.run(crash())
+        assert crud.get_attendance_by_poll(db_session, poll_id) == []
+
+        replayed = recover_journals(str(tmp_path / "journal"), TestingSessionLocal)
+        assert replayed == len(student_ids)
+        assert len(crud.get_attendance_by_poll(db_session, poll_id)) == len(student_ids)
+        assert os.listdir(tmp_path / "journal") == []
+
+    def test_replay_is_idempotent(self, db_session, sample_student, active_poll, tmp_path):
+        """Test replaying records that were already committed adds nothing"""
+        journal_dir = tmp_path / "journal"
+        journal_dir.mkdir()
+        crud.mark_attendance(db_session, sample_student.id, active_poll.id)
+        line = f'{{"student_id": {sample_student.id}, "poll_id": {active_poll.id}, "marked_at": "2024-01-01T09:00:00"}}\n'
+        (journal_dir / "999.journal.1").write_text(line)
+
+        recover_journals(str(journal_dir), TestingSessionLocal)
+        assert len(crud.get_attendance_by_poll(db_session, active_poll.id)) == 1
+
+    def test_live_worker_journal_is_skipped(self, tmp_path):
+        """Test recovery leaves journals locked by running workers alone"""
+        queue = make_queue(tmp_path)
+        queue._open_journal()
+        asyncio.run(queue.enqueue(1, 1))
+
+        assert recover_journals(str(tmp_path / "journal"), TestingSessionLocal) == 0
+        assert len(os.listdir(tmp_path / "journal")) == 1
+        queue._journal.close()
+
+
+class TestWriteBehindEndpoint:
+    """Test POST /attendance/mark in write-behind mode"""
+
+    def test_mark_is_acknowledged_then_flushed(self, client, db_session, sample_student, active_poll, tmp_path, monkeypatch):
+        """Test the endpoint returns 202 with marked_at and the record lands after a flush"""
+        import app.routers.attendance as attendance_router
+
+        queue = make_queue(tmp_path, durability="memory")
+        monkeypatch.setattr(settings, "WRITE_BEHIND_ENABLED", True)
+        monkeypatch.setattr(attendance_router, "mark_queue", queue)
+        student_id, poll_id = sample_student.id, active_poll.id
+
+        response = client.post("/attendance/mark", json={"student_id": student_id, "poll_id": poll_id})
+        assert response.status_code == 202
+        data = response.json()
+        assert data["queued"] is True
+        assert data["student_roll_no"] == sample_student.roll_no
+        assert "marked_at" in data
+        assert crud.get_attendance_by_poll(db_session, poll_id) == []
+
+        asyncio.run(queue.flush())
+        assert len(crud.get_attendance_by_poll(db_session, poll_id)) == 1
@@ -4,8 +4,9 @@ import { useState } from 'react'
 import { ArrowLeft } from 'lucide-react'
 import Link from 'next/link'
 import useSWR from 'swr'
+import useSWRSubscription from 'swr/subscription'
 import { attendanceApi, studentApi } from '@/lib/api'
-import { PollStatus, Student } from '@/lib/types'
+import { PollStatusEvent, Student } from '@/lib/types'
 import Button from '@/components/ui/Button'
 import Input from '@/components/ui/Input'
 import PollStatusComponent from '@/components/PollStatus'
@@ -14,10 +15,10 @@ export default function AttendancePollPage() {
   const [duration, setDuration] = useState('5')
   const [starting, setStarting] = useState(false)
   
-  const { data: pollStatus, mutate: mutatePoll } = useSWR<PollStatus>(
-    'poll-status',
-    () => attendanceApi.getCurrentPoll(),
-    { refreshInterval: 2000 }
+  const { data: pollStatus } = useSWRSubscription<PollStatusEvent>(
+    'poll-status-stream',
+    (_key, { next }) =>
+      attendanceApi.subscribePollStatus((status) => next(null, status))
   )
 
   const { data: students } = useSWR<Student[]>(
@@ -25,16 +26,18 @@ export default function AttendancePollPage() {
     () => studentApi.getAll()
   )
 
+  // Refetch the roster of present students only when the pushed count changes
   const { data: presentStudents } = useSWR(
-    pollStatus?.is_active ? `attendance-${pollStatus.poll_id}` : null,
+    pollStatus?.is_active
+      ? `attendance-${pollStatus.poll_id}-${pollStatus.present_count}`
+      : null,
     async () => {
       if (pollStatus?.poll_id) {
         const logs = await attendanceApi.getAttendanceLogs(pollStatus.poll_id)
         return logs.records
       }
       return []
-    },
-    { refreshInterval: 2000 }
+    }
   )
 
   const handleStartPoll = async (e: React.FormEvent) => {
@@ -42,7 +45,6 @@ export default function AttendancePollPage() {
     setStarting(true)
     try {
       await attendanceApi.startPoll(parseInt(duration))
-      await mutatePoll()
     } catch (error) {
       const errorMessage = error instanceof Error ? error.message : 'Failed to start poll'
       alert(errorMessage)
@@ -100,10 +102,7 @@ export default function AttendancePollPage() {
               Current Status
             </h2>
             {pollStatus && (
-              <PollStatusComponent
-                status={pollStatus}
-                onRefresh={() => mutatePoll()}
-              />
+              <PollStatusComponent status={pollStatus} />
             )}
           </div>
         </div>
@@ -3,16 +3,17 @@
 import { ArrowLeft, AlertCircle } from 'lucide-react'
 import Link from 'next/link'
 import useSWR from 'swr'
+import useSWRSubscription from 'swr/subscription'
 import { attendanceApi, studentApi } from '@/lib/api'
-import { PollStatus, Student } from '@/lib/types'
+import { PollStatusEvent, Student } from '@/lib/types'
 import AttendanceForm from '@/components/AttendanceForm'
 import PollStatusComponent from '@/components/PollStatus'
 
 export default function StudentPage() {
-  const { data: pollStatus, mutate: mutatePoll } = useSWR<PollStatus>(
-    'poll-status',
-    () => attendanceApi.getCurrentPoll(),
-    { refreshInterval: 3000 }
+  const { data: pollStatus } = useSWRSubscription<PollStatusEvent>(
+    'poll-status-stream',
+    (_key, { next }) =>
+      attendanceApi.subscribePollStatus((status) => next(null, status))
   )
 
   const { data: students } = useSWR<Student[]>('students', () =>
@@ -51,10 +52,7 @@ export default function StudentPage() {
             Poll Status
           </h2>
           {pollStatus && (
-            <PollStatusComponent
-              status={pollStatus}
-              onRefresh={() => mutatePoll()}
-            />
+            <PollStatusComponent status={pollStatus} />
           )}
         </div>
 
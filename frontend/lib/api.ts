@@ -1,5 +1,5 @@
 import axios from 'axios'
-import type { Student, AttendancePoll, PollStatus, AttendanceRecord, AttendanceLog } from './types'
+import type { Student, AttendancePoll, PollStatus, PollStatusEvent, AttendanceRecord, AttendanceLog } from './types'
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
 
@@ -10,6 +10,23 @@ const api = axios.create({
   },
 })
 
+// After a mark the API returns X-Read-Primary-Until; sending it back keeps
+// this client's reads on the primary database, so it sees its own mark even
+// when reads are spread over lagging replicas
+const READ_PRIMARY_HEADER = 'X-Read-Primary-Until'
+let readPrimaryUntil: string | undefined
+
+api.interceptors.response.use((response) => {
+  const until = response.headers[READ_PRIMARY_HEADER.toLowerCase()]
+  if (until) readPrimaryUntil = until
+  return response
+})
+
+api.interceptors.request.use((config) => {
+  if (readPrimaryUntil) config.headers.set(READ_PRIMARY_HEADER, readPrimaryUntil)
+  return config
+})
+
 // Student API
 export const studentApi = {
   getAll: async (): Promise<Student[]> => {
@@ -49,6 +66,14 @@ export const attendanceApi = {
     return response.data
   },
 
+  // Subscribe to pushed poll status updates; returns an unsubscribe function.
+  // EventSource reconnects on its own after network errors.
+  subscribePollStatus: (onStatus: (status: PollStatusEvent) => void): (() => void) => {
+    const source = new EventSource(`${API_URL}/attendance/current/stream`)
+    source.onmessage = (event) => onStatus(JSON.parse(event.data))
+    return () => source.close()
+  },
+
   markAttendance: async (student_id: number, poll_id: number): Promise<AttendanceRecord> => {
     const response = await api.post('/attendance/mark', { student_id, poll_id })
     return response.data
@@ -23,6 +23,10 @@ export interface PollStatus {
   remaining_seconds?: number
 }
 
+export interface PollStatusEvent extends PollStatus {
+  present_count: number
+}
+
 export interface AttendanceRecord {
   id: number
   student_id: number